@@ -35,7 +35,7 @@ LOGGING = {
     },
     'root': {
         'handlers': ['console'],
-        'level': 'DEBUG',
+        'level': 'INFO',
     },
 }
 
@@ -52,7 +52,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'extra_views',
 ]
 
 MIDDLEWARE = [
@@ -63,6 +62,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Abfragen und Rechenzeiten pro Request (Log und Response-Header)
+    'main.instrumentation.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'MyProjekt.urls'
@@ -94,9 +95,19 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Worker-Threads schreiben parallel zum Webprozess
+        'OPTIONS': {'timeout': 20},
     }
 }
 
+# Worker-Threads für Hintergrundaufträge im Webprozess (main/jobs.py)
+# 0 = Aufträge nur über "python manage.py run_jobs" abarbeiten
+JOB_WORKERS = 2
+
+# laufende Aufträge ohne Fortschritt seit JOB_TIMEOUT Sekunden gelten als
+# abgebrochen (Worker beendet, z.B. Neustart)
+JOB_TIMEOUT = 600
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
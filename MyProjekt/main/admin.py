@@ -2,8 +2,10 @@ from django.contrib import admin
 
 from .models import (CostReference, EcrCost, EcrFuzzy, FctAttribute, FctMembership, Feature, Technology, Tool,
                      ToolAttribute, Volume, ReferenceSystem, Item,
-                     Halbzeug, FeatureAttribute, Result)
+                     Halbzeug, FeatureAttribute, FeatureVolume, ItemDifference, Job,
+                     Result, UploadCache)
 
 admin.site.register(
     [ReferenceSystem, Volume, ToolAttribute, FctMembership, FctAttribute,
-     Item, Halbzeug, Feature, FeatureAttribute, Result, CostReference, EcrCost, Tool, Technology, EcrFuzzy])
+     Item, Halbzeug, Feature, FeatureAttribute, Result, CostReference, EcrCost, Tool, Technology, EcrFuzzy, Job, ItemDifference,
+     FeatureVolume, UploadCache])
@@ -0,0 +1,304 @@
+'''
+Benchmark der Verarbeitungskette Excel -> FCT-Tabelle -> Kosten
+
+Für jede Größe (Anzahl Feature x Anzahl Technologien) wird ein
+synthetisches Referenzsystem mit Technologien, Werkzeugen,
+Leistungsfähigkeitsprofilen, vollständig gefüllter FCT-Tabelle und ein
+Vergleichsbauteil erzeugt. Gemessen werden Dauer und Anzahl der
+SQL-Abfragen (instrumentation.profile) der einzelnen Schritte:
+Excel lesen, Feature anlegen, Volumen der FCT-Tabelle, Preisbestimmung
+(ItemFctBackwards inkl. Hintergrundauftrag) und Ergebnisseite
+(CustomerItem). Aufruf über "manage.py benchmark".
+
+Mit --plans wird zusätzlich der Ausführungsplan (EXPLAIN) der häufigsten
+Abfragen auf FCT-Tabelle, Feature und Ergebnissen für die größte
+Tabelle ausgegeben.
+'''
+import io
+import random
+import re
+import statistics
+from typing import Any, Dict, List, Tuple
+
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models.query import QuerySet
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from openpyxl import Workbook
+
+from . import jobs
+from .fct_table import MEMBER_ORDER
+from .fuzzy import classify_cells
+from .instrumentation import Profile, profile
+from .models import (CostReference, EcrCost, FctAttribute, FctMembership,
+                     Feature, FeatureAttribute, Item, Job, ReferenceSystem,
+                     Result, Technology, Tool, ToolAttribute)
+from .utils import create_features_from_rows, processing_excel_file_buffer
+
+# Standardgrößen: Anzahl Feature und Anzahl Technologien
+FEATURE_COUNTS = [10, 100, 1000]
+TECHNOLOGY_COUNTS = [3, 10, 50]
+
+# gemessene Schritte (Reihenfolge der Ausgabe)
+STEPS = ['parse excel', 'create features', 'fct volumes', 'fct backwards',
+         'customer item']
+
+# Spaltenköpfe wie in den exportierten Featuretabellen
+HEADER = ['#', 'Name', 'Classifier', 'prismatic : Boolean',
+          'positive : Boolean', 'Durchmesser : length[millimetre]',
+          'Länge : length[millimetre]']
+
+# Maße der Kontur (Formularangaben beim Hochladen)
+CONTOUR = {'prismatic': False, 'laenge': 400.0, 'durchmesser': 100.0,
+           'breite': None, 'hoehe': None}
+
+# Merkmale der Bohrungen, für die Profile angelegt werden
+MERKMALE = ['durchmesser', 'länge']
+
+# Index und Suchspalten in der Ausgabe von EXPLAIN QUERY PLAN (SQLite)
+INDEX_PATTERN = re.compile(r'USING (?:COVERING )?INDEX (\S+)(?: \((.*)\))?')
+
+
+def feature_rows(count: int, rng: random.Random
+                 ) -> List[Tuple[str, float, float]]:
+    # (Name, Durchmesser, Länge) der Bohrungen
+    return [(f'bohrung{index}', round(rng.uniform(2, 6), 2),
+             round(rng.uniform(5, 10), 2))
+            for index in range(count)]
+
+
+def excel_file(rows: List[Tuple[str, float, float]]) -> bytes:
+    '''
+    Featuretabelle im Format der hochgeladenen Excel-Dateien
+    (Titelzeile, Spaltenköpfe, Bohrungen und Halbzeug)
+    '''
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['Featuretabelle_Benchmark'])
+    sheet.append(HEADER)
+    for index, (name, durchmesser, laenge) in enumerate(rows, start=1):
+        sheet.append([index, name, 'Bohrung', 'false', 'false',
+                      f'{durchmesser} mm', f'{laenge} mm'])
+    sheet.append([len(rows) + 1, 'halbzeug_rotatorisch',
+                  'Halbzeug_rotatorisch', 'false', 'true',
+                  f'{CONTOUR["durchmesser"] + 5} mm',
+                  f'{CONTOUR["laenge"] + 5} mm'])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def create_technologies(count: int) -> List[Tool]:
+    '''
+    Technologien mit je einem Werkzeug und Leistungsfähigkeitsprofilen,
+    die alle erzeugten Werte als machbar einstufen
+    '''
+    tools = []
+    for index in range(count):
+        technology = Technology.objects.create(
+            name=f'Technologie {index}', restfertigungsgemeinkosten=0.5,
+            anschaffungswert=100000 + 1000 * index, verkaufserlös=10000,
+            abschreibungsdauer=10, platzbedarf=12, mittlere_leistung=15,
+            instandhaltungsfaktor=0.05, quadratmeterpreis=8, strompreis=0.2,
+            zinsatz=0.06, stundenlohn=40, fertigungsmittelanzahl=1,
+            bediehnverhaeltnis=0.8)
+        tools.append(Tool.objects.create(
+            name=f'Werkzeug {index}', technology=technology,
+            verteilzeit=5, ruestzeit=600, erholungszeit=3,
+            werkzeugwechselzeit=60, werkstueckwechselzeit=20,
+            betriebsstoffkosten=50 + index, werkzeugpreis=30 + index))
+    ToolAttribute.objects.bulk_create([
+        ToolAttribute(name=name, tool=tool, a=-1, b=0, c=1000, d=2000)
+        for tool in tools for name in MERKMALE])
+    return tools
+
+
+def fill_fct_table(system: ReferenceSystem, tools: List[Tool]) -> None:
+    '''
+    Fertigungsprozessfolge anlegen und die FCT-Tabelle vollständig füllen:
+    jede Technologie trägt einen gleich großen Teil zum Endmaß bei
+    (Output der Technologie = Input der nächsten)
+    '''
+    FctMembership.objects.bulk_create([
+        FctMembership(reference=system, tool=tool, position=index + 1,
+                      hauptzeit=60 + index, standmenge=500, losgroesse=1000)
+        for index, tool in enumerate(tools)])
+    members = list(FctMembership.objects.filter(reference=system)
+                   .order_by(*MEMBER_ORDER))
+    profiles = {(t.tool_id, t.name): t for t in ToolAttribute.objects.filter(
+        tool__in=tools)}
+
+    count = len(members)
+    cells = []
+    for merkmal in FeatureAttribute.objects.filter(
+            feature__item__reference=system).select_related('feature'):
+        if merkmal.feature.is_positive:
+            # Kontur: vom Halbzeug (+5 mm) auf das Endmaß
+            steps = [merkmal.value + 5 * (1 - index / count)
+                     for index in range(count + 1)]
+        else:
+            # Bohrung: von 0 auf das Endmaß
+            steps = [merkmal.value * index / count
+                     for index in range(count + 1)]
+        # Endmaß exakt (ohne Rundungsfehler der Teilschritte), sonst
+        # verletzt die Tabelle die Zielwertprüfung
+        steps[-1] = merkmal.value
+        for index, member in enumerate(members):
+            cells.append(FctAttribute(
+                membership=member, feature_attribute=merkmal,
+                input=steps[index], output=steps[index + 1],
+                tool_attribute=profiles.get((member.tool_id, merkmal.name),
+                                            profiles[(member.tool_id,
+                                                      MERKMALE[0])])))
+    classify_cells(cells)
+    FctAttribute.objects.bulk_create(cells)
+
+
+def step_result(current: Profile) -> Dict[str, Any]:
+    return {'seconds': current.duration, 'queries': current.query_count,
+            'duplicates': current.duplicates}
+
+
+def run_scenario(features: int, technologies: int,
+                 seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    '''
+    ein Durchlauf der Verarbeitungskette in der (leeren) Datenbank
+    Rückgabe: Schritt -> Dauer (s), Abfragen und wiederholte Abfragen
+    '''
+    rng = random.Random(seed)
+    results = {}
+    reference_rows = feature_rows(features, rng)
+    item_rows = [(name, round(durchmesser * 1.1, 2), laenge)
+                 for name, durchmesser, laenge in reference_rows]
+
+    tools = create_technologies(technologies)
+    system = ReferenceSystem.objects.create(
+        name='Benchmark', laufzeit_jahr=3000, betrachtungszeitraum=5,
+        produktpreis=80, lohnnebenkostenanteil=0.3, dichte=0.00785,
+        kilopreis=2.5)
+    parameters = dict(CONTOUR, name='Referenzbauteil')
+    payload = excel_file(reference_rows)
+    with profile('benchmark parse excel') as current:
+        rows = processing_excel_file_buffer(parameters, io.BytesIO(payload))
+    results['parse excel'] = step_result(current)
+
+    with profile('benchmark create features') as current:
+        with transaction.atomic():
+            item = Item.objects.create(reference=system,
+                                       name=parameters['name'])
+            create_features_from_rows(rows, item)
+    results['create features'] = step_result(current)
+
+    fill_fct_table(system, tools)
+    item = Item.objects.create(compare_reference=system,
+                               name='Vergleichsbauteil')
+    with transaction.atomic():
+        create_features_from_rows(processing_excel_file_buffer(
+            dict(CONTOUR, name=item.name),
+            io.BytesIO(excel_file(item_rows))), item)
+
+    client = Client()
+    with profile('benchmark fct volumes') as current:
+        client.get(reverse('fct-volume', args=[system.pk]))
+    results['fct volumes'] = step_result(current)
+
+    # Auftrag anlegen und direkt im aktuellen Thread abarbeiten
+    with profile('benchmark fct backwards') as current:
+        client.get(reverse('item-fct', args=[item.pk, system.pk]))
+        for pk in jobs.pending_jobs():
+            jobs.run(jobs.claim(pk))
+    results['fct backwards'] = step_result(current)
+    job = Job.objects.filter(kind=Job.PRICE_ITEM).last()
+    if job is None or job.status != Job.DONE:
+        raise RuntimeError(f'Preisbestimmung fehlgeschlagen: '
+                           f'{job.message if job else "kein Auftrag"}')
+
+    with profile('benchmark customer item') as current:
+        client.get(reverse('item-detail', args=[item.pk]))
+    results['customer item'] = step_result(current)
+    return results
+
+
+def run_benchmark(feature_counts: List[int] = FEATURE_COUNTS,
+                  technology_counts: List[int] = TECHNOLOGY_COUNTS,
+                  repeat: int = 1, seed: int = 0) -> List[Dict[str, Any]]:
+    '''
+    alle Größen durchlaufen (Aufruf in einer leeren Test-Datenbank)
+    jeder Durchlauf beginnt mit einer geleerten Datenbank, je Schritt
+    wird der Median über repeat Durchläufe ausgegeben
+    '''
+    scenarios = []
+    with override_settings(ALLOWED_HOSTS=['testserver'], JOB_WORKERS=0):
+        for features in feature_counts:
+            for technologies in technology_counts:
+                runs = []
+                for index in range(repeat):
+                    call_command('flush', interactive=False, verbosity=0)
+                    runs.append(run_scenario(features, technologies,
+                                             seed + index))
+                steps = {}
+                for step in STEPS:
+                    steps[step] = {
+                        'seconds': statistics.median(
+                            run[step]['seconds'] for run in runs),
+                        'queries': runs[-1][step]['queries'],
+                        'duplicates': runs[-1][step]['duplicates']}
+                scenarios.append({'features': features,
+                                  'technologies': technologies,
+                                  'cells': (features + 1) * 2 * technologies,
+                                  'steps': steps})
+    return scenarios
+
+
+def lookup_queries(system: ReferenceSystem, item: Item) -> Dict[str, QuerySet]:
+    # häufigste Abfragen der FCT-Tabelle, Feature und Ergebnisse
+    member = FctMembership.objects.filter(reference=system) \
+        .order_by(*MEMBER_ORDER).last()
+    merkmal = FeatureAttribute.objects.filter(
+        feature__item=system.item).select_related('feature').last()
+    return {
+        'fct cell': FctAttribute.objects.filter(
+            membership=member, feature_attribute=merkmal),
+        'feature by name': Feature.objects.filter(
+            item=system.item, name=merkmal.feature.name),
+        'merkmal by name': FeatureAttribute.objects.filter(
+            feature=merkmal.feature, name=merkmal.name),
+        'process chain': FctMembership.objects.filter(
+            reference=system).order_by(*MEMBER_ORDER),
+        'last cost reference': CostReference.objects.filter(
+            reference=system).order_by('-pk')[:1],
+        'last result': Result.objects.filter(item=item).order_by('-pk')[:1],
+        'last ecr cost': EcrCost.objects.filter(item=item).order_by('-pk')[:1],
+    }
+
+
+def query_plan(queryset: QuerySet) -> Dict[str, Any]:
+    '''
+    Ausführungsplan einer Abfrage (SQLite: EXPLAIN QUERY PLAN)
+    index: verwendete Indizes mit den gesuchten Spalten
+    seek: die Tabelle wird über einen Index gesucht (kein SCAN) und
+    nicht nachträglich sortiert
+    '''
+    plan = queryset.explain()
+    return {'plan': plan.splitlines(),
+            'index': INDEX_PATTERN.findall(plan),
+            'seek': 'SCAN' not in plan and 'TEMP B-TREE' not in plan}
+
+
+def run_query_plans(features: int, technologies: int,
+                    seed: int = 0) -> Dict[str, Any]:
+    '''
+    Verarbeitungskette einmal durchlaufen und anschließend die
+    Ausführungspläne der häufigsten Abfragen bestimmen
+    '''
+    with override_settings(ALLOWED_HOSTS=['testserver'], JOB_WORKERS=0):
+        call_command('flush', interactive=False, verbosity=0)
+        run_scenario(features, technologies, seed)
+    system = ReferenceSystem.objects.get()
+    item = Item.objects.get(compare_reference=system)
+    return {'features': features, 'technologies': technologies,
+            'cells': FctAttribute.objects.count(),
+            'queries': {name: query_plan(queryset) for name, queryset in
+                        lookup_queries(system, item).items()}}
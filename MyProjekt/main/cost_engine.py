@@ -0,0 +1,274 @@
+'''
+Vektorisierte Kostenberechnung einer Fertigungsprozessfolge
+
+Die Fertigungsprozessfolge wird als Spaltenarrays abgebildet
+(eine Zeile pro FctMembership). Alle Kostenbestandteile
+(tn, tg, te, npf, Ka, Kr, Ki, Kz, Kw, Kl, Ke, Kmh, Km, Kf, Khb) werden
+in wenigen NumPy-Operationen für alle Technologien gleichzeitig bestimmt.
+
+Die Arrays dürfen zusätzliche führende Achsen besitzen (z.B. N Bauteile
+x T Technologien), dann werden N Kostenrechnungen auf einmal durchgeführt.
+
+Das Modell greift nicht auf die Datenbank zu: Eingangsgrößen sind
+ProcessChain und SystemParameters, das Ergebnis ein CostBreakdown. Das
+Laden aus der Datenbank übernehmen utils_costs.load_chain und
+SystemParameters.from_system (verwendet von pricing und sweep).
+'''
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Sekunden pro Stunde (Zeiten der FCT-Spalten sind in Sekunden angegeben)
+SECONDS_PER_HOUR = 60 * 60
+
+# bauteilabhängige Fertigungsprozessparameter (FctMembership)
+MEMBERSHIP_FIELDS = ['hauptzeit', 'standmenge', 'losgroesse']
+
+# wirtschaftliche Parameter des Werkzeugs (Tool)
+TOOL_FIELDS = ['verteilzeit', 'ruestzeit', 'erholungszeit',
+               'werkzeugwechselzeit', 'werkstueckwechselzeit',
+               'betriebsstoffkosten', 'werkzeugpreis']
+
+# wirtschaftliche Parameter der Maschine (Technology)
+TECHNOLOGY_FIELDS = ['restfertigungsgemeinkosten', 'anschaffungswert',
+                     'verkaufserlös', 'abschreibungsdauer', 'platzbedarf',
+                     'mittlere_leistung', 'instandhaltungsfaktor',
+                     'quadratmeterpreis', 'strompreis', 'zinsatz',
+                     'stundenlohn', 'fertigungsmittelanzahl',
+                     'bediehnverhaeltnis']
+
+# wirtschaftliche Parameter des Referenzsystems (ReferenceSystem)
+SYSTEM_FIELDS = ['laufzeit_jahr', 'betrachtungszeitraum', 'produktpreis',
+                 'lohnnebenkostenanteil', 'dichte', 'kilopreis']
+
+# Ergebnisse der gesamten Fertigungsprozessfolge
+# (entspricht den Feldern von CostReference und Result)
+GENERAL_FIELDS = ['npf_max', 'Kf_fpf', 'Krm', 'Kma', 'Kh', 'Kh_npf', 'Gpf']
+
+
+class ProcessChain:
+    '''
+    Fertigungsprozessfolge als Spaltenarrays
+    names: Werkzeugname pro Spalte
+    columns: Parametername -> Array mit einem Eintrag pro FctMembership
+    '''
+
+    def __init__(self, names: List[str], columns: Dict[str, np.ndarray]):
+        self.names = names
+        self.columns = columns
+
+    @classmethod
+    def from_members(cls, members) -> 'ProcessChain':
+        # eine einzige Abfrage für Membership, Werkzeug und Maschine
+        fields = MEMBERSHIP_FIELDS + \
+            [f'tool__{name}' for name in TOOL_FIELDS] + \
+            [f'tool__technology__{name}' for name in TECHNOLOGY_FIELDS]
+        rows = list(members.values_list('tool__name', *fields))
+
+        names = [row[0] for row in rows]
+        values = np.array([row[1:] for row in rows], dtype=float) \
+            .reshape(len(rows), len(fields))
+        columns = {
+            name: values[:, index] for index, name in
+            enumerate(MEMBERSHIP_FIELDS + TOOL_FIELDS + TECHNOLOGY_FIELDS)}
+        return cls(names, columns)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def replace(self, **columns: Any) -> 'ProcessChain':
+        # neue Kette mit ausgetauschten Spalten (z.B. für Vergleichsbauteil)
+        new_columns = dict(self.columns)
+        new_columns.update(
+            {name: np.asarray(value, dtype=float)
+             for name, value in columns.items()})
+        return ProcessChain(self.names, new_columns)
+
+
+@dataclass(frozen=True)
+class SystemParameters:
+    '''
+    wirtschaftliche Parameter des Referenzsystems
+    (Skalare oder Arrays, die über die führenden Achsen broadcastet werden)
+    '''
+    laufzeit_jahr: Any
+    betrachtungszeitraum: Any
+    produktpreis: Any
+    lohnnebenkostenanteil: Any
+    dichte: Any
+    kilopreis: Any
+
+    @classmethod
+    def from_system(cls, system) -> 'SystemParameters':
+        return cls(**{name: getattr(system, name) for name in SYSTEM_FIELDS})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in SYSTEM_FIELDS}
+
+
+@dataclass
+class ColumnCosts:
+    '''
+    Zeiten, Stückzahlen und Kosten pro Technologie
+    (Arrays, letzte Achse = Technologie)
+    '''
+    tn: np.ndarray
+    tg: np.ndarray
+    te: np.ndarray
+    npf: np.ndarray
+    npa: np.ndarray
+    Ka: np.ndarray
+    Kr: np.ndarray
+    Ki: np.ndarray
+    Kz: np.ndarray
+    Kw: np.ndarray
+    Kl: np.ndarray
+    Ke: np.ndarray
+    Kmh: np.ndarray
+    Km: np.ndarray
+    Kf: np.ndarray
+    Khb: np.ndarray
+
+
+@dataclass
+class CostBreakdown:
+    '''
+    Ergebnis der Kostenberechnung einer Fertigungsprozessfolge
+    columns: Kosten pro Technologie
+    npf_max ... Gpf: Ergebnis der gesamten Fertigungsprozessfolge
+    (Skalar bzw. ein Eintrag pro Kostenrechnung)
+    '''
+    columns: ColumnCosts
+    npf_max: np.ndarray
+    Kf_fpf: np.ndarray
+    Krm: np.ndarray
+    Kma: np.ndarray
+    Kh: np.ndarray
+    Kh_npf: np.ndarray
+    Gpf: np.ndarray
+
+    def general(self, index: Any = ()) -> Dict[str, float]:
+        '''
+        Ergebnis einer Kostenrechnung als float-dict
+        (direkt an CostReference bzw. Result übergebbar)
+        index: Position bei mehreren Kostenrechnungen
+        '''
+        return {name: float(np.asarray(getattr(self, name))[index])
+                for name in GENERAL_FIELDS}
+
+    def as_dict(self) -> Dict[str, Dict[str, np.ndarray]]:
+        # Darstellung wie das frühere cost_overview
+        return {
+            'cost_fct_column': {field.name: getattr(self.columns, field.name)
+                                for field in fields(ColumnCosts)},
+            'cost_general': {name: getattr(self, name)
+                             for name in GENERAL_FIELDS},
+        }
+
+
+def scale_chain_parameters(chain: ProcessChain, vol_ref: Any,
+                           vol_item: Any) -> ProcessChain:
+    '''
+    Hauptzeit, Standmenge und Losgröße des Vergleichsbauteils
+    in Abhängigkeit der Änderungsvolumina von Referenz- und
+    Vergleichsbauteil bestimmen
+    '''
+    relation = np.abs(np.asarray(vol_item, dtype=float) /
+                      np.asarray(vol_ref, dtype=float))
+    return chain.replace(
+        hauptzeit=relation * chain['hauptzeit'],
+        standmenge=chain['standmenge'] * (1 / relation),
+        losgroesse=chain['losgroesse'] * (1 / relation))
+
+
+def _per_column(value: Any) -> np.ndarray:
+    # Systemparameter (Skalar oder Array mit führenden Achsen) an die
+    # Technologieachse anpassen
+    return np.asarray(value, dtype=float)[..., np.newaxis]
+
+
+def calculate_costs(chain: ProcessChain, system: SystemParameters,
+                    halbzeug_volume: Any,
+                    columns: Optional[Dict[str, Any]] = None) -> CostBreakdown:
+    '''
+    Kostenberechnung der Fertigungsprozessfolge
+    chain: Spaltenarrays der Technologien (letzte Achse = Technologie)
+    system: wirtschaftliche Parameter des Referenzsystems
+    halbzeug_volume: Volumen des Halbzeugs für die Rohmaterialkosten
+    columns: optional ersetzte Spalten, z.B. hauptzeit, standmenge und
+    losgroesse des Vergleichsbauteils
+    '''
+    c = dict(chain.columns)
+    if columns:
+        c.update({name: np.asarray(value, dtype=float)
+                  for name, value in columns.items()})
+
+    laufzeit_jahr = _per_column(system.laufzeit_jahr)
+    betrachtungszeitraum = _per_column(system.betrachtungszeitraum)
+    lohnnebenkostenanteil = _per_column(system.lohnnebenkostenanteil)
+
+    '''
+    Alle Kosten die bestimmt werden können ohne Npf_gesamt der
+    Fertigungsprozessfolge
+    '''
+    tn = (c['ruestzeit'] / c['losgroesse']) + \
+        (c['werkzeugwechselzeit'] / c['standmenge']) + \
+        c['werkstueckwechselzeit']
+    tg = c['hauptzeit'] + tn
+    te = tg + c['verteilzeit'] + c['erholungszeit']
+    te_h = te / SECONDS_PER_HOUR
+
+    npf = (laufzeit_jahr * betrachtungszeitraum) / te_h
+
+    anschaffungswert = c['anschaffungswert']
+    verkaufserloes = c['verkaufserlös']
+    Ka = (anschaffungswert - verkaufserloes) / c['abschreibungsdauer']
+    Kr = c['quadratmeterpreis'] * c['platzbedarf']
+    Ki = anschaffungswert * c['instandhaltungsfaktor']
+    Kz = 0.5 * (anschaffungswert + verkaufserloes) * c['zinsatz']
+    Kw = c['werkzeugpreis'] / c['standmenge']
+    Kl = c['stundenlohn'] * (1 + lohnnebenkostenanteil) * te_h * \
+        c['bediehnverhaeltnis'] * c['fertigungsmittelanzahl']
+
+    # die Technologie mit der geringsten Stückzahl begrenzt die Folge
+    npf_max = np.min(npf, axis=-1)
+
+    # Berechnung aller Kostenbestandteile die Abhängig von der Stückzahl sind
+    npa = npf_max[..., np.newaxis] / betrachtungszeitraum
+    Ke = c['mittlere_leistung'] * te_h * npa * c['strompreis']
+    Kmh = (Ka + Kr + Ki + Ke + Kz) / laufzeit_jahr
+    Km = Kmh * te_h
+    Kf = Kl + Km + Kw + c['restfertigungsgemeinkosten']
+    Khb = c['betriebsstoffkosten'] / npf_max[..., np.newaxis]
+
+    Kf_fpf = np.sum(Kf, axis=-1)
+    Krm = np.asarray(halbzeug_volume, dtype=float) * \
+        np.asarray(system.dichte, dtype=float) * \
+        np.asarray(system.kilopreis, dtype=float) * pow(10, -3)
+    Kma = Krm + np.sum(Khb, axis=-1)
+    Kh = Kf_fpf + Kma
+    Kh_npf = Kh * npf_max
+    Gpf = np.asarray(system.produktpreis, dtype=float) * npf_max - Kh_npf
+
+    return CostBreakdown(
+        columns=ColumnCosts(
+            tn=tn, tg=tg, te=te, npf=npf, npa=npa, Ka=Ka, Kr=Kr, Ki=Ki,
+            Kz=Kz, Kw=Kw, Kl=Kl, Ke=Ke, Kmh=Kmh, Km=Km, Kf=Kf, Khb=Khb),
+        npf_max=npf_max, Kf_fpf=Kf_fpf, Krm=Krm, Kma=Kma, Kh=Kh,
+        Kh_npf=Kh_npf, Gpf=Gpf)
+
+
+def ecr_costs(reference_cost: Dict[str, float],
+              item_cost: Dict[str, float]) -> Dict[str, float]:
+    # Änderungskostenbestimmung (Vergleichsbauteil gegenüber Referenzbauteil)
+    return {
+        'G': reference_cost['Gpf'] - item_cost['Gpf'],
+        'Kh': item_cost['Kh_npf'] - reference_cost['Kh_npf'],
+        'npf': item_cost['npf_max'] - reference_cost['npf_max'],
+        'Kma': item_cost['Kma'] - reference_cost['Kma'],
+        'Krm': item_cost['Krm'] - reference_cost['Krm'],
+    }
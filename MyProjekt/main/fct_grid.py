@@ -0,0 +1,212 @@
+'''
+Bearbeitung der gesamten FCT-Tabelle auf einer Seite
+
+FctGrid lädt Technologien, Merkmale, alle Zellen und die
+Leistungsfähigkeitsprofile (Auswahl je Werkzeug) mit einer festen Anzahl
+an Abfragen. Die eingetragenen Werte aller Zeilen werden gemeinsam geprüft
+(Output = Input der nächsten Technologie, Output der letzten Technologie =
+Zielwert des Merkmals) und nur geänderte Zellen mit bulk_update bzw.
+bulk_create abgespeichert.
+
+Das Formular sendet nur die geänderten Felder als ein JSON-Feld (CELLS_FIELD),
+da drei Felder pro Zelle bei großen Tabellen die Grenze von Django
+(DATA_UPLOAD_MAX_NUMBER_FIELDS) überschreiten. Nicht gesendete Felder
+behalten den gespeicherten Wert.
+'''
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from .fct_table import MEMBER_ORDER
+from .fuzzy import FuzzyProfiles, classify_cells
+from .models import (FctAttribute, FctMembership, FeatureAttribute,
+                     ToolAttribute)
+
+# (Merkmal id, FctMembership id)
+CellKey = Tuple[int, int]
+
+# eingetragene Werte einer Zelle: (Input, Output, ToolAttribute id)
+CellValues = Tuple[Optional[float], Optional[float], Optional[int]]
+
+# Eingabefelder einer Zelle und deren Typ (Komma als Dezimaltrennzeichen)
+CELL_FIELDS = ['input', 'output', 'tool_attribute']
+CELL_TYPES = [float, float, int]
+
+# Name des Formularfelds mit den geänderten Feldern als JSON
+# ({Feldname: Wert}, Feldnamen siehe field_name)
+CELLS_FIELD = 'cells'
+
+# abgespeicherte Felder beim Aktualisieren einer Zelle
+UPDATE_FIELDS = ['input', 'output', 'difference', 'tool_attribute',
+                 'input_possible', 'output_possible']
+
+
+def field_name(key: CellKey, field: str) -> str:
+    # Name des Eingabefelds einer Zelle im Formular
+    return f'{key[0]}-{key[1]}-{field}'
+
+
+class FctGrid:
+    '''
+    FCT-Tabelle eines Referenzsystems zur Bearbeitung
+    members: Technologien in Reihenfolge der Fertigungsprozessfolge
+    merkmale: Merkmale des Referenzbauteils (mit Feature)
+    cells: (Merkmal, Technologie) -> (pk, Input, Output, ToolAttribute,
+    Machbarkeit des Outputs)
+    choices: Werkzeug id -> Leistungsfähigkeitsprofile
+    '''
+
+    def __init__(self, reference_pk: int):
+        self.reference_pk = reference_pk
+        self.members = list(FctMembership.objects.filter(
+            reference=reference_pk).select_related('tool')
+            .order_by(*MEMBER_ORDER))
+        self.merkmale = list(FeatureAttribute.objects.filter(
+            feature__item__reference_id=reference_pk)
+            .select_related('feature').order_by('pk'))
+        self.cells: Dict[CellKey, Tuple] = {}
+        for pk, merkmal_id, membership_id, *values in \
+                FctAttribute.objects.filter(
+                    membership__reference=reference_pk).order_by('pk') \
+                .values_list('pk', 'feature_attribute_id', 'membership_id',
+                             'input', 'output', 'tool_attribute_id',
+                             'output_possible'):
+            self.cells[(merkmal_id, membership_id)] = (pk, *values)
+        self.attributes = ToolAttribute.objects.filter(
+            tool__in=[member.tool_id for member in self.members]) \
+            .select_related('tool').order_by('pk').in_bulk()
+        self.choices: Dict[int, List[ToolAttribute]] = {}
+        for attribute in self.attributes.values():
+            self.choices.setdefault(attribute.tool_id, []).append(attribute)
+
+    def keys(self, merkmal: FeatureAttribute) -> List[CellKey]:
+        # Zellen einer Zeile in Reihenfolge der Technologien
+        return [(merkmal.pk, member.pk) for member in self.members]
+
+    def stored(self, key: CellKey) -> CellValues:
+        cell = self.cells.get(key)
+        return (None, None, None) if cell is None else cell[1:4]
+
+    def parse(self, data: Mapping[str, Any]
+              ) -> Tuple[Dict[CellKey, CellValues], Dict[CellKey, List[str]]]:
+        '''
+        eingetragene Werte aller Zellen lesen (nicht enthaltene Felder
+        behalten den gespeicherten Wert)
+        Rückgabe: Werte und Fehler pro Zelle
+        '''
+        values, errors = {}, {}
+        for merkmal in self.merkmale:
+            for member, key in zip(self.members, self.keys(merkmal)):
+                cell = []
+                for field, convert, stored in zip(
+                        CELL_FIELDS, CELL_TYPES, self.stored(key)):
+                    name = field_name(key, field)
+                    if name not in data:
+                        cell.append(stored)
+                        continue
+                    value = str(data.get(name) or '')
+                    try:
+                        cell.append(convert(value.replace(',', '.'))
+                                    if value.strip() else None)
+                    except ValueError:
+                        errors.setdefault(key, []).append(
+                            f'{field}: ungültiger Wert')
+                        cell.append(None)
+                choice = self.attributes.get(cell[2])
+                if cell[2] is not None and (
+                        choice is None or choice.tool_id != member.tool_id):
+                    errors.setdefault(key, []).append(
+                        'Leistungsfähigkeitsprofil gehört nicht zum Werkzeug')
+                values[key] = tuple(cell)
+        return values, errors
+
+    def validate(self, values: Dict[CellKey, CellValues],
+                 errors: Dict[CellKey, List[str]]) -> Set[int]:
+        '''
+        alle Zeilen gemeinsam prüfen (Fehler werden an errors angehängt)
+        Zeilen ohne eingetragene und ohne gespeicherte Werte werden
+        übersprungen
+        Rückgabe: ids der zu speichernden Merkmale
+        '''
+        rows = set()
+        for merkmal in self.merkmale:
+            keys = self.keys(merkmal)
+            if all(value is None for key in keys
+                   for value in values[key] + self.stored(key)):
+                continue
+            rows.add(merkmal.pk)
+            for index, key in enumerate(keys):
+                value_in, value_out, tool_attribute = values[key]
+                if value_in is None or value_out is None or \
+                        tool_attribute is None:
+                    errors.setdefault(key, []).append('Werte fehlen')
+                    continue
+                # Output muss dem Input der nächsten Technologie entsprechen
+                if index < len(keys) - 1:
+                    value_next = values[keys[index + 1]][0]
+                    if value_next is not None and value_out != value_next:
+                        errors.setdefault(key, []).append(
+                            'Output != Input der nächsten Technologie')
+                # Output der letzten Technologie muss dem Zielwert entsprechen
+                elif value_out != merkmal.value:
+                    errors.setdefault(key, []).append(
+                        'stimmt nicht mit Zielwert überein')
+        return rows
+
+    def save(self, values: Dict[CellKey, CellValues],
+             rows: Set[int]) -> Set[int]:
+        '''
+        geänderte Zellen der geprüften Zeilen abspeichern (innerhalb von
+        transaction.atomic())
+        Rückgabe: ids der Feature mit geänderten Zellen
+        '''
+        features = {merkmal.pk: merkmal.feature_id
+                    for merkmal in self.merkmale}
+        created, updated = [], []
+        for key, (value_in, value_out, tool_attribute) in values.items():
+            if key[0] not in rows or \
+                    self.stored(key) == (value_in, value_out, tool_attribute):
+                continue
+            cell = FctAttribute(
+                feature_attribute_id=key[0], membership_id=key[1],
+                input=value_in, output=value_out,
+                tool_attribute_id=tool_attribute)
+            if key in self.cells:
+                cell.pk = self.cells[key][0]
+                updated.append(cell)
+            else:
+                created.append(cell)
+
+        cells = created + updated
+        if cells:
+            classify_cells(cells, FuzzyProfiles.from_tool_attributes(
+                self.attributes.values()))
+            FctAttribute.objects.bulk_update(updated, UPDATE_FIELDS)
+            FctAttribute.objects.bulk_create(created)
+        return {features[cell.feature_attribute_id] for cell in cells}
+
+    def rows(self, values: Optional[Dict[CellKey, CellValues]] = None,
+             errors: Optional[Dict[CellKey, List[str]]] = None
+             ) -> List[Dict[str, Any]]:
+        '''
+        Zeilen für das Template: Merkmal und pro Technologie Feldnamen,
+        Werte (eingetragen bzw. gespeichert), Auswahl und Fehler
+        '''
+        errors = errors or {}
+        rows = []
+        for merkmal in self.merkmale:
+            cells = []
+            for member, key in zip(self.members, self.keys(merkmal)):
+                value_in, value_out, tool_attribute = \
+                    values[key] if values else self.stored(key)
+                stored = self.cells.get(key)
+                cells.append({
+                    'names': {field: field_name(key, field)
+                              for field in CELL_FIELDS},
+                    'input': value_in, 'output': value_out,
+                    'tool_attribute': tool_attribute,
+                    # gespeicherte Werte (nur Änderungen werden gesendet)
+                    'stored': dict(zip(CELL_FIELDS, self.stored(key))),
+                    'choices': self.choices.get(member.tool_id, []),
+                    'possible': stored[4] if stored else None,
+                    'errors': errors.get(key, [])})
+            rows.append({'merkmal': merkmal, 'cells': cells})
+        return rows
@@ -0,0 +1,385 @@
+'''
+FCT-Tabelle eines Referenzsystems als dichte Matrix
+
+Die gesamte FCT-Tabelle wird mit wenigen Abfragen geladen und als
+(Merkmal x Technologie) Input-, Output- und Differenz-Matrix sowie als
+Index-Matrix der Leistungsfähigkeitsprofile (ToolAttribute) abgelegt.
+Fehlende Einträge sind NaN bzw. -1. Alle Verwender der FCT-Tabelle
+(Volumenberechnung, Preisbestimmung, Vollständigkeitsprüfung) arbeiten
+mit dieser Darstellung.
+
+Die Volumenberechnung speichert die Volumen je Feature und Technologie
+(FeatureVolume) sowie deren Summe je Technologie (FctMembership).
+'''
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import (FctAttribute, FctMembership, Feature, FeatureAttribute,
+                     FeatureVolume, ToolAttribute)
+from .utils import remove_umlaut
+from .volume_engine import VOLUME_FIELDS, calculate_volumes, volume_type_codes
+
+# Reihenfolge der Technologien in der Fertigungsprozessfolge
+MEMBER_ORDER = ('position', 'pk')
+
+# Index-Matrix: kein Leistungsfähigkeitsprofil eingetragen
+NO_TOOL_ATTRIBUTE = -1
+
+
+class FctTable:
+    '''
+    FCT-Tabelle eines Referenzsystems
+    members: Technologien (Spalten) in Reihenfolge der Fertigungsprozessfolge
+    merkmal_ids, merkmal_names, merkmal_features: Zeilen der Tabelle
+    features: (id, name, classifier, is_positive) aller Feature des
+    Referenzbauteils
+    input, output, difference: Matrizen (Merkmal x Technologie)
+    tool_attribute_ids: ids der Leistungsfähigkeitsprofile (Merkmal x
+    Technologie), tool_attributes: id -> ToolAttribute (falls geladen)
+    '''
+
+    def __init__(self, members: List[FctMembership],
+                 features: List[Tuple[int, str, str, bool]],
+                 merkmale: List[Tuple[int, int, str]],
+                 input: np.ndarray, output: np.ndarray,
+                 difference: Optional[np.ndarray] = None,
+                 tool_attribute_ids: Optional[np.ndarray] = None,
+                 tool_attributes: Optional[Dict[int, ToolAttribute]] = None):
+        self.members = members
+        self.features = features
+        self.merkmal_ids = [m[0] for m in merkmale]
+        self.merkmal_features = [m[1] for m in merkmale]
+        self.merkmal_names = [m[2] for m in merkmale]
+        self.input = input
+        self.output = output
+        self.difference = output - input if difference is None else difference
+        if tool_attribute_ids is None:
+            tool_attribute_ids = np.full(input.shape, NO_TOOL_ATTRIBUTE)
+        self.tool_attribute_ids = tool_attribute_ids
+        self.tool_attributes = tool_attributes or {}
+
+        # Zeilen- und Spaltenindex
+        self.row_index = {pk: index for index, pk in enumerate(self.merkmal_ids)}
+        self.column_index = {member.pk: index
+                             for index, member in enumerate(members)}
+
+    @classmethod
+    def load(cls, reference_pk: int, tool_attributes: bool = False,
+             feature_pk: Optional[int] = None) -> 'FctTable':
+        '''
+        vier Abfragen unabhängig von der Größe der Tabelle
+        tool_attributes: Leistungsfähigkeitsprofile (mit Werkzeug) für die
+        technologische Bewertung mitladen (eine weitere Abfrage)
+        feature_pk: nur die Zeilen eines Features laden
+        '''
+        features = Feature.objects.filter(item__reference_id=reference_pk)
+        merkmale = FeatureAttribute.objects.filter(
+            feature__item__reference_id=reference_pk)
+        cells = FctAttribute.objects.filter(membership__reference=reference_pk)
+        if feature_pk is not None:
+            features = features.filter(pk=feature_pk)
+            merkmale = merkmale.filter(feature_id=feature_pk)
+            cells = cells.filter(feature_attribute__feature_id=feature_pk)
+
+        members = list(FctMembership.objects.filter(
+            reference=reference_pk).select_related('tool__technology')
+            .order_by(*MEMBER_ORDER))
+        features = list(features.order_by('pk').values_list(
+            'pk', 'name', 'classifier', 'is_positive'))
+        merkmale = list(merkmale.order_by('pk').values_list(
+            'pk', 'feature_id', 'name'))
+
+        row = {m[0]: index for index, m in enumerate(merkmale)}
+        column = {member.pk: index for index, member in enumerate(members)}
+        shape = (len(merkmale), len(members))
+        input = np.full(shape, np.nan)
+        output = np.full(shape, np.nan)
+        difference = np.full(shape, np.nan)
+        tool_attribute_ids = np.full(shape, NO_TOOL_ATTRIBUTE)
+        for merkmal_id, membership_id, value_in, value_out, value_diff, \
+                tool_attribute_id in cells.order_by('pk').values_list(
+                    'feature_attribute_id', 'membership_id', 'input',
+                    'output', 'difference', 'tool_attribute_id'):
+            # leere Zellen (noch nicht ausgefüllt) bleiben NaN bzw. -1
+            if merkmal_id in row and tool_attribute_id is not None:
+                cell = row[merkmal_id], column[membership_id]
+                input[cell] = np.nan if value_in is None else value_in
+                output[cell] = np.nan if value_out is None else value_out
+                difference[cell] = np.nan if value_diff is None else value_diff
+                tool_attribute_ids[cell] = tool_attribute_id
+
+        attributes = None
+        if tool_attributes:
+            ids = np.unique(tool_attribute_ids[
+                tool_attribute_ids != NO_TOOL_ATTRIBUTE]).tolist()
+            attributes = ToolAttribute.objects.select_related('tool') \
+                .in_bulk(ids)
+        return cls(members, features, merkmale, input, output, difference,
+                   tool_attribute_ids, attributes)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.input.shape
+
+    def feature_rows(self) -> Dict[int, List[int]]:
+        # Zeilen der Matrix je Feature
+        rows = {}
+        for index, feature_id in enumerate(self.merkmal_features):
+            rows.setdefault(feature_id, []).append(index)
+        return rows
+
+    def rows(self, feature_id: int) -> List[int]:
+        # Zeilen eines Features
+        return [index for index, f_id in enumerate(self.merkmal_features)
+                if f_id == feature_id]
+
+    def row(self, merkmal_id: int) -> Dict[str, np.ndarray]:
+        # eine Zeile (Merkmal) über alle Technologien
+        index = self.row_index[merkmal_id]
+        return {'input': self.input[index], 'output': self.output[index],
+                'difference': self.difference[index],
+                'tool_attribute_ids': self.tool_attribute_ids[index]}
+
+    def column(self, member_pk: int) -> Dict[str, np.ndarray]:
+        # eine Spalte (Technologie) über alle Merkmale
+        index = self.column_index[member_pk]
+        return {'input': self.input[:, index],
+                'output': self.output[:, index],
+                'difference': self.difference[:, index],
+                'tool_attribute_ids': self.tool_attribute_ids[:, index]}
+
+    def take(self, rows: Optional[Sequence[int]] = None,
+             columns: Optional[Sequence[int]] = None) -> 'FctTable':
+        '''
+        Teiltabelle aus Zeilen- und Spaltenindizes
+        (z.B. die Merkmale eines Features oder ein Abschnitt der
+        Fertigungsprozessfolge)
+        '''
+        rows = list(range(len(self.merkmal_ids)) if rows is None else rows)
+        columns = list(range(len(self.members)) if columns is None
+                       else columns)
+        grid = np.ix_(np.asarray(rows, dtype=int),
+                      np.asarray(columns, dtype=int))
+        merkmale = [(self.merkmal_ids[index], self.merkmal_features[index],
+                     self.merkmal_names[index]) for index in rows]
+        feature_ids = set(m[1] for m in merkmale)
+        return FctTable(
+            [self.members[index] for index in columns],
+            [f for f in self.features if f[0] in feature_ids],
+            merkmale, self.input[grid], self.output[grid],
+            self.difference[grid], self.tool_attribute_ids[grid],
+            self.tool_attributes)
+
+    def missing(self) -> np.ndarray:
+        # Anzahl der nicht eingetragenen Zellen je Technologie
+        return np.sum(np.isnan(self.input) | np.isnan(self.output), axis=0)
+
+    @property
+    def complete(self) -> bool:
+        # alle In- und Outputs eingetragen (und mindestens eine Technologie)
+        return bool(self.members) and not self.missing().any()
+
+    def tool_attribute(self, row: int, column: int) -> Optional[ToolAttribute]:
+        # Leistungsfähigkeitsprofil einer Zelle (nur nach load(tool_attributes=True))
+        return self.tool_attributes.get(int(self.tool_attribute_ids[row, column]))
+
+
+class FctStatus:
+    '''
+    Vollständigkeit der FCT-Tabelle ohne die Zellen zu laden
+    members: Technologien in Reihenfolge der Fertigungsprozessfolge, mit
+    der Anzahl der noch nicht eingetragenen Zellen (member.missing)
+    '''
+
+    def __init__(self, members: List[FctMembership]):
+        self.members = members
+
+    @classmethod
+    def load(cls, reference_pk: int) -> 'FctStatus':
+        '''
+        eine Abfrage: Merkmale des Referenzbauteils abzüglich der
+        ausgefüllten Zellen je Technologie (wie FctTable.missing)
+        '''
+        merkmal_count = FeatureAttribute.objects.filter(
+            feature__item__reference=OuterRef('reference')).order_by() \
+            .values('feature__item__reference').annotate(
+                count=Count('pk')).values('count')
+        filled = Count('fctattribute__feature_attribute', distinct=True,
+                       filter=Q(
+                           fctattribute__input__isnull=False,
+                           fctattribute__output__isnull=False,
+                           fctattribute__tool_attribute__isnull=False,
+                           fctattribute__feature_attribute__feature__item__reference=F(
+                               'reference')))
+        members = FctMembership.objects.filter(reference=reference_pk) \
+            .select_related('tool__technology').order_by(*MEMBER_ORDER) \
+            .annotate(missing=Coalesce(Subquery(merkmal_count), Value(0))
+                      - filled)
+        return cls(list(members))
+
+    @property
+    def missing(self) -> Dict[int, int]:
+        # Anzahl der nicht eingetragenen Zellen je Technologie (id)
+        return {member.pk: member.missing for member in self.members}
+
+    @property
+    def complete(self) -> bool:
+        # wie FctTable.complete
+        return bool(self.members) and \
+            not any(member.missing for member in self.members)
+
+
+def feature_volumes(table: FctTable, strict: bool = True
+                    ) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Input- und Outputvolumen pro Feature und Technologie
+    (Feature x Technologie), mit Vorzeichen in Abhängigkeit des
+    Formelements (is_positive)
+    strict: fehlende In- und Outputs sind ein Fehler, sonst NaN
+    '''
+    shape = (len(table.features), len(table.members))
+    feature_rows = table.feature_rows()
+
+    # volumenbeschreibende Merkmale als (Feature x Technologie) Arrays
+    volume_input = {name: np.full(shape, np.nan) for name in VOLUME_FIELDS}
+    volume_output = {name: np.full(shape, np.nan) for name in VOLUME_FIELDS}
+    for index, (feature_id, _, _, _) in enumerate(table.features):
+        for row in feature_rows.get(feature_id, []):
+            name = remove_umlaut(table.merkmal_names[row])
+            if name not in VOLUME_FIELDS:
+                continue
+            if strict and (np.isnan(table.input[row]).any() or
+                           np.isnan(table.output[row]).any()):
+                raise ValueError(
+                    'Es sind nicht alle In- und Outputs eingetragen')
+            volume_input[name][index] = table.input[row]
+            volume_output[name][index] = table.output[row]
+
+    codes = np.broadcast_to(volume_type_codes(
+        [classifier.lower() for _, _, classifier, _ in table.features])[:, np.newaxis],
+        shape)
+    sign = np.array([1 if is_positive else -1
+                     for _, _, _, is_positive in table.features])[:, np.newaxis]
+    return sign * calculate_volumes(codes, **volume_input), \
+        sign * calculate_volumes(codes, **volume_output)
+
+
+def membership_volumes(table: FctTable) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Input- und Outputvolumen pro Technologie (FCT-Member)
+    Volumen der Feature werden in Abhängigkeit des Vorzeichens (is_positive)
+    aufsummiert
+    '''
+    volume_input, volume_output = feature_volumes(table)
+    return np.sum(volume_input, axis=0), np.sum(volume_output, axis=0)
+
+
+def save_membership_volumes(members: List[FctMembership],
+                            volume_input: np.ndarray,
+                            volume_output: np.ndarray) -> None:
+    # Volumen an die Technologien anhängen und gesammelt abspeichern
+    for index, member in enumerate(members):
+        member.input_volume = float(volume_input[index])
+        member.output_volume = float(volume_output[index])
+        member.difference_volume = float(abs(
+            volume_output[index] - volume_input[index]))
+    FctMembership.objects.bulk_update(
+        members, ['input_volume', 'output_volume', 'difference_volume'])
+
+
+def save_feature_volumes(table: FctTable, volume_input: np.ndarray,
+                         volume_output: np.ndarray) -> None:
+    # Volumen je Feature und Technologie der Feature der Tabelle ersetzen
+    FeatureVolume.objects.filter(
+        feature_id__in=[f[0] for f in table.features]).delete()
+    FeatureVolume.objects.bulk_create([
+        FeatureVolume(feature_id=feature_id, membership=member,
+                      input_volume=float(volume_input[row, column]),
+                      output_volume=float(volume_output[row, column]))
+        for row, (feature_id, _, _, _) in enumerate(table.features)
+        for column, member in enumerate(table.members)])
+
+
+def stored_feature_volumes(table: FctTable
+                           ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    '''
+    gespeicherte Volumen der Feature der Tabelle (Feature x Technologie)
+    None, falls nicht für alle Feature und Technologien vorhanden
+    '''
+    shape = (len(table.features), len(table.members))
+    volume_input = np.full(shape, np.nan)
+    volume_output = np.full(shape, np.nan)
+    rows = {f[0]: index for index, f in enumerate(table.features)}
+    for feature_id, membership_id, value_in, value_out in \
+            FeatureVolume.objects.filter(feature_id__in=rows).values_list(
+                'feature_id', 'membership_id', 'input_volume',
+                'output_volume'):
+        column = table.column_index.get(membership_id)
+        if column is not None:
+            volume_input[rows[feature_id], column] = value_in
+            volume_output[rows[feature_id], column] = value_out
+    if np.isnan(volume_input).any() or np.isnan(volume_output).any():
+        return None
+    return volume_input, volume_output
+
+
+def update_membership_volumes(reference_pk: int, feature_pk: int) -> bool:
+    '''
+    nach dem Bearbeiten von Zellen eines Features nur dessen Volumen neu
+    berechnen und die Volumen der Technologien um die Differenz zu den
+    gespeicherten Volumen (FeatureVolume) anpassen
+    Rückgabe False, falls die Volumen neu berechnet werden müssen (noch
+    nicht berechnet, Fertigungsprozessfolge geändert oder Feature
+    unvollständig)
+    '''
+    table = FctTable.load(reference_pk, feature_pk=feature_pk)
+    members = table.members
+    if any(member.input_volume is None or member.output_volume is None
+           for member in members):
+        return False
+    stored = stored_feature_volumes(table)
+    if stored is None:
+        return False
+    new_input, new_output = feature_volumes(table, strict=False)
+    if not (np.isfinite(new_input).all() and np.isfinite(new_output).all()):
+        return False
+
+    delta_input = np.sum(new_input - stored[0], axis=0)
+    delta_output = np.sum(new_output - stored[1], axis=0)
+    changed = (delta_input != 0) | (delta_output != 0)
+    if not changed.any():
+        return True
+    save_feature_volumes(table, new_input, new_output)
+    save_membership_volumes(
+        [member for member, flag in zip(members, changed) if flag],
+        np.array([m.input_volume for m in members])[changed] +
+        delta_input[changed],
+        np.array([m.output_volume for m in members])[changed] +
+        delta_output[changed])
+    return True
+
+
+def recalculate_membership_volumes(reference_pk: int) -> None:
+    '''
+    Volumen aller Feature und Technologien aus der gesamten FCT-Tabelle neu
+    berechnen (Fehler, falls nicht alle In- und Outputs eingetragen sind)
+    '''
+    table = FctTable.load(reference_pk)
+    volume_input, volume_output = feature_volumes(table)
+    save_feature_volumes(table, volume_input, volume_output)
+    save_membership_volumes(table.members, np.sum(volume_input, axis=0),
+                            np.sum(volume_output, axis=0))
+
+
+def create_empty_cells(members: List[FctMembership],
+                       merkmale: List[FeatureAttribute]) -> List[FctAttribute]:
+    '''
+    leere FCT-Zellen für neue Merkmale in allen Technologien anlegen
+    (ein bulk_create, die Werte werden anschließend im Formular eingetragen)
+    '''
+    cells = [FctAttribute(membership=member, feature_attribute=merkmal)
+             for merkmal in merkmale for member in members]
+    return FctAttribute.objects.bulk_create(cells)
@@ -7,7 +7,8 @@ from django.forms.formsets import formset_factory
 from django.forms.models import ModelChoiceField
 
 
-from .utils import processing_excel_file_buffer
+from .upload_cache import is_cached
+from .utils import check_excel_file, contour_row
 from .models import FctMembership, ReferenceSystem, Tool
 
 log = logging.getLogger(__name__)
@@ -31,16 +32,15 @@ class ReferenceItemUploadForm(forms.Form):
         super().clean()
         file_buffer = self.cleaned_data.get('file')
         try:
-            # process buffer and create datafame
-            df = processing_excel_file_buffer(self, file_buffer)
-            self.process_dataframe = df
-
-            # simple verification
-            verification_names = [
-                'name', 'classifier', 'prismatic', 'positive']
-            if not all(item in df.columns.tolist()
-                       for item in verification_names):
-                raise ValidationError('Excel-Format stimmt nicht.')
+            # Pflichtspalten und Kontur prüfen, die Datei wird anschließend
+            # im Hintergrund eingelesen (siehe jobs.py), bereits
+            # hochgeladene Dateien nicht erneut prüfen
+            payload = file_buffer.read()
+            file_buffer.seek(0)
+            if not is_cached(self.cleaned_data, payload):
+                check_excel_file(file_buffer)
+            contour_row(self.cleaned_data)
+            file_buffer.seek(0)
 
         # consume error generate by processing buffer or validation
         except Exception as err:
@@ -69,16 +69,15 @@ class ItemUploadForm(forms.Form):
         super().clean()
         file_buffer = self.cleaned_data.get('file')
         try:
-            # process buffer and create datafame
-            df = processing_excel_file_buffer(self, file_buffer)
-            self.process_dataframe = df
-
-            # simple verification
-            verification_names = [
-                'name', 'classifier', 'prismatic', 'positive']
-            if not all(item in df.columns.tolist()
-                       for item in verification_names):
-                raise ValidationError('Excel-Format stimmt nicht.')
+            # Pflichtspalten und Kontur prüfen, die Datei wird anschließend
+            # im Hintergrund eingelesen (siehe jobs.py), bereits
+            # hochgeladene Dateien nicht erneut prüfen
+            payload = file_buffer.read()
+            file_buffer.seek(0)
+            if not is_cached(self.cleaned_data, payload):
+                check_excel_file(file_buffer)
+            contour_row(self.cleaned_data)
+            file_buffer.seek(0)
 
         # consume error generate by processing buffer or validation
         except Exception as err:
@@ -0,0 +1,138 @@
+'''
+Vektorisierte technologische Machbarkeitsprüfung
+
+Gleiche Einteilung wie ToolAttribute.fuzzy_check, jedoch für beliebig
+viele Werte gleichzeitig: die Leistungsfähigkeitsprofile werden einmal als
+a/b/c/d Arrays geladen und ganze Wertematrizen in einem NumPy-Aufruf
+bewertet. Zusätzlich zur Klasse wird der Zugehörigkeitsgrad (Trapez
+a-b-c-d, 1 = sicher machbar, 0 = nicht machbar) bestimmt.
+'''
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .models import FctAttribute, ToolAttribute
+
+# Klassen von ToolAttribute.fuzzy_check (Index = Code)
+POSSIBLE = 'technologisch Machbar'
+EXPERIMENTAL = 'technologische Machbarkeit mit Unsicherheiten'
+NOT_POSSIBLE = 'technologisch NICHT umsetzbar'
+LABELS = np.array([POSSIBLE, EXPERIMENTAL, NOT_POSSIBLE], dtype=object)
+
+
+def classify(values: Any, a: Any, b: Any, c: Any,
+             d: Any) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Werte gegen die Trapeze a/b/c/d bewerten (Arrays werden broadcastet)
+    Rückgabe: Codes (Index in LABELS) und Zugehörigkeitsgrad
+    '''
+    values = np.asarray(values, dtype=float)
+    a, b, c, d = (np.asarray(x, dtype=float) for x in (a, b, c, d))
+
+    possible = (b <= values) & (values <= c)
+    experimental = ~possible & (a <= values) & (values <= d)
+    codes = np.where(possible, 0, np.where(experimental, 1, 2))
+
+    # Zugehörigkeitsgrad: steigende Flanke a-b, Plateau b-c, fallende c-d
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rising = np.where(b > a, (values - a) / (b - a), 1.0)
+        falling = np.where(d > c, (d - values) / (d - c), 1.0)
+    degree = np.where(possible, 1.0, np.where(
+        experimental & (values < b), rising, np.where(
+            experimental, falling, 0.0)))
+    return codes, np.clip(degree, 0.0, 1.0)
+
+
+def labels(codes: Any) -> np.ndarray:
+    # Codes in die Klassen von fuzzy_check umwandeln
+    return LABELS[np.asarray(codes, dtype=int)]
+
+
+class FuzzyProfiles:
+    '''
+    Leistungsfähigkeitsprofile (ToolAttribute) als a/b/c/d Arrays
+    ids: ToolAttribute ids, Position = Index in den Arrays
+    '''
+
+    def __init__(self, ids: List[int], a: np.ndarray, b: np.ndarray,
+                 c: np.ndarray, d: np.ndarray):
+        self.ids = ids
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+        self.index = {pk: index for index, pk in enumerate(ids)}
+
+    @classmethod
+    def from_tool_attributes(cls, attributes: Iterable[ToolAttribute]
+                             ) -> 'FuzzyProfiles':
+        # bereits geladene Profile (z.B. FctTable.tool_attributes)
+        rows = [(t.pk, t.a, t.b, t.c, t.d) for t in attributes]
+        return cls._from_rows(rows)
+
+    @classmethod
+    def load(cls, ids: Iterable[int]) -> 'FuzzyProfiles':
+        # eine Abfrage für alle benötigten Profile
+        rows = ToolAttribute.objects.filter(pk__in=set(ids)) \
+            .values_list('pk', 'a', 'b', 'c', 'd')
+        return cls._from_rows(list(rows))
+
+    @classmethod
+    def _from_rows(cls, rows: List[Tuple[int, float, float, float, float]]
+                   ) -> 'FuzzyProfiles':
+        values = np.array([row[1:] for row in rows], dtype=float) \
+            .reshape(len(rows), 4)
+        return cls([row[0] for row in rows], values[:, 0], values[:, 1],
+                   values[:, 2], values[:, 3])
+
+    def positions(self, ids: Any) -> np.ndarray:
+        # ToolAttribute ids (beliebige Form) in Array-Indizes umwandeln
+        ids = np.asarray(ids, dtype=int)
+        try:
+            return np.vectorize(self.index.__getitem__, otypes=[int])(ids) \
+                if ids.size else ids
+        except KeyError as err:
+            raise ValueError(
+                f'Leistungsfähigkeitsprofil {err.args[0]} nicht geladen')
+
+    def evaluate(self, values: Any, ids: Any) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Werte mit den Profilen ids bewerten (gleiche Form oder broadcastbar)
+        Rückgabe: Klassen (Texte wie fuzzy_check) und Zugehörigkeitsgrad
+        '''
+        index = self.positions(ids)
+        codes, degree = classify(values, self.a[index], self.b[index],
+                                 self.c[index], self.d[index])
+        return labels(codes), degree
+
+
+def classify_cells(cells: List[FctAttribute],
+                   profiles: Optional[FuzzyProfiles] = None) -> None:
+    '''
+    Differenz und Machbarkeit vieler FCT-Zellen auf einmal bestimmen
+    (entspricht FctAttribute.calculate_difference_and_fuzzy_logic, ohne
+    das Leistungsfähigkeitsprofil pro Zelle nachzuladen), z.B. vor
+    bulk_create/bulk_update
+    '''
+    if not cells:
+        return
+    if profiles is None:
+        profiles = FuzzyProfiles.load(
+            cell.tool_attribute_id for cell in cells)
+    values_in = np.array([cell.input for cell in cells], dtype=float)
+    values_out = np.array([cell.output for cell in cells], dtype=float)
+    ids = [cell.tool_attribute_id for cell in cells]
+    input_possible, _ = profiles.evaluate(values_in, ids)
+    output_possible, _ = profiles.evaluate(values_out, ids)
+    difference = values_out - values_in
+
+    for index, cell in enumerate(cells):
+        cell.difference = float(difference[index])
+        if difference[index] != 0:
+            cell.input_possible = input_possible[index]
+            cell.output_possible = output_possible[index]
+        else:
+            # if "no difference" set in- and outputs as "possible"
+            cell.input_possible = FctAttribute.POSSIBLE
+            cell.output_possible = FctAttribute.POSSIBLE
+
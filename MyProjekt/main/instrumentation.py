@@ -0,0 +1,146 @@
+'''
+Messung von Datenbankabfragen und Rechenzeiten
+
+Pro Request (ProfilingMiddleware) bzw. pro Hintergrundauftrag werden die
+SQL-Abfragen (Anzahl, Zeit, Wiederholungen) sowie benannte Abschnitte
+(stage) aufgezeichnet. Die Zusammenfassung wird als strukturierte
+Logzeile (JSON) ausgegeben und im Request zusätzlich als Response-Header
+(X-Query-Count, X-Query-Time, X-Query-Duplicates, Server-Timing).
+'''
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from django.db import connections
+from django.http.request import HttpRequest
+from django.http.response import HttpResponse
+
+log = logging.getLogger(__name__)
+
+# Anzahl der am häufigsten wiederholten Abfragen in der Logzeile
+DUPLICATE_SAMPLES = 3
+# Länge des SQL-Textes in der Logzeile (z.B. bei bulk_create)
+SQL_SAMPLE_LENGTH = 200
+
+_current: ContextVar[Optional['Profile']] = ContextVar(
+    'profile', default=None)
+
+
+class Profile:
+    '''
+    Messwerte eines Requests bzw. Hintergrundauftrags
+    stages: Name -> Dauer in s (mehrfach durchlaufene Abschnitte werden
+    aufsummiert)
+    '''
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.query_count = 0
+        self.query_time = 0.0
+        self.queries: Counter = Counter()
+        self.stages: Dict[str, float] = {}
+
+    def execute(self, execute: Callable, sql: str, params: Any, many: bool,
+                context: Dict[str, Any]) -> Any:
+        # connection.execute_wrapper: jede Abfrage zählen und messen
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - start
+            self.query_count += 1
+            self.queries[sql] += 1
+
+    @property
+    def duplicates(self) -> int:
+        # Abfragen, deren SQL bereits ausgeführt wurde (z.B. N+1 Muster)
+        return sum(count - 1 for count in self.queries.values())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'duration_ms': round(self.duration * 1000, 1),
+            'queries': self.query_count,
+            'query_ms': round(self.query_time * 1000, 1),
+            'duplicates': self.duplicates,
+            'duplicate_sql': [
+                {'sql': sql[:SQL_SAMPLE_LENGTH], 'count': count}
+                for sql, count in self.queries.most_common(DUPLICATE_SAMPLES)
+                if count > 1],
+            'stages_ms': {name: round(seconds * 1000, 1)
+                          for name, seconds in self.stages.items()},
+        }
+
+    def headers(self) -> Dict[str, str]:
+        timings = [f'total;dur={self.duration * 1000:.1f}',
+                   f'sql;dur={self.query_time * 1000:.1f}']
+        timings.extend(
+            f'{name.replace(" ", "-")};dur={seconds * 1000:.1f}'
+            for name, seconds in self.stages.items())
+        return {
+            'X-Query-Count': str(self.query_count),
+            'X-Query-Time': f'{self.query_time * 1000:.1f}',
+            'X-Query-Duplicates': str(self.duplicates),
+            'Server-Timing': ', '.join(timings),
+        }
+
+
+@contextmanager
+def profile(name: str) -> Iterator[Profile]:
+    '''
+    alle Abfragen und Abschnitte innerhalb des Blocks aufzeichnen
+    (auf allen Datenbankverbindungen des aktuellen Threads)
+    '''
+    current = Profile(name)
+    token = _current.set(current)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(current.execute))
+            yield current
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _current.reset(token)
+        log.info(json.dumps(current.summary(), ensure_ascii=False))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    '''
+    Dauer eines benannten Abschnitts messen, z.B.
+    with stage('item cost'): ...
+    (ausgegeben nur in der Zusammenfassung von profile, außerhalb eines
+    profile-Blocks wird nichts aufgezeichnet)
+    '''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        current = _current.get()
+        if current is not None:
+            current.stages[name] = current.stages.get(name, 0.0) + seconds
+
+
+class ProfilingMiddleware:
+    '''
+    Abfragen und Abschnitte pro Request messen, als Logzeile und
+    Response-Header ausgeben
+    '''
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with profile(f'{request.method} {request.path}') as current:
+            response = self.get_response(request)
+        for header, value in current.headers().items():
+            response[header] = value
+        return response
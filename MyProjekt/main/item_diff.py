@@ -0,0 +1,136 @@
+'''
+Strukturvergleich der Vergleichsbauteile mit dem Referenzbauteil
+
+Neue, entfallene und geänderte Feature und Merkmale werden einmal beim
+Hochladen (bzw. nach dem Erweitern der Referenz-FCT) bestimmt und als
+ItemDifference abgespeichert. Detailseite und "FCT-Erweitern" lesen nur
+noch diese Zeilen.
+'''
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+
+from .models import Feature, FeatureAttribute, Item, ItemDifference
+
+# Anzahl der Vergleichsbauteile die gemeinsam geladen werden
+CHUNK_SIZE = 200
+
+# Aufbau eines Bauteils: Featurename -> Merkmalname -> Wert
+Structure = Dict[str, Dict[str, float]]
+
+
+def load_structures(item_ids: List[int]) -> Dict[int, Structure]:
+    # Feature und Merkmale mehrerer Bauteile mit zwei Abfragen laden
+    structures = {item_id: {} for item_id in item_ids}
+    for item_id, f_name in Feature.objects.filter(item_id__in=item_ids) \
+            .order_by('pk').values_list('item_id', 'name'):
+        structures[item_id].setdefault(f_name, {})
+    for item_id, f_name, m_name, value in FeatureAttribute.objects \
+            .filter(feature__item_id__in=item_ids).order_by('pk') \
+            .values_list('feature__item_id', 'feature__name', 'name', 'value'):
+        # bei gleichnamigen Merkmalen zählt das zuerst angelegte
+        structures[item_id][f_name].setdefault(m_name, value)
+    return structures
+
+
+def compare_structures(item_id: int, reference: Structure,
+                       item: Structure) -> List[ItemDifference]:
+    '''
+    Bauteilvergleich auf Feature- und Merkmalsebene
+    alle Feature die im Referenzbauteil als auch im Vergleichsbauteil sind
+    werden hinsichtlich ihrer Merkmale verglichen
+    '''
+    differences = []
+    for f_name in item.keys() - reference.keys():
+        differences.append(ItemDifference(
+            item_id=item_id, kind=ItemDifference.ADDED, feature_name=f_name))
+    for f_name in reference.keys() - item.keys():
+        differences.append(ItemDifference(
+            item_id=item_id, kind=ItemDifference.REMOVED,
+            feature_name=f_name))
+
+    for f_name in reference.keys() & item.keys():
+        merkmale_s, merkmale_i = reference[f_name], item[f_name]
+        for m_name in merkmale_i.keys() - merkmale_s.keys():
+            differences.append(ItemDifference(
+                item_id=item_id, kind=ItemDifference.ADDED,
+                feature_name=f_name, merkmal_name=m_name,
+                value_item=merkmale_i[m_name]))
+        for m_name in merkmale_s.keys() - merkmale_i.keys():
+            differences.append(ItemDifference(
+                item_id=item_id, kind=ItemDifference.REMOVED,
+                feature_name=f_name, merkmal_name=m_name,
+                value_reference=merkmale_s[m_name]))
+        for m_name in merkmale_s.keys() & merkmale_i.keys():
+            if merkmale_s[m_name] != merkmale_i[m_name]:
+                differences.append(ItemDifference(
+                    item_id=item_id, kind=ItemDifference.CHANGED,
+                    feature_name=f_name, merkmal_name=m_name,
+                    value_reference=merkmale_s[m_name],
+                    value_item=merkmale_i[m_name]))
+
+    differences.sort(key=lambda d: (d.feature_name, d.merkmal_name or '',
+                                    d.kind))
+    return differences
+
+
+def update_differences(reference_pk: int,
+                       item_ids: Optional[Iterable[int]] = None,
+                       chunk_size: int = CHUNK_SIZE) -> None:
+    '''
+    Strukturvergleich für Vergleichsbauteile eines Referenzsystems neu
+    berechnen (Standard: alle Vergleichsbauteile)
+    '''
+    if item_ids is None:
+        item_ids = Item.objects.filter(compare_reference=reference_pk) \
+            .order_by('pk').values_list('pk', flat=True)
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+
+    reference_item = Item.objects.filter(reference=reference_pk) \
+        .values_list('pk', flat=True).first()
+    reference = {}
+    if reference_item is not None:
+        reference = load_structures([reference_item])[reference_item]
+
+    for start in range(0, len(item_ids), chunk_size):
+        chunk = item_ids[start:start + chunk_size]
+        structures = load_structures(chunk)
+        differences = []
+        for item_id in chunk:
+            differences.extend(compare_structures(
+                item_id, reference, structures[item_id]))
+        with transaction.atomic():
+            ItemDifference.objects.filter(item_id__in=chunk).delete()
+            ItemDifference.objects.bulk_create(differences)
+            # ohne Referenzbauteil wird der Vergleich beim Anzeigen
+            # wiederholt (Referenzbauteil wird evtl. gerade hochgeladen)
+            Item.objects.filter(pk__in=chunk).update(
+                differences_ready=reference_item is not None)
+
+
+def item_differences(item: Item) -> List[ItemDifference]:
+    # Strukturvergleich eines Bauteils (einmalig berechnen, falls noch
+    # nicht vorhanden, z.B. für vor der Einführung hochgeladene Bauteile)
+    if not item.differences_ready and item.compare_reference_id is not None:
+        update_differences(item.compare_reference_id, [item.pk])
+    return list(ItemDifference.objects.filter(item=item).order_by('pk'))
+
+
+def added_features(differences: List[ItemDifference]) -> List[str]:
+    # Feature die ausschließlich im Vergleichsbauteil sind
+    return [d.feature_name for d in differences
+            if d.kind == ItemDifference.ADDED and d.merkmal_name is None]
+
+
+def removed_features(differences: List[ItemDifference]) -> List[str]:
+    # Feature die ausschließlich im Referenzbauteil sind
+    return [d.feature_name for d in differences
+            if d.kind == ItemDifference.REMOVED and d.merkmal_name is None]
+
+
+def added_merkmale(differences: List[ItemDifference]) -> List[ItemDifference]:
+    # neue Merkmale bekannter Feature des Vergleichsbauteils
+    return [d for d in differences
+            if d.kind == ItemDifference.ADDED and d.merkmal_name is not None]
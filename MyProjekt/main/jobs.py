@@ -0,0 +1,252 @@
+'''
+Hintergrundaufträge mit einer Warteschlange in der Datenbank
+
+Views legen einen Job an (enqueue) und leiten direkt auf die Statusseite
+weiter. Die Bearbeitung übernimmt ein Thread-Pool im Webprozess
+(settings.JOB_WORKERS) oder der Befehl "manage.py run_jobs". Ein Job wird
+über ein bedingtes UPDATE (pending -> running) genau einem Worker zugeteilt.
+
+Wird der Worker beendet (z.B. Neustart des Webprozesses), bleiben Jobs im
+Status running bzw. pending liegen: laufende Jobs, deren Fortschritt länger
+als settings.JOB_TIMEOUT nicht aktualisiert wurde, gelten als abgebrochen,
+wartende Jobs werden beim Start des Thread-Pools erneut übergeben.
+'''
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import (IntegrityError, close_old_connections, connections,
+                       transaction)
+from django.urls import reverse
+from django.utils import timezone
+
+from .instrumentation import profile, stage
+from .item_diff import update_differences
+from .models import Item, Job, ReferenceSystem
+from .pricing import (load_halbzeug_volumes, load_item_features,
+                      load_reference, price_items, save_prices,
+                      save_reference_cost)
+from .upload_cache import clone_item, read_upload, remember_item
+from .utils import create_features_from_rows
+
+log = logging.getLogger(__name__)
+
+# Job-Typ -> Funktion, die den Job abarbeitet
+HANDLERS: Dict[str, Callable[[Job], None]] = {}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def handler(kind: str) -> Callable:
+    # Funktion für einen Job-Typ registrieren
+    def register(function: Callable[[Job], None]) -> Callable[[Job], None]:
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def enqueue(kind: str, parameters: Dict[str, Any],
+            payload: Optional[bytes] = None,
+            key: Optional[str] = None) -> Job:
+    '''
+    Job anlegen und nach dem Commit an den Thread-Pool übergeben
+    key: solange ein Job mit gleichem key wartet oder läuft, wird dieser
+    zurückgegeben statt einen weiteren anzulegen
+    '''
+    if key is not None:
+        recover_stale_jobs()
+        job = active_job(key)
+        if job is not None:
+            return job
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(kind=kind, parameters=parameters,
+                                     payload=payload, key=key)
+    except IntegrityError:
+        # gleichzeitig von einem anderen Request angelegt
+        # (partieller UNIQUE-Index auf key)
+        job = active_job(key)
+        if job is None:
+            raise
+        return job
+    transaction.on_commit(lambda: submit(job.pk))
+    return job
+
+
+def active_job(key: str) -> Optional[Job]:
+    # wartender bzw. laufender Job mit dem key
+    return Job.objects.filter(
+        key=key, status__in=[Job.PENDING, Job.RUNNING]).first()
+
+
+def recover_stale_jobs() -> int:
+    '''
+    laufende Jobs ohne Fortschritt seit settings.JOB_TIMEOUT (Worker beendet)
+    als fehlgeschlagen markieren, damit der key wieder frei ist
+    Rückgabe: Anzahl der abgebrochenen Jobs
+    '''
+    now = timezone.now()
+    timeout = timedelta(seconds=getattr(settings, 'JOB_TIMEOUT', 600))
+    count = Job.objects.filter(status=Job.RUNNING,
+                               updated__lt=now - timeout).update(
+        status=Job.FAILED, message='abgebrochen (Worker beendet)',
+        updated=now)
+    if count:
+        log.warning(f'{count} abgebrochene Jobs als fehlgeschlagen markiert')
+    return count
+
+
+def start_workers() -> Optional[ThreadPoolExecutor]:
+    '''
+    Thread-Pool des Webprozesses starten (falls konfiguriert) und die nach
+    einem Neustart liegengebliebenen Jobs übernehmen
+    '''
+    global _executor
+    workers = getattr(settings, 'JOB_WORKERS', 0)
+    if not workers:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='job')
+            recover_stale_jobs()
+            for pk in pending_jobs():
+                _executor.submit(execute, pk)
+    return _executor
+
+
+def submit(pk: int) -> None:
+    # Job im Thread-Pool des Webprozesses starten (falls konfiguriert),
+    # doppelt übergebene Jobs werden von claim() verworfen
+    executor = start_workers()
+    if executor is not None:
+        executor.submit(execute, pk)
+
+
+def execute(pk: int) -> None:
+    # jeder Thread hat eine eigene Datenbankverbindung
+    close_old_connections()
+    try:
+        job = claim(pk)
+        if job is not None:
+            run(job)
+    finally:
+        connections.close_all()
+
+
+def claim(pk: int) -> Optional[Job]:
+    # Job nur übernehmen, wenn er noch von keinem anderen Worker bearbeitet wird
+    claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+        status=Job.RUNNING, updated=timezone.now())
+    if not claimed:
+        return None
+    return Job.objects.get(pk=pk)
+
+
+def pending_jobs() -> List[int]:
+    # ids aller wartenden Jobs (älteste zuerst)
+    return list(Job.objects.filter(status=Job.PENDING)
+                .order_by('pk').values_list('pk', flat=True))
+
+
+def report(job: Job, progress: int, message: str = '') -> None:
+    # Fortschritt abspeichern (wird von der Statusseite abgefragt)
+    job.progress = progress
+    job.message = message
+    Job.objects.filter(pk=job.pk).update(
+        progress=progress, message=message, updated=timezone.now())
+
+
+def run(job: Job) -> None:
+    '''
+    Job abarbeiten und Ergebnis bzw. Fehler abspeichern
+    '''
+    try:
+        with profile(f'job {job.kind} {job.pk}'):
+            HANDLERS[job.kind](job)
+    except Exception as err:
+        log.exception(err)
+        job.status = Job.FAILED
+        job.message = str(err)[:255] or err.__class__.__name__
+    else:
+        job.status = Job.DONE
+        job.progress = 100
+        # hochgeladene Datei wird nach dem Einlesen nicht mehr benötigt
+        job.payload = None
+    job.save(update_fields=['status', 'progress', 'message', 'payload',
+                            'result_url', 'updated'])
+
+
+def _read_rows(job: Job) -> Tuple[str, List[Dict[str, Any]], Optional[Item]]:
+    report(job, 10, 'Excel-Datei wird gelesen')
+    with stage('parse excel'):
+        key, rows, source = read_upload(job.parameters, job.payload)
+    report(job, 50, f'{len(rows)} Feature werden abgespeichert')
+    return key, rows, source
+
+
+@handler(Job.UPLOAD_REFERENCE)
+def upload_reference(job: Job) -> None:
+    # Referenzbauteil einlesen und mit Feature und Merkmalen abspeichern
+    system = ReferenceSystem.objects.get(pk=job.parameters['reference'])
+    _, rows, _ = _read_rows(job)
+    with transaction.atomic():
+        item = Item.objects.create(reference=system,
+                                   name=job.parameters['name'])
+        create_features_from_rows(rows, item)
+    # Strukturvergleich der bereits hochgeladenen Vergleichsbauteile
+    update_differences(system.pk)
+    job.result_url = reverse('referencemodel-detail', args=[str(system.id)])
+
+
+@handler(Job.UPLOAD_ITEM)
+def upload_item(job: Job) -> None:
+    '''
+    Vergleichsbauteil einlesen und mit Feature und Merkmalen abspeichern
+    (bei bereits hochgeladener Datei wird das vorherige Bauteil kopiert)
+    '''
+    system = ReferenceSystem.objects.get(
+        pk=job.parameters['compare_reference'])
+    key, rows, source = _read_rows(job)
+    with transaction.atomic():
+        item = Item.objects.create(compare_reference=system,
+                                   name=job.parameters['name'])
+        if source is not None and source.compare_reference_id is not None:
+            clone_item(source, item)
+        else:
+            create_features_from_rows(rows, item)
+            remember_item(key, item)
+    # Strukturvergleich mit dem Referenzbauteil
+    update_differences(system.pk, [item.pk])
+    job.result_url = reverse('item-detail', args=[str(item.id)])
+
+
+def price_item_key(item_id: int, reference_id: int) -> str:
+    # eine Berechnung pro (Bauteil, Referenzsystem) gleichzeitig
+    return f'{Job.PRICE_ITEM}:{item_id}:{reference_id}'
+
+
+@handler(Job.PRICE_ITEM)
+def price_item(job: Job) -> None:
+    '''
+    FCT-Tabelle rückwärts füllen, Volumen und Kosten des Vergleichsbauteils
+    berechnen und die Änderungskosten abspeichern
+    '''
+    system = ReferenceSystem.objects.get(pk=job.parameters['reference'])
+    item_ids = [job.parameters['item']]
+
+    # FCT-Tabelle, Fertigungsprozessfolge und Kosten des Referenzbauteils
+    report(job, 10, 'Kosten des Referenzbauteils werden berechnet')
+    basis = load_reference(system)
+
+    report(job, 50, 'Kosten des Vergleichsbauteils werden berechnet')
+    prices = price_items(basis, load_item_features(item_ids),
+                         load_halbzeug_volumes(item_ids))
+    with transaction.atomic():
+        save_reference_cost(basis)
+        save_prices(prices)
+    job.result_url = reverse('item-detail', args=[str(job.parameters['item'])])
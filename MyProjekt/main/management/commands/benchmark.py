@@ -0,0 +1,54 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+
+from main.benchmark import (FEATURE_COUNTS, TECHNOLOGY_COUNTS, run_benchmark,
+                            run_query_plans)
+
+
+class Command(BaseCommand):
+    '''
+    Benchmark Excel -> FCT-Tabelle -> Kosten mit synthetischen Daten
+    läuft in einer eigenen Test-Datenbank (SQLite: im Arbeitsspeicher),
+    die Datenbank der Anwendung wird nicht verändert
+    '''
+    help = 'Verarbeitungskette mit synthetischen Daten messen (JSON)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--features', type=int, nargs='+',
+                            default=FEATURE_COUNTS)
+        parser.add_argument('--technologies', type=int, nargs='+',
+                            default=TECHNOLOGY_COUNTS)
+        parser.add_argument('--repeat', type=int, default=1,
+                            help='Durchläufe pro Größe (Median)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--plans', action='store_true',
+                            help='Ausführungspläne für die größte Tabelle')
+        parser.add_argument('--output', help='JSON-Datei (Standard: stdout)')
+
+    def handle(self, *args, **options):
+        # Logzeilen der einzelnen Schritte nur mit -v 2
+        if options['verbosity'] < 2:
+            logging.getLogger('main').setLevel(logging.WARNING)
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            scenarios = run_benchmark(
+                options['features'], options['technologies'],
+                repeat=options['repeat'], seed=options['seed'])
+            output = {'scenarios': scenarios}
+            if options['plans']:
+                output['query_plans'] = run_query_plans(
+                    max(options['features']), max(options['technologies']),
+                    seed=options['seed'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        result = json.dumps(output, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(result)
+            self.stdout.write(f'{len(scenarios)} Größen -> {options["output"]}')
+        else:
+            self.stdout.write(result)
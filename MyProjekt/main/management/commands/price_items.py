@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import ReferenceSystem
+from main.pricing import CHUNK_SIZE, price_reference_items
+
+
+class Command(BaseCommand):
+    '''
+    Alle Vergleichsbauteile eines oder aller Referenzsysteme neu bepreisen
+    (z.B. als nächtlicher Lauf)
+    '''
+    help = 'Vergleichsbauteile eines Referenzsystems gesammelt berechnen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('reference', nargs='*', type=int,
+                            help='ids der Referenzsysteme (Standard: alle)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Anzahl der Prozesse (Standard: alle Kerne)')
+
+    def handle(self, *args, **options):
+        systems = ReferenceSystem.objects.order_by('pk')
+        if options['reference']:
+            systems = systems.filter(pk__in=options['reference'])
+            if len(systems) != len(set(options['reference'])):
+                raise CommandError('Referenzsystem nicht gefunden')
+
+        for system in systems:
+            try:
+                priced = price_reference_items(
+                    system, chunk_size=options['chunk_size'],
+                    workers=options['workers'])
+            except Exception as err:
+                # Referenzsystem unvollständig (z.B. FCT-Tabelle, Halbzeug)
+                self.stderr.write(f'{system}: {err!r}')
+                continue
+            self.stdout.write(f'{system}: {priced} Vergleichsbauteile berechnet')
@@ -0,0 +1,36 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from main.jobs import execute, pending_jobs, recover_stale_jobs
+
+
+class Command(BaseCommand):
+    '''
+    Worker für Hintergrundaufträge (z.B. wenn im Webprozess
+    JOB_WORKERS = 0 gesetzt ist oder nach einem Neustart)
+    '''
+    help = 'Wartende Hintergrundaufträge abarbeiten'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--once', action='store_true',
+                            help='nur die wartenden Aufträge abarbeiten')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Wartezeit zwischen zwei Abfragen in s')
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers'],
+                                thread_name_prefix='job') as executor:
+            while True:
+                recover_stale_jobs()
+                pks = pending_jobs()
+                # auf alle Aufträge des Durchlaufs warten
+                list(executor.map(execute, pks))
+                if pks:
+                    self.stdout.write(f'{len(pks)} Aufträge bearbeitet')
+                if options['once']:
+                    break
+                if not pks:
+                    time.sleep(options['interval'])
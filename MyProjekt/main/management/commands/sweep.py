@@ -0,0 +1,54 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import Item, ReferenceSystem
+from main.sweep import parse_axis, sweep_reference
+
+
+class Command(BaseCommand):
+    '''
+    Sensitivitätsanalyse der wirtschaftlichen Parameter eines
+    Referenzsystems, z.B.
+    manage.py sweep 1 strompreis=0.1:0.4:10 stundenlohn@Bohrer=35,40,45
+    Ergebnisse werden nicht abgespeichert
+    '''
+    help = 'Kostenmodell über ein Parametergitter auswerten (CSV)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('reference', type=int,
+                            help='id des Referenzsystems')
+        parser.add_argument('axes', nargs='+',
+                            help='name=1,2,3 | name=start:stop:anzahl | '
+                                 'name@Werkzeug=...')
+        parser.add_argument('--item', type=int,
+                            help='id eines Vergleichsbauteils '
+                                 '(zusätzlich Änderungskosten)')
+        parser.add_argument('--output', help='CSV-Datei (Standard: stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            system = ReferenceSystem.objects.get(pk=options['reference'])
+            item = None
+            if options['item'] is not None:
+                item = Item.objects.get(pk=options['item'],
+                                        compare_reference=system)
+            axes = [parse_axis(spec) for spec in options['axes']]
+            result = sweep_reference(system, axes, item)
+        except (ReferenceSystem.DoesNotExist, Item.DoesNotExist,
+                ValueError) as err:
+            raise CommandError(str(err))
+
+        columns = [axis.label for axis in result.axes] + result.fields
+        file = open(options['output'], 'w', newline='') \
+            if options['output'] else sys.stdout
+        try:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(result.records())
+        finally:
+            if options['output']:
+                file.close()
+                self.stdout.write(f'{result.values[..., 0].size} Punkte -> '
+                                  f'{options["output"]}')
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.5 on 2026-10-17 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_auto_20210506_1801'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('upload_reference', 'Referenzbauteil hochladen'), ('upload_item', 'Vergleichsbauteil hochladen')], max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'wartet'), ('running', 'läuft'), ('done', 'fertig'), ('failed', 'fehlgeschlagen')], default='pending', max_length=255)),
+                ('progress', models.PositiveIntegerField(default=0)),
+                ('message', models.CharField(blank=True, default='', max_length=255)),
+                ('parameters', models.JSONField(default=dict)),
+                ('payload', models.BinaryField(null=True)),
+                ('result_url', models.CharField(blank=True, default='', max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.5 on 2026-10-17 18:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='pricing_job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='main.job'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('upload_reference', 'Referenzbauteil hochladen'), ('upload_item', 'Vergleichsbauteil hochladen'), ('price_item', 'Änderungskosten berechnen')], max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('key',), name='unique_active_job_key'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.5 on 2026-10-17 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_item_pricing_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='costreference',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.5 on 2026-10-17 18:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_costreference_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='differences_ready',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ItemDifference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('added', 'nur im Vergleichsbauteil'), ('removed', 'nur im Referenzbauteil'), ('changed', 'Wert geändert')], max_length=255)),
+                ('feature_name', models.CharField(max_length=255)),
+                ('merkmal_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('value_reference', models.FloatField(blank=True, null=True)),
+                ('value_item', models.FloatField(blank=True, null=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.item')),
+            ],
+        ),
+    ]
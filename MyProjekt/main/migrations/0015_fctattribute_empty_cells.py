@@ -0,0 +1,34 @@
+# Generated by Django 3.2.5 on 2026-10-17 18:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_itemdifference'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fctattribute',
+            name='difference',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='fctattribute',
+            name='input',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='fctattribute',
+            name='output',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='fctattribute',
+            name='tool_attribute',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='main.toolattribute'),
+        ),
+    ]
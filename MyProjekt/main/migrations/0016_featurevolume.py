@@ -0,0 +1,28 @@
+# Generated by Django 3.2.5 on 2026-10-17 18:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_fctattribute_empty_cells'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureVolume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('input_volume', models.FloatField()),
+                ('output_volume', models.FloatField()),
+                ('feature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.feature')),
+                ('membership', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.fctmembership')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='featurevolume',
+            constraint=models.UniqueConstraint(fields=('feature', 'membership'), name='unique_feature_volume'),
+        ),
+    ]
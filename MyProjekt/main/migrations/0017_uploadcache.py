@@ -0,0 +1,24 @@
+# Generated by Django 3.2.5 on 2026-10-17 18:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_featurevolume'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('rows', models.JSONField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.item')),
+            ],
+        ),
+    ]
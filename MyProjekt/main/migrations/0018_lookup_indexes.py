@@ -0,0 +1,46 @@
+# Generated by Django 3.2.5 on 2026-10-17 18:52
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_cells(apps, schema_editor):
+    # doppelte FCT-Zellen vor dem UNIQUE-Index entfernen, die zuletzt
+    # angelegte Zelle bleibt erhalten (wie beim Laden der FCT-Tabelle)
+    FctAttribute = apps.get_model('main', 'FctAttribute')
+    duplicates = FctAttribute.objects.values(
+        'membership', 'feature_attribute').annotate(
+            count=Count('pk'), keep=Max('pk')).filter(count__gt=1)
+    for cell in duplicates:
+        FctAttribute.objects.filter(
+            membership=cell['membership'],
+            feature_attribute=cell['feature_attribute']).exclude(
+                pk=cell['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_uploadcache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fctmembership',
+            index=models.Index(fields=['reference', 'position'], name='membership_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feature',
+            index=models.Index(fields=['item', 'name'], name='feature_item_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='featureattribute',
+            index=models.Index(fields=['feature', 'name'], name='merkmal_feature_name_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_cells,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='fctattribute',
+            constraint=models.UniqueConstraint(fields=('membership', 'feature_attribute'), name='unique_fct_cell'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import logging
 import math
 import decimal
 from typing import List
@@ -8,6 +9,8 @@ from django.db.models.fields.related import ForeignKey, ManyToManyField
 from django.core.exceptions import ValidationError
 from django.urls import reverse
 
+log = logging.getLogger(__name__)
+
 '''
 Tabelle für die Technologien
 Unterteilung in: 
@@ -150,6 +153,17 @@ class Item(models.Model):
         on_delete=models.CASCADE,
         null=True,
         blank=True)
+    # letzte Berechnung der Änderungskosten (Hintergrundauftrag)
+    # "wird berechnet" solange der Job nicht abgeschlossen ist
+    pricing_job = ForeignKey(
+        'Job',
+        related_name='+',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True)
+
+    # Strukturvergleich zum Referenzbauteil (ItemDifference) berechnet
+    differences_ready = BooleanField(default=False)
 
     def get_absolute_url(self):
         return reverse('item-detail', args=[str(self.id)])
@@ -169,16 +183,66 @@ class Feature(models.Model):
     #
     add_to_fct = BooleanField(null=True, blank=True)
 
+    class Meta:
+        # Feature eines Bauteils über den Namen (Strukturvergleich, FCT)
+        indexes = [models.Index(fields=['item', 'name'],
+                                name='feature_item_name_idx')]
+
     def __str__(self):
         return f"{self.id} {self.name} {self.classifier} "
 
 
+class ItemDifference(models.Model):
+    '''
+    Strukturvergleich Vergleichsbauteil gegenüber Referenzbauteil
+    (wird beim Hochladen berechnet, siehe item_diff.py)
+    merkmal_name leer: das gesamte Feature ist neu bzw. entfällt
+    '''
+    ADDED = 'added'
+    REMOVED = 'removed'
+    CHANGED = 'changed'
+    ALL_KINDS = [
+        (ADDED, 'nur im Vergleichsbauteil'),
+        (REMOVED, 'nur im Referenzbauteil'),
+        (CHANGED, 'Wert geändert'),
+    ]
+    item = ForeignKey(Item, on_delete=models.CASCADE)
+    kind = CharField(max_length=255, choices=ALL_KINDS)
+    feature_name = CharField(max_length=255)
+    merkmal_name = CharField(max_length=255, null=True, blank=True)
+    value_reference = FloatField(null=True, blank=True)
+    value_item = FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.feature_name} {self.merkmal_name or ''}"
+
+
+class UploadCache(models.Model):
+    '''
+    eingelesene Excel-Dateien als typisierte Feature-Zeilen
+    key: Hash aus Dateiinhalt und Konturangaben (siehe upload_cache.py)
+    item: aus der Datei angelegtes Vergleichsbauteil, dessen Feature beim
+    erneuten Hochladen kopiert werden
+    '''
+    key = CharField(max_length=64, unique=True)
+    rows = models.JSONField()
+    item = ForeignKey(Item, on_delete=models.SET_NULL, null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.key[:12]} {len(self.rows)} Zeilen"
+
+
 class FeatureAttribute(models.Model):
     # Merkmale numerisch
     name = CharField(max_length=255)
     value = FloatField()
     feature = ForeignKey(Feature, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [models.Index(fields=['feature', 'name'],
+                                name='merkmal_feature_name_idx')]
+
     def __str__(self):
         return f"{self.id} {self.name} {self.value}"
 
@@ -253,7 +317,8 @@ class Volume(models.Model):
     # Zuordnung in Abhängigkeit der Classifier welche Merkmale benötigt werden
     # Abhängig vom Feature
     def clean(self) -> None:
-        self.clean_fields()
+        # Feature wird beim Einlesen gesetzt (keine Abfrage pro Volumen)
+        self.clean_fields(exclude=['feature'])
         # bei Absatz und Prismatisch (Initialfeature/Kontur)
         if self.volume_type in [self.PRISMATISCH, self.ABSATZ]:
             self.validating_attributes([self.hoehe, self.breite, self.laenge])
@@ -297,9 +362,6 @@ class Volume(models.Model):
         # Initialfeature rotationssymmetrisch, Bohrung und zyl.Wellenabsatz
         elif self.volume_type in [self.ROTATIONSSYMMETRISCH,
                                   self.BOHRUNG, self.WELLENABSATZ_ZYLINDRISCH]:
-            print('hiiiiiii')
-            print(self.durchmesser)
-            print(self.laenge)
             return math.pi * pow(self.durchmesser/2, 2) * self.laenge
         # T-Nut
         elif self.volume_type == self.T_NUT:
@@ -374,8 +436,7 @@ class Halbzeug(models.Model):
     # in Datenbank abspeichern
     def save(self, *args, **kwargs) -> None:
         self.calculate_volume()
-        print('ooooooooooooooooo')
-        print(self.volume)
+        log.debug(f'Halbzeug {self.item_id}: Volumen {self.volume}')
 
         super(Halbzeug, self).save(*args, **kwargs)
 
@@ -403,6 +464,11 @@ class FctMembership(models.Model):
     standmenge = FloatField()
     losgroesse = FloatField()
 
+    class Meta:
+        # Fertigungsprozessfolge in Reihenfolge (fct_table.MEMBER_ORDER)
+        indexes = [models.Index(fields=['reference', 'position'],
+                                name='membership_position_idx')]
+
     # set position of new technology_member
     def set_position(self) -> None:
         all_technologies = FctMembership.objects.filter(
@@ -427,9 +493,11 @@ class FctAttribute(models.Model):
         (EXPERIMENTAL, 'technologische Machbarkeit mit Unsicherheiten'),
         (POSSIBLE, 'technologisch NICHT umsetzbar'),
     ]
-    input = FloatField()
-    output = FloatField()
-    difference = FloatField()
+    # leere Zellen (null) werden beim Erweitern der FCT-Tabelle angelegt
+    # und anschließend über das Formular gefüllt
+    input = FloatField(null=True)
+    output = FloatField(null=True)
+    difference = FloatField(null=True)
     input_possible = CharField(
         max_length=255, choices=ALL_OUTCOMES)
     output_possible = CharField(
@@ -437,11 +505,26 @@ class FctAttribute(models.Model):
     membership = ForeignKey(
         FctMembership, on_delete=models.CASCADE)
     tool_attribute = ForeignKey(
-        ToolAttribute, on_delete=models.CASCADE)
+        ToolAttribute, on_delete=models.CASCADE, null=True)
     feature_attribute = ForeignKey(
         FeatureAttribute, on_delete=models.CASCADE)
 
+    class Meta:
+        # eine Zelle pro Technologie und Merkmal
+        constraints = [
+            models.UniqueConstraint(fields=['membership', 'feature_attribute'],
+                                    name='unique_fct_cell'),
+        ]
+
     def calculate_difference_and_fuzzy_logic(self):
+        # leere Zellen (create_empty_cells) erst nach dem Ausfüllen bewerten
+        if self.input is None or self.output is None or \
+                self.tool_attribute_id is None:
+            self.difference = None
+            self.input_possible = ''
+            self.output_possible = ''
+            return
+
         # simple difference calculation
         self.difference = self.output - self.input
 
@@ -468,6 +551,28 @@ class FctAttribute(models.Model):
         super(FctAttribute, self).save(*args, **kwargs)
 
 
+class FeatureVolume(models.Model):
+    '''
+    Input- und Outputvolumen eines Features in einer Technologie
+    (mit Vorzeichen nach is_positive), die Summe über alle Feature ergibt
+    die Volumen der FctMembership (siehe fct_table.py)
+    '''
+    feature = ForeignKey(Feature, on_delete=models.CASCADE)
+    membership = ForeignKey(FctMembership, on_delete=models.CASCADE)
+    input_volume = FloatField()
+    output_volume = FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['feature', 'membership'],
+                                    name='unique_feature_volume'),
+        ]
+
+    @property
+    def difference_volume(self) -> float:
+        return self.output_volume - self.input_volume
+
+
 class CostReference(models.Model):
     '''
     Ergebniss der Fertigungskosten Referenzbauteil
@@ -480,6 +585,8 @@ class CostReference(models.Model):
     Krm = FloatField()
     npf_max = FloatField()
     reference = ForeignKey(ReferenceSystem, on_delete=models.CASCADE)
+    # Inhalts-Hash der Eingangsgrößen (siehe pricing.reference_fingerprint)
+    fingerprint = CharField(max_length=64, null=True, blank=True)
 
 
 class Result(models.Model):
@@ -522,3 +629,67 @@ class EcrFuzzy(models.Model):
 
     def __str__(self):
         return f"{self.f_name} {self.m_name} {self.value} {self.tool_name}"
+
+
+'''
+Hintergrundaufträge
+Job (Warteschlange in der Datenbank)
+'''
+
+
+class Job(models.Model):
+    '''
+    Auftrag, der außerhalb des HTTP-Requests von einem Worker abgearbeitet
+    wird (z.B. Excel einlesen und Feature abspeichern)
+    '''
+    UPLOAD_REFERENCE = 'upload_reference'
+    UPLOAD_ITEM = 'upload_item'
+    PRICE_ITEM = 'price_item'
+    ALL_KINDS = [
+        (UPLOAD_REFERENCE, 'Referenzbauteil hochladen'),
+        (UPLOAD_ITEM, 'Vergleichsbauteil hochladen'),
+        (PRICE_ITEM, 'Änderungskosten berechnen'),
+    ]
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    ALL_STATES = [
+        (PENDING, 'wartet'),
+        (RUNNING, 'läuft'),
+        (DONE, 'fertig'),
+        (FAILED, 'fehlgeschlagen'),
+    ]
+    kind = CharField(max_length=255, choices=ALL_KINDS)
+    status = CharField(max_length=255, choices=ALL_STATES, default=PENDING)
+    # Fortschritt in Prozent und aktueller Arbeitsschritt
+    progress = PositiveIntegerField(default=0)
+    message = CharField(max_length=255, blank=True, default='')
+    # Eingaben des Formulars und hochgeladene Datei
+    parameters = models.JSONField(default=dict)
+    payload = models.BinaryField(null=True)
+    # Weiterleitung nach erfolgreicher Bearbeitung
+    result_url = CharField(max_length=255, blank=True, default='')
+    # gleiche Aufträge (z.B. Bauteil und Referenzsystem) nur einmal
+    # gleichzeitig ausführen
+    key = CharField(max_length=255, null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_job_key'),
+        ]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in [self.DONE, self.FAILED]
+
+    def get_absolute_url(self):
+        return reverse('job-detail', args=[str(self.id)])
+
+    def __str__(self):
+        return f"{self.id} {self.kind} {self.status} {self.progress}%"
@@ -0,0 +1,88 @@
+'''
+Seitenweise Anzeige der Listen über den Primärschlüssel (Keyset)
+
+Statt OFFSET (die Datenbank liest alle vorherigen Zeilen erneut) wird ab
+der letzten angezeigten id weitergelesen: ?after=<id> nächste Seite,
+?before=<id> vorherige Seite. Jede Seite kostet damit unabhängig von der
+Position in der Liste eine indexierte Abfrage.
+'''
+from typing import Any, List, Optional, Tuple
+
+from django.db.models.query import QuerySet
+from django.http import Http404
+
+# Einträge pro Seite
+PAGE_SIZE = 50
+
+
+class KeysetPage:
+    '''
+    Eine Seite der Liste (Ersatz für django.core.paginator.Page)
+    '''
+
+    def __init__(self, object_list: List[Any], has_next: bool,
+                 has_previous: bool):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self) -> Optional[int]:
+        # id des letzten Eintrags (?after=)
+        return self.object_list[-1].pk if self.object_list else None
+
+    @property
+    def previous_cursor(self) -> Optional[int]:
+        # id des ersten Eintrags (?before=)
+        return self.object_list[0].pk if self.object_list else None
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+
+class KeysetPaginationMixin:
+    '''
+    Keyset-Pagination für ListView (sortiert nach id)
+    '''
+    paginate_by = PAGE_SIZE
+
+    def cursor(self, name: str) -> Optional[int]:
+        value = self.request.GET.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise Http404(f'Ungültige Seite: {value}')
+
+    def paginate_queryset(self, queryset: QuerySet, page_size: int
+                          ) -> Tuple[None, KeysetPage, List[Any], bool]:
+        after, before = self.cursor('after'), self.cursor('before')
+        if before is not None:
+            # rückwärts lesen und umdrehen
+            rows = list(queryset.filter(pk__lt=before)
+                        .order_by('-pk')[:page_size + 1])
+            has_previous = len(rows) > page_size
+            rows = rows[:page_size][::-1]
+            has_next = True
+        else:
+            if after is not None:
+                queryset = queryset.filter(pk__gt=after)
+            rows = list(queryset.order_by('pk')[:page_size + 1])
+            has_next = len(rows) > page_size
+            rows = rows[:page_size]
+            has_previous = after is not None
+        page = KeysetPage(rows, has_next, has_previous)
+        return None, page, rows, page.has_other_pages()
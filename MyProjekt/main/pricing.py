@@ -0,0 +1,462 @@
+'''
+Preisbestimmung der Vergleichsbauteile eines Referenzsystems
+
+Das Referenzsystem (FCT-Tabelle, Fertigungsprozessfolge und Kostenbasis)
+wird einmal geladen. Anschließend werden beliebig viele Vergleichsbauteile
+durch die rückwärts gefüllte FCT-Tabelle und die Kostenberechnung geführt
+und die Ergebnisse (Result, EcrCost, EcrFuzzy) gesammelt abgespeichert.
+'''
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Collection, Dict, Iterable, List, Optional, Set, Tuple
+
+import django
+import numpy as np
+from django.apps import apps
+from django.db import transaction
+
+from .cost_engine import (ProcessChain, SystemParameters, calculate_costs,
+                          ecr_costs, scale_chain_parameters)
+from .fct_table import FctTable, stored_feature_volumes
+from .fuzzy import FuzzyProfiles
+from .instrumentation import stage
+from .models import (CostReference, EcrCost, EcrFuzzy, FctMembership,
+                     FeatureAttribute, Halbzeug, Item, ReferenceSystem,
+                     Result)
+from .utils import bulk_create_with_pk, remove_umlaut
+from .utils_costs import load_chain
+from .volume_engine import VOLUME_FIELDS, calculate_volumes, volume_type_codes
+
+log = logging.getLogger(__name__)
+
+# Anzahl der Vergleichsbauteile die gemeinsam geladen und berechnet werden
+CHUNK_SIZE = 200
+
+# Anzahl der Vergleichsbauteile pro Auftrag an einen Worker-Prozess
+PROCESS_CHUNK_SIZE = 25
+
+# Feature eines Vergleichsbauteils: (Featurename, [(Merkmalname, Wert)])
+ItemFeatures = List[Tuple[str, List[Tuple[str, float]]]]
+
+# Zwischenzustand der technologischen Bewertung (Felder von EcrFuzzy):
+# (f_name, m_name, tool_name, value, fuzzy)
+FuzzyRow = Tuple[str, str, str, float, str]
+
+
+class ReferenceBasis:
+    '''
+    Einmal geladenes Referenzsystem
+    members: Technologien der Fertigungsprozessfolge (FCT-Member)
+    fct_table: Differenzen und Leistungsfähigkeitsprofile pro Feature/Merkmal
+    chain: Fertigungsprozessfolge als Spaltenarrays
+    profiles: Leistungsfähigkeitsprofile der FCT-Tabelle als a/b/c/d Arrays
+    targets: Merkmalswerte des Referenzbauteils pro Feature
+    feature_volumes: gespeicherte Volumenänderung pro Feature und
+    Technologie (FeatureVolume)
+    fingerprint: Inhalts-Hash aller Eingangsgrößen der Referenzkosten
+    cost: Kostenergebnis des Referenzbauteils
+    '''
+
+    def __init__(self, system: ReferenceSystem, members: List[FctMembership],
+                 fct_table: Dict[str, Dict[str, Any]], chain: ProcessChain,
+                 halbzeug_volume: float, profiles: FuzzyProfiles,
+                 targets: Optional[Dict[str, Dict[str, float]]] = None,
+                 feature_volumes: Optional[Dict[str, np.ndarray]] = None):
+        self.system = system
+        self.members = members
+        self.fct_table = fct_table
+        self.chain = chain
+        self.profiles = profiles
+        self.targets = targets or {}
+        self.feature_volumes = feature_volumes or {}
+        self.parameters = SystemParameters.from_system(system)
+        self.vol_ref = [member.difference_volume for member in members]
+        self.fingerprint = reference_fingerprint(
+            chain, self.parameters, halbzeug_volume)
+        with stage('reference cost'):
+            self.cost = calculate_costs(chain, self.parameters,
+                                        halbzeug_volume).general()
+
+    def unchanged_features(self, features: ItemFeatures) -> Set[str]:
+        # Feature des Vergleichsbauteils mit den Merkmalswerten des
+        # Referenzbauteils (Volumen aus FeatureVolume übernehmen)
+        return {f_name for f_name, merkmale in features
+                if f_name in self.feature_volumes and
+                {remove_umlaut(m_name): value for m_name, value in merkmale}
+                == self.targets.get(f_name)}
+
+
+class ItemPrice:
+    '''
+    Ergebnis eines Vergleichsbauteils (noch nicht abgespeichert)
+    '''
+
+    def __init__(self, item_id: int, cost: Dict[str, float],
+                 ecr: Dict[str, float], fuzzy: List[FuzzyRow]):
+        self.item_id = item_id
+        self.cost = cost
+        self.ecr = ecr
+        self.fuzzy = fuzzy
+
+
+def reference_fingerprint(chain: ProcessChain, parameters: SystemParameters,
+                          halbzeug_volume: float) -> str:
+    '''
+    Inhalts-Hash der Eingangsgrößen der Referenzkosten
+    (Referenzsystem, Fertigungsprozessfolge mit Werkzeug und Maschine,
+    Halbzeug)
+    '''
+    # Werte als float, damit z.B. 3000 und 3000.0 gleich behandelt werden
+    values = {name: float(value)
+              for name, value in parameters.as_dict().items()}
+    digest = hashlib.sha256(json.dumps(
+        [chain.names, values, float(halbzeug_volume)],
+        sort_keys=True).encode())
+    for name in sorted(chain.columns):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(chain[name], dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+def save_reference_cost(basis: ReferenceBasis) -> CostReference:
+    '''
+    Kostenergebnis des Referenzbauteils abspeichern
+    ein neues CostReference wird nur angelegt, wenn sich die Eingangsgrößen
+    seit dem letzten Ergebnis geändert haben
+    '''
+    latest = CostReference.objects.filter(reference=basis.system).last()
+    if latest is not None and latest.fingerprint == basis.fingerprint:
+        return latest
+    cost_reference = CostReference(reference=basis.system,
+                                   fingerprint=basis.fingerprint, **basis.cost)
+    cost_reference.save()
+    return cost_reference
+
+
+def load_reference(system: ReferenceSystem) -> ReferenceBasis:
+    '''
+    FCT-Tabelle des Referenzbauteils als dichte Matrix laden (FctTable) und
+    in Differenzen und Leistungsfähigkeitsprofile pro Feature/Merkmal
+    aufteilen
+    '''
+    table = FctTable.load(system.pk, tool_attributes=True)
+    if not table.members:
+        raise ValueError(f'{system} besitzt keine Fertigungsprozessfolge')
+    if not table.complete:
+        raise ValueError(f'FCT-Tabelle von {system} ist nicht vollständig')
+
+    feature_rows = table.feature_rows()
+    columns = range(len(table.members))
+    fct_table, targets = {}, {}
+    for f_id, f_name, classifier, is_positive in table.features:
+        # Dictionary für jedes Feature worin der Volumentype (classifier),
+        # das Formelement (is_positive) und die Leistungsfähigkeitsprofile
+        # gespeichert werden
+        fct_table[f_name] = {
+            'volume_type': classifier.lower(),
+            'positive': is_positive,
+            't_id': {}}
+        targets[f_name] = {}
+        for row in feature_rows.get(f_id, []):
+            m_name = remove_umlaut(table.merkmal_names[row])
+            # Zielwert = Output der letzten Technologie
+            targets[f_name][m_name] = float(table.output[row, -1])
+            fct_table[f_name]['t_id'][m_name] = [
+                table.tool_attribute(row, column) for column in columns]
+            # Input = 0 bedeutet das Merkmal entsteht in dieser Technologie
+            zero = (table.input[row] == 0) & (table.output[row] != 0)
+            fct_table[f_name][m_name] = [
+                'Zero' if is_zero else float(diff)
+                for is_zero, diff in zip(zero, table.difference[row])]
+
+    # gespeicherte Volumen der Feature (bei gleichnamigen Featuren nicht
+    # eindeutig zuzuordnen)
+    feature_volumes = {}
+    stored = stored_feature_volumes(table)
+    if stored is not None:
+        names = [f_name for _, f_name, _, _ in table.features]
+        for index, f_name in enumerate(names):
+            if names.count(f_name) == 1:
+                feature_volumes[f_name] = stored[1][index] - stored[0][index]
+
+    chain = load_chain(system)
+    hz = system.item.halbzeug_set.first()
+    profiles = FuzzyProfiles.from_tool_attributes(
+        table.tool_attributes.values())
+    return ReferenceBasis(system, table.members, fct_table, chain, hz.volume,
+                          profiles, targets, feature_volumes)
+
+
+def load_item_features(item_ids: List[int]) -> Dict[int, ItemFeatures]:
+    # Feature und Merkmale mehrerer Vergleichsbauteile mit einer Abfrage
+    features = {item_id: [] for item_id in item_ids}
+    current = None
+    for item_id, feature_id, f_name, m_name, value in FeatureAttribute.objects \
+            .filter(feature__item_id__in=item_ids) \
+            .order_by('feature__item_id', 'feature_id', 'pk') \
+            .values_list('feature__item_id', 'feature_id', 'feature__name',
+                         'name', 'value'):
+        if current != feature_id:
+            current = feature_id
+            features[item_id].append((f_name, []))
+        features[item_id][-1][1].append((m_name, value))
+    return features
+
+
+def load_halbzeug_volumes(item_ids: List[int]) -> Dict[int, float]:
+    # Volumen des ersten Halbzeugs je Vergleichsbauteil
+    volumes = {}
+    for item_id, volume in Halbzeug.objects.filter(item_id__in=item_ids) \
+            .order_by('-pk').values_list('item_id', 'volume'):
+        volumes[item_id] = volume
+    return volumes
+
+
+def reconstruct_fct_table(basis: ReferenceBasis, features: ItemFeatures
+                          ) -> Tuple[Dict[str, Dict[str, Any]], List[FuzzyRow]]:
+    '''
+    FCT-Tabelle für das Vergleichsbauteil rückwärts füllen
+    An die Differenzen aus der Referenz FCT-Tabelle werden die
+    Merkmalsanforderungen des Vergleichsbauteils angehängt und von hinten
+    nach vorne die Zwischenzustände bestimmt. Alle Zwischenzustände werden
+    anschließend gemeinsam technologisch überprüft (fuzzy.FuzzyProfiles).
+    '''
+    # Kopie der Referenztabelle (Listen werden pro Bauteil verändert)
+    new_fct_table = {}
+    for f_name, entry in basis.fct_table.items():
+        new_fct_table[f_name] = {
+            key: list(value) if isinstance(value, list) else value
+            for key, value in entry.items()}
+
+    states, profile_ids = [], []
+    for f_name, merkmale in features:
+        for raw_name, target in merkmale:
+            m_name = remove_umlaut(raw_name)
+            values = new_fct_table[f_name][m_name]
+            t_ids = new_fct_table[f_name]['t_id'][m_name]
+            values.append(target)
+            for index, diff in reversed(list(enumerate(values))):
+                # der Eintrag entspricht der Merkmalsanforderung --> Startwert
+                if target == diff:
+                    continue
+                if isinstance(diff, str):
+                    # Falls Differenz String = Zero (Input ist 0)
+                    new_value = values[index + 1] - values[index + 1]
+                    values[index] = new_value
+                    value = new_value + values[index + 1]
+                else:
+                    new_value = values[index + 1] - diff
+                    value = new_value + diff
+                    values[index] = new_value
+
+                # Zwischenzustand für die technologische Bewertung merken
+                t_id = t_ids[index]
+                states.append((f_name, raw_name, str(t_id), value))
+                profile_ids.append(t_id.pk)
+
+    # technologische Bewertung aller Zwischenzustände in einem Aufruf
+    fuzzy, _ = basis.profiles.evaluate(
+        [state[3] for state in states], profile_ids)
+    return new_fct_table, [state + (label,)
+                           for state, label in zip(states, fuzzy)]
+
+
+def item_volumes(basis: ReferenceBasis,
+                 new_fct_table: Dict[str, Dict[str, Any]],
+                 unchanged: Collection[str] = ()) -> List[float]:
+    '''
+    Volumen der In- und Outputs aller Features pro Technologie berechnen und
+    daraus die Änderungsvolumina des Vergleichsbauteils bestimmen
+    unchanged: Feature mit den Werten des Referenzbauteils, deren Volumen
+    aus basis.feature_volumes übernommen werden
+    '''
+    entries = [entry for f_name, entry in new_fct_table.items()
+               if f_name not in unchanged]
+    total = np.zeros(len(basis.members))
+    for f_name in unchanged:
+        total += basis.feature_volumes[f_name]
+    if not entries:
+        return total.tolist()
+
+    # Anzahl der Zwischenzustände (Technologien + Zielwert)
+    shape = (len(entries), len(basis.members) + 1)
+
+    # volumenbeschreibende Merkmale als (Feature x Zwischenzustand) Arrays
+    parameters = {name: np.full(shape, np.nan) for name in VOLUME_FIELDS}
+    for index, entry in enumerate(entries):
+        for name in VOLUME_FIELDS:
+            if name in entry:
+                parameters[name][index] = entry[name]
+
+    codes = np.broadcast_to(volume_type_codes(
+        [entry['volume_type'] for entry in entries])[:, np.newaxis], shape)
+    volumes = calculate_volumes(codes, **parameters)
+
+    # Volumenänderung pro Technologie in Abhängigkeit des Formelements
+    sign = np.array([1 if entry['positive'] else -1
+                     for entry in entries])[:, np.newaxis]
+    return (total + np.sum(sign * np.diff(volumes, axis=1), axis=0)).tolist()
+
+
+def price_items(basis: ReferenceBasis, item_features: Dict[int, ItemFeatures],
+                halbzeug_volumes: Dict[int, float],
+                ignore_errors: bool = False) -> List[ItemPrice]:
+    '''
+    Mehrere Vergleichsbauteile bepreisen
+    Die Volumina werden pro Bauteil bestimmt, die Kostenberechnung läuft
+    anschließend für alle Bauteile gemeinsam (N Bauteile x T Technologien)
+    '''
+    item_ids, vol_items, hz_volumes, fuzzy = [], [], [], []
+    for item_id, features in item_features.items():
+        try:
+            if not features:
+                raise ValueError(f'Bauteil {item_id} besitzt keine Feature')
+            with stage('fct backwards'):
+                new_fct_table, fuzzy_rows = reconstruct_fct_table(
+                    basis, features)
+                vol_item = item_volumes(
+                    basis, new_fct_table, basis.unchanged_features(features))
+            hz_volume = halbzeug_volumes[item_id]
+        except Exception as err:
+            if not ignore_errors:
+                raise
+            log.exception(err)
+            log.debug(f'Bauteil {item_id} konnte nicht berechnet werden')
+            continue
+        item_ids.append(item_id)
+        vol_items.append(vol_item)
+        hz_volumes.append(hz_volume)
+        fuzzy.append(fuzzy_rows)
+
+    if not item_ids:
+        return []
+
+    with stage('item cost'):
+        item_chain = scale_chain_parameters(
+            basis.chain, basis.vol_ref, np.array(vol_items, dtype=float))
+        costs = calculate_costs(item_chain, basis.parameters,
+                                np.array(hz_volumes, dtype=float))
+
+    prices = []
+    for index, item_id in enumerate(item_ids):
+        cost = costs.general(index)
+        prices.append(ItemPrice(item_id, cost, ecr_costs(basis.cost, cost),
+                                fuzzy[index]))
+    return prices
+
+
+def save_prices(prices: List[ItemPrice]) -> List[Result]:
+    # Result, EcrFuzzy und EcrCost gesammelt abspeichern
+    with transaction.atomic():
+        results = bulk_create_with_pk(
+            [Result(item_id=price.item_id, **price.cost) for price in prices])
+        EcrFuzzy.objects.bulk_create([
+            EcrFuzzy(f_name=f_name, m_name=m_name, tool_name=tool_name,
+                     value=value, fuzzy=label, result=result)
+            for price, result in zip(prices, results)
+            for f_name, m_name, tool_name, value, label in price.fuzzy])
+        EcrCost.objects.bulk_create(
+            [EcrCost(item_id=price.item_id, **price.ecr) for price in prices])
+    return results
+
+
+# Referenzsystem im Worker-Prozess (einmal pro Prozess übergeben)
+_worker_basis: Optional[ReferenceBasis] = None
+
+
+def _init_worker(basis: ReferenceBasis) -> None:
+    global _worker_basis
+    # bei "spawn" (Windows/macOS) startet der Prozess ohne Django
+    if not apps.ready:
+        django.setup()
+    _worker_basis = basis
+
+
+def _price_chunk(chunk: Tuple[Dict[int, ItemFeatures], Dict[int, float]]
+                 ) -> List[ItemPrice]:
+    item_features, halbzeug_volumes = chunk
+    return price_items(_worker_basis, item_features, halbzeug_volumes,
+                       ignore_errors=True)
+
+
+class ItemPricer:
+    '''
+    Vergleichsbauteile eines Referenzsystems bepreisen, bei workers > 1
+    verteilt auf einen ProcessPoolExecutor
+    Das Referenzsystem (ReferenceBasis) wird einmal pro Prozess übergeben,
+    pro Auftrag nur die Feature und Halbzeugvolumen der Bauteile. Die
+    Worker greifen nicht auf die Datenbank zu, abgespeichert wird im
+    aufrufenden Prozess (save_prices).
+    '''
+
+    def __init__(self, basis: ReferenceBasis, workers: int = 1,
+                 chunk_size: int = PROCESS_CHUNK_SIZE):
+        self.basis = basis
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> 'ItemPricer':
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker,
+                initargs=(self.basis,))
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __call__(self, item_features: Dict[int, ItemFeatures],
+                 halbzeug_volumes: Dict[int, float]) -> List[ItemPrice]:
+        if self.executor is None or len(item_features) <= self.chunk_size:
+            return price_items(self.basis, item_features, halbzeug_volumes,
+                               ignore_errors=True)
+        item_ids = list(item_features)
+        chunks = []
+        for start in range(0, len(item_ids), self.chunk_size):
+            chunk = item_ids[start:start + self.chunk_size]
+            chunks.append((
+                {item_id: item_features[item_id] for item_id in chunk},
+                {item_id: halbzeug_volumes[item_id] for item_id in chunk
+                 if item_id in halbzeug_volumes}))
+        prices = []
+        for chunk_prices in self.executor.map(_price_chunk, chunks):
+            prices.extend(chunk_prices)
+        return prices
+
+
+def price_reference_items(system: ReferenceSystem,
+                          item_ids: Optional[Iterable[int]] = None,
+                          chunk_size: int = CHUNK_SIZE,
+                          workers: int = 1) -> int:
+    '''
+    Alle Vergleichsbauteile eines Referenzsystems in einem Durchlauf bepreisen
+    Referenzsystem und Kostenbasis werden nur einmal geladen und berechnet,
+    die Vergleichsbauteile werden in Blöcken geladen und abgespeichert
+    workers: Anzahl der Prozesse (0 = alle Kerne, 1 = im aufrufenden Prozess)
+    Rückgabe: Anzahl der berechneten Vergleichsbauteile
+    '''
+    if item_ids is None:
+        item_ids = Item.objects.filter(compare_reference=system) \
+            .order_by('pk').values_list('pk', flat=True)
+    item_ids = list(item_ids)
+    if not item_ids:
+        return 0
+
+    basis = load_reference(system)
+    save_reference_cost(basis)
+
+    priced = 0
+    with ItemPricer(basis, workers) as pricer:
+        for start in range(0, len(item_ids), chunk_size):
+            chunk = item_ids[start:start + chunk_size]
+            prices = pricer(load_item_features(chunk),
+                            load_halbzeug_volumes(chunk))
+            save_prices(prices)
+            priced += len(prices)
+    return priced
@@ -0,0 +1,216 @@
+'''
+Sensitivitätsanalyse über wirtschaftliche Parameter
+
+Für jede Kombination der Parameterwerte (Gitter aus ParameterAxis) wird das
+Kostenmodell (cost_engine.calculate_costs) ausgewertet, ohne Ergebnisse in
+der Datenbank abzuspeichern. Jede Achse wird als eigene Array-Achse
+broadcastet, sodass alle Kombinationen in einem einzigen Aufruf berechnet
+werden (z.B. 10 x 10 x 10 x 10 Punkte x T Technologien).
+
+Ergebnis ist ein SweepResult: ein Array (Achse 1 x ... x Achse k x Größe)
+mit den Ergebnissen des Referenzbauteils (npf_max, Kh, Gpf, ...) und
+optional des Vergleichsbauteils sowie der Änderungskosten (EcrCost).
+'''
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .cost_engine import (GENERAL_FIELDS, MEMBERSHIP_FIELDS,
+                          SYSTEM_FIELDS, TECHNOLOGY_FIELDS, TOOL_FIELDS,
+                          ProcessChain, SystemParameters, calculate_costs,
+                          ecr_costs, scale_chain_parameters)
+from .models import Item, ReferenceSystem
+from .pricing import (item_volumes, load_halbzeug_volumes, load_item_features,
+                      load_reference, reconstruct_fct_table)
+
+# Parameter der Fertigungsprozessfolge (pro Technologie)
+CHAIN_FIELDS = MEMBERSHIP_FIELDS + TOOL_FIELDS + TECHNOLOGY_FIELDS
+
+# Änderungskosten (Felder von EcrCost)
+ECR_FIELDS = ['G', 'Kh', 'npf', 'Kma', 'Krm']
+
+
+@dataclass(frozen=True)
+class ParameterAxis:
+    '''
+    eine Achse des Parametergitters
+    name: Feld aus SYSTEM_FIELDS oder CHAIN_FIELDS
+    values: untersuchte Werte
+    tool: nur die Technologie mit diesem Werkzeug verändern
+    (Standard: alle Technologien der Fertigungsprozessfolge)
+    '''
+    name: str
+    values: Sequence[float]
+    tool: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return f'{self.name}@{self.tool}' if self.tool else self.name
+
+
+@dataclass
+class SweepResult:
+    '''
+    Ergebniswürfel der Sensitivitätsanalyse
+    axes: Achsen des Parametergitters
+    fields: Namen der Ergebnisgrößen (letzte Achse von values)
+    values: Array der Form (len(axis.values) für jede Achse, len(fields))
+    '''
+    axes: List[ParameterAxis]
+    fields: List[str]
+    values: np.ndarray
+
+    @property
+    def shape(self):
+        return self.values.shape[:-1]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        # Ergebnisgröße über das gesamte Gitter
+        return self.values[..., self.fields.index(name)]
+
+    def records(self) -> Iterator[Dict[str, float]]:
+        # ein dict pro Gitterpunkt (Parameterwerte und Ergebnisse)
+        for index in np.ndindex(*self.shape):
+            record = {axis.label: float(axis.values[position])
+                      for axis, position in zip(self.axes, index)}
+            record.update(zip(self.fields, self.values[index].tolist()))
+            yield record
+
+
+def parse_axis(spec: str) -> ParameterAxis:
+    '''
+    Achse aus der Kommandozeile lesen
+    name=1,2,3 (Werte), name=start:stop:anzahl (gleichmäßig verteilt),
+    name@Werkzeug=... (nur eine Technologie)
+    '''
+    try:
+        label, values = spec.split('=', 1)
+        name, _, tool = label.partition('@')
+        if values.count(':') == 2:
+            start, stop, num = values.split(':')
+            values = np.linspace(float(start), float(stop), int(num))
+        else:
+            values = [float(value) for value in values.split(',')]
+    except ValueError:
+        raise ValueError(f'ungültige Parameterachse: {spec}')
+    return ParameterAxis(name.strip(), list(values), tool.strip() or None)
+
+
+def _grid_values(axis: ParameterAxis, position: int, dimensions: int
+                 ) -> np.ndarray:
+    # Werte einer Achse so formen, dass sie gegen alle anderen broadcasten
+    shape = [1] * dimensions
+    shape[position] = len(axis.values)
+    return np.asarray(axis.values, dtype=float).reshape(shape)
+
+
+def apply_axes(chain: ProcessChain, system: SystemParameters,
+               axes: List[ParameterAxis]):
+    '''
+    Parameterachsen auf Fertigungsprozessfolge und Systemparameter anwenden
+    Rückgabe: (ProcessChain, SystemParameters) mit Arrays der Form
+    (Achse 1 x ... x Achse k [x Technologie])
+    '''
+    # jede Größe darf nur von einer Achse verändert werden (sonst
+    # überschreiben sich die Achsen und das Gitter hat tote Dimensionen)
+    labels = [axis.label for axis in axes]
+    for axis in axes:
+        if labels.count(axis.label) > 1:
+            raise ValueError(f'{axis.label}: mehrere Achsen')
+        if axis.tool and axis.name in labels:
+            raise ValueError(f'{axis.label}: {axis.name} wird bereits für '
+                             f'alle Technologien verändert')
+
+    dimensions = len(axes)
+    columns: Dict[str, np.ndarray] = {}
+    parameters = system.as_dict()
+    names = np.array(chain.names)
+    for position, axis in enumerate(axes):
+        if not len(axis.values):
+            raise ValueError(f'{axis.label}: keine Werte')
+        values = _grid_values(axis, position, dimensions)
+        if axis.name in SYSTEM_FIELDS:
+            if axis.tool:
+                raise ValueError(f'{axis.label}: Systemparameter gelten für '
+                                 f'alle Technologien')
+            parameters[axis.name] = values
+        elif axis.name in CHAIN_FIELDS:
+            column = columns.get(axis.name, chain[axis.name])
+            if axis.tool:
+                mask = names == axis.tool
+                if not mask.any():
+                    raise ValueError(f'{axis.label}: Werkzeug nicht in der '
+                                     f'Fertigungsprozessfolge')
+                columns[axis.name] = np.where(mask, values[..., np.newaxis],
+                                              column)
+            else:
+                columns[axis.name] = np.broadcast_to(
+                    values[..., np.newaxis], values.shape + (len(chain),))
+        else:
+            raise ValueError(f'{axis.label}: unbekannter Parameter')
+    return chain.replace(**columns), SystemParameters(**parameters)
+
+
+def sweep_costs(chain: ProcessChain, system: SystemParameters,
+                halbzeug_volume: float, axes: List[ParameterAxis],
+                vol_ref: Optional[Sequence[float]] = None,
+                vol_item: Optional[Sequence[float]] = None,
+                item_halbzeug_volume: Optional[float] = None) -> SweepResult:
+    '''
+    Kostenmodell für alle Kombinationen der Parameterachsen auswerten
+    chain, system, halbzeug_volume: Eingangsgrößen des Referenzbauteils
+    vol_ref, vol_item, item_halbzeug_volume: Änderungsvolumina und Halbzeug
+    des Vergleichsbauteils (optional, dann zusätzlich Kosten des
+    Vergleichsbauteils und Änderungskosten)
+    '''
+    chain, system = apply_axes(chain, system, axes)
+    shape = tuple(len(axis.values) for axis in axes)
+
+    reference = calculate_costs(chain, system, halbzeug_volume)
+    results = {name: getattr(reference, name) for name in GENERAL_FIELDS}
+    fields = list(GENERAL_FIELDS)
+
+    if vol_item is not None:
+        item = calculate_costs(
+            scale_chain_parameters(chain, vol_ref, vol_item), system,
+            item_halbzeug_volume)
+        item_results = {name: getattr(item, name) for name in GENERAL_FIELDS}
+        results.update({f'item_{name}': value
+                        for name, value in item_results.items()})
+        results.update({f'ecr_{name}': value for name, value in
+                        ecr_costs(results, item_results).items()})
+        fields += [f'item_{name}' for name in GENERAL_FIELDS] + \
+            [f'ecr_{name}' for name in ECR_FIELDS]
+
+    values = np.stack([np.broadcast_to(results[name], shape)
+                       for name in fields], axis=-1)
+    return SweepResult(list(axes), fields, values)
+
+
+def sweep_reference(system: ReferenceSystem, axes: List[ParameterAxis],
+                    item: Optional[Item] = None) -> SweepResult:
+    '''
+    Sensitivitätsanalyse eines Referenzsystems (optional gegenüber einem
+    Vergleichsbauteil), Eingangsgrößen werden einmal aus der Datenbank
+    geladen
+    '''
+    basis = load_reference(system)
+    halbzeug = system.item.halbzeug_set.first()
+    if item is None:
+        return sweep_costs(basis.chain, basis.parameters, halbzeug.volume,
+                           axes)
+
+    features = load_item_features([item.pk])[item.pk]
+    if not features:
+        raise ValueError(f'{item} besitzt keine Feature')
+    hz_volumes = load_halbzeug_volumes([item.pk])
+    if item.pk not in hz_volumes:
+        raise ValueError(f'{item} besitzt kein Halbzeug')
+    new_fct_table, _ = reconstruct_fct_table(basis, features)
+    return sweep_costs(basis.chain, basis.parameters, halbzeug.volume, axes,
+                       vol_ref=basis.vol_ref,
+                       vol_item=item_volumes(
+                           basis, new_fct_table,
+                           basis.unchanged_features(features)),
+                       item_halbzeug_volume=hz_volumes[item.pk])
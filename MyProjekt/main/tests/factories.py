@@ -0,0 +1,51 @@
+'''
+Testdaten: synthetische Referenzsysteme wie im Benchmark (benchmark.py)
+'''
+import io
+import random
+from typing import List, Tuple
+
+from django.db import transaction
+
+from main.benchmark import (CONTOUR, create_technologies, excel_file,
+                            feature_rows, fill_fct_table)
+from main.fct_table import recalculate_membership_volumes
+from main.models import Item, ReferenceSystem
+from main.utils import create_features_from_rows, processing_excel_file_buffer
+
+
+def upload_rows(item: Item, rows: List[Tuple[str, float, float]]) -> None:
+    # Bohrungen, Halbzeug und Kontur wie beim Hochladen abspeichern
+    with transaction.atomic():
+        create_features_from_rows(processing_excel_file_buffer(
+            CONTOUR, io.BytesIO(excel_file(rows))), item)
+
+
+def create_reference(features: int = 5, technologies: int = 3,
+                     items: int = 1, seed: int = 0
+                     ) -> Tuple[ReferenceSystem, List[Item]]:
+    '''
+    Referenzsystem mit vollständiger FCT-Tabelle, berechneten Volumen und
+    Vergleichsbauteilen (Durchmesser der Bohrungen um 5 % je Bauteil
+    vergrößert)
+    '''
+    rng = random.Random(seed)
+    rows = feature_rows(features, rng)
+    tools = create_technologies(technologies)
+    system = ReferenceSystem.objects.create(
+        name='Test', laufzeit_jahr=3000, betrachtungszeitraum=5,
+        produktpreis=80, lohnnebenkostenanteil=0.3, dichte=0.00785,
+        kilopreis=2.5)
+    upload_rows(Item.objects.create(reference=system, name='Referenzbauteil'),
+                rows)
+    fill_fct_table(system, tools)
+    recalculate_membership_volumes(system.pk)
+
+    compare_items = []
+    for index in range(items):
+        item = Item.objects.create(compare_reference=system,
+                                   name=f'Vergleichsbauteil {index}')
+        upload_rows(item, [(name, round(durchmesser * (1.05 + index / 20), 2),
+                            laenge) for name, durchmesser, laenge in rows])
+        compare_items.append(item)
+    return system, compare_items
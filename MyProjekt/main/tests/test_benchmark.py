@@ -0,0 +1,20 @@
+from django.test import TestCase
+
+from main.fct_grid import FctGrid
+from main.fct_table import FctStatus
+
+from .factories import create_reference
+
+
+class FillFctTableTest(TestCase):
+
+    def test_generated_table_passes_grid_validation(self):
+        # 20 Bohrungen x 10 Technologien: Teilschritte mit Rundungsfehlern
+        system, _ = create_reference(features=20, technologies=10, items=0)
+        self.assertTrue(FctStatus.load(system.pk).complete)
+        grid = FctGrid(system.pk)
+        values = {key: grid.stored(key) for key in grid.cells}
+        errors = {}
+        rows = grid.validate(values, errors)
+        self.assertEqual(errors, {})
+        self.assertEqual(len(rows), len(grid.merkmale))
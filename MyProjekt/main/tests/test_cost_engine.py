@@ -0,0 +1,199 @@
+import math
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from main.cost_engine import (GENERAL_FIELDS, MEMBERSHIP_FIELDS,
+                              TECHNOLOGY_FIELDS, TOOL_FIELDS, ProcessChain,
+                              SystemParameters, calculate_costs, ecr_costs,
+                              scale_chain_parameters)
+
+SYSTEM = {'laufzeit_jahr': 3000, 'betrachtungszeitraum': 5,
+          'produktpreis': 80, 'lohnnebenkostenanteil': 0.3,
+          'dichte': 0.00785, 'kilopreis': 2.5}
+
+# drei Technologien mit unterschiedlichen Parametern
+MEMBERS = [
+    {'name': 'schruppen', 'hauptzeit': 60, 'standmenge': 500,
+     'losgroesse': 1000},
+    {'name': 'bohren', 'hauptzeit': 45, 'standmenge': 300,
+     'losgroesse': 800},
+    {'name': 'schlichten', 'hauptzeit': 90, 'standmenge': 700,
+     'losgroesse': 1200},
+]
+TOOLS = [
+    {'verteilzeit': 5, 'ruestzeit': 600, 'erholungszeit': 3,
+     'werkzeugwechselzeit': 60, 'werkstueckwechselzeit': 20,
+     'betriebsstoffkosten': 50, 'werkzeugpreis': 30},
+    {'verteilzeit': 4, 'ruestzeit': 900, 'erholungszeit': 2,
+     'werkzeugwechselzeit': 45, 'werkstueckwechselzeit': 15,
+     'betriebsstoffkosten': 80, 'werkzeugpreis': 12},
+    {'verteilzeit': 6, 'ruestzeit': 300, 'erholungszeit': 4,
+     'werkzeugwechselzeit': 90, 'werkstueckwechselzeit': 25,
+     'betriebsstoffkosten': 20, 'werkzeugpreis': 55},
+]
+MACHINES = [
+    {'restfertigungsgemeinkosten': 0.5, 'anschaffungswert': 100000,
+     'verkaufserlös': 10000, 'abschreibungsdauer': 10, 'platzbedarf': 12,
+     'mittlere_leistung': 15, 'instandhaltungsfaktor': 0.05,
+     'quadratmeterpreis': 8, 'strompreis': 0.2, 'zinsatz': 0.06,
+     'stundenlohn': 40, 'fertigungsmittelanzahl': 1,
+     'bediehnverhaeltnis': 0.8},
+    {'restfertigungsgemeinkosten': 0.3, 'anschaffungswert': 250000,
+     'verkaufserlös': 40000, 'abschreibungsdauer': 8, 'platzbedarf': 20,
+     'mittlere_leistung': 30, 'instandhaltungsfaktor': 0.04,
+     'quadratmeterpreis': 10, 'strompreis': 0.25, 'zinsatz': 0.05,
+     'stundenlohn': 45, 'fertigungsmittelanzahl': 2,
+     'bediehnverhaeltnis': 0.5},
+    {'restfertigungsgemeinkosten': 0.8, 'anschaffungswert': 60000,
+     'verkaufserlös': 5000, 'abschreibungsdauer': 12, 'platzbedarf': 6,
+     'mittlere_leistung': 8, 'instandhaltungsfaktor': 0.06,
+     'quadratmeterpreis': 8, 'strompreis': 0.2, 'zinsatz': 0.07,
+     'stundenlohn': 38, 'fertigungsmittelanzahl': 1,
+     'bediehnverhaeltnis': 1.0},
+]
+HALBZEUG_VOLUME = 389000.0
+
+
+def chain_from_rows(members, tools, machines) -> ProcessChain:
+    columns = {}
+    for name in MEMBERSHIP_FIELDS:
+        columns[name] = np.array([m[name] for m in members], dtype=float)
+    for name in TOOL_FIELDS:
+        columns[name] = np.array([t[name] for t in tools], dtype=float)
+    for name in TECHNOLOGY_FIELDS:
+        columns[name] = np.array([m[name] for m in machines], dtype=float)
+    return ProcessChain([m['name'] for m in members], columns)
+
+
+def costs_per_tool(members, tools, machines, system, halbzeug_volume):
+    '''
+    frühere Kostenrechnung aus ItemFctBackwards (verschachtelte dicts pro
+    Werkzeug) als Vergleich für calculate_costs
+    '''
+    cost_parameter = {}
+    cost_fpf = {}
+    for ref, tool, machine in zip(members, tools, machines):
+        p = cost_parameter[ref['name']] = {}
+        p['tn'] = (tool['ruestzeit'] / ref['losgroesse']) + \
+            (tool['werkzeugwechselzeit'] / ref['standmenge']) + \
+            tool['werkstueckwechselzeit']
+        p['tg'] = ref['hauptzeit'] + p['tn']
+        p['te'] = p['tg'] + tool['verteilzeit'] + tool['erholungszeit']
+        p['npf'] = (system['laufzeit_jahr'] *
+                    system['betrachtungszeitraum']) / (p['te'] / (60 * 60))
+        p['Ka'] = (machine['anschaffungswert'] - machine['verkaufserlös']) / \
+            machine['abschreibungsdauer']
+        p['Kr'] = machine['quadratmeterpreis'] * machine['platzbedarf']
+        p['Ki'] = machine['anschaffungswert'] * \
+            machine['instandhaltungsfaktor']
+        p['Kz'] = 0.5 * (machine['anschaffungswert'] +
+                         machine['verkaufserlös']) * machine['zinsatz']
+        p['Kw'] = tool['werkzeugpreis'] / ref['standmenge']
+        p['Kl'] = machine['stundenlohn'] * \
+            (1 + system['lohnnebenkostenanteil']) * (p['te'] / (60 * 60)) * \
+            machine['bediehnverhaeltnis'] * machine['fertigungsmittelanzahl']
+        p['machine'] = machine
+        p['tool'] = tool
+
+    cost_fpf['npf_max'] = min(v['npf'] for v in cost_parameter.values())
+    for p in cost_parameter.values():
+        machine = p['machine']
+        p['npa'] = cost_fpf['npf_max'] / system['betrachtungszeitraum']
+        p['Ke'] = machine['mittlere_leistung'] * (p['te'] / (60 * 60)) * \
+            p['npa'] * machine['strompreis']
+        p['Kmh'] = (p['Ka'] + p['Kr'] + p['Ki'] + p['Ke'] + p['Kz']) / \
+            system['laufzeit_jahr']
+        p['Km'] = p['Kmh'] * (p['te'] / (60 * 60))
+        p['Kf'] = p['Kl'] + p['Km'] + p['Kw'] + \
+            machine['restfertigungsgemeinkosten']
+        p['Khb'] = p['tool']['betriebsstoffkosten'] / cost_fpf['npf_max']
+
+    cost_fpf['Kf_fpf'] = sum(v['Kf'] for v in cost_parameter.values())
+    cost_fpf['Krm'] = halbzeug_volume * system['dichte'] * \
+        system['kilopreis'] * pow(10, -3)
+    cost_fpf['Kma'] = cost_fpf['Krm'] + \
+        sum(v['Khb'] for v in cost_parameter.values())
+    cost_fpf['Kh'] = cost_fpf['Kf_fpf'] + cost_fpf['Kma']
+    cost_fpf['Kh_npf'] = cost_fpf['Kh'] * cost_fpf['npf_max']
+    cost_fpf['Gpf'] = system['produktpreis'] * cost_fpf['npf_max'] - \
+        cost_fpf['Kh_npf']
+    return cost_parameter, cost_fpf
+
+
+def scaled_members(members, vol_ref, vol_item):
+    # frühere Bestimmung von Hauptzeit, Standmenge und Losgröße
+    # des Vergleichsbauteils
+    scaled = []
+    for ref, v_ref, v_item in zip(members, vol_ref, vol_item):
+        relation = abs(v_item / v_ref)
+        scaled.append({'name': ref['name'],
+                       'hauptzeit': relation * ref['hauptzeit'],
+                       'standmenge': ref['standmenge'] * (1 / relation),
+                       'losgroesse': ref['losgroesse'] * (1 / relation)})
+    return scaled
+
+
+class CalculateCostsTest(SimpleTestCase):
+
+    def assertCostsEqual(self, cost, members, halbzeug_volume):
+        columns, general = costs_per_tool(members, TOOLS, MACHINES, SYSTEM,
+                                          halbzeug_volume)
+        for name in GENERAL_FIELDS:
+            self.assertTrue(math.isclose(float(getattr(cost, name)),
+                                         general[name], rel_tol=1e-12),
+                            name)
+        for index, member in enumerate(members):
+            for name in ['tn', 'tg', 'te', 'npf', 'npa', 'Ka', 'Kr', 'Ki',
+                         'Kz', 'Kw', 'Kl', 'Ke', 'Kmh', 'Km', 'Kf', 'Khb']:
+                # npa gilt für die gesamte Folge (Länge 1)
+                values = np.broadcast_to(getattr(cost.columns, name),
+                                         (len(members),))
+                self.assertTrue(math.isclose(
+                    float(values[index]),
+                    columns[member['name']][name], rel_tol=1e-12),
+                    f'{member["name"]} {name}')
+
+    def test_reference_matches_per_tool_formulas(self):
+        chain = chain_from_rows(MEMBERS, TOOLS, MACHINES)
+        cost = calculate_costs(chain, SystemParameters(**SYSTEM),
+                               HALBZEUG_VOLUME)
+        self.assertCostsEqual(cost, MEMBERS, HALBZEUG_VOLUME)
+
+    def test_item_matches_per_tool_formulas(self):
+        vol_ref = [1200.0, -800.0, 150.0]
+        vol_item = [1500.0, -600.0, 150.0]
+        chain = scale_chain_parameters(
+            chain_from_rows(MEMBERS, TOOLS, MACHINES), vol_ref, vol_item)
+        cost = calculate_costs(chain, SystemParameters(**SYSTEM), 350000.0)
+        self.assertCostsEqual(
+            cost, scaled_members(MEMBERS, vol_ref, vol_item), 350000.0)
+
+    def test_leading_axis_matches_single_calculations(self):
+        # N Vergleichsbauteile in einem Aufruf
+        chain = chain_from_rows(MEMBERS, TOOLS, MACHINES)
+        vol_ref = np.array([1200.0, -800.0, 150.0])
+        vol_items = np.array([[1500.0, -600.0, 150.0],
+                              [1200.0, -800.0, 150.0],
+                              [600.0, -900.0, 300.0]])
+        volumes = np.array([350000.0, HALBZEUG_VOLUME, 400000.0])
+        system = SystemParameters(**SYSTEM)
+        batch = calculate_costs(
+            scale_chain_parameters(chain, vol_ref, vol_items), system,
+            volumes)
+        for index, vol_item in enumerate(vol_items):
+            single = calculate_costs(
+                scale_chain_parameters(chain, vol_ref, vol_item), system,
+                volumes[index])
+            for name, value in single.general().items():
+                self.assertAlmostEqual(batch.general(index)[name], value)
+
+    def test_ecr_costs(self):
+        chain = chain_from_rows(MEMBERS, TOOLS, MACHINES)
+        system = SystemParameters(**SYSTEM)
+        reference = calculate_costs(chain, system, HALBZEUG_VOLUME).general()
+        item = calculate_costs(chain, system, 350000.0).general()
+        ecr = ecr_costs(reference, item)
+        self.assertAlmostEqual(ecr['G'], reference['Gpf'] - item['Gpf'])
+        self.assertAlmostEqual(ecr['Krm'], item['Krm'] - reference['Krm'])
+        self.assertEqual(ecr['npf'], 0.0)
@@ -0,0 +1,167 @@
+import json
+from html.parser import HTMLParser
+
+import numpy as np
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+
+from main.fct_grid import CELL_FIELDS, CELLS_FIELD, FctGrid, field_name
+from main.fct_table import recalculate_membership_volumes
+from main.models import FctAttribute
+
+from .factories import create_reference
+from .test_fct_table import volumes
+
+
+class FormFields(HTMLParser):
+    '''
+    Felder des Formulars wie im Browser: Name, Wert, CSS-Klassen und
+    data-initial (ausgewählte Option bei select)
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.fields = []
+        self.select = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in ('input', 'select') and attrs.get('name'):
+            field = {'name': attrs['name'], 'value': attrs.get('value') or '',
+                     'classes': (attrs.get('class') or '').split(),
+                     'initial': attrs.get('data-initial')}
+            self.fields.append(field)
+            self.select = field if tag == 'select' else None
+        elif tag == 'option' and self.select is not None \
+                and 'selected' in attrs:
+            self.select['value'] = attrs.get('value') or ''
+
+    def handle_endtag(self, tag):
+        if tag == 'select':
+            self.select = None
+
+
+def submit(fields, changes):
+    '''
+    Absenden wie das Skript der Seite: geänderte Zellfelder (.fct-cell)
+    als JSON im Feld CELLS_FIELD, alle übrigen Felder einzeln
+    '''
+    data, cells = {}, {}
+    for field in fields:
+        value = changes.get(field['name'], field['value'])
+        if 'fct-cell' in field['classes']:
+            if value != field['initial']:
+                cells[field['name']] = value
+        elif field['name'] != CELLS_FIELD:
+            data[field['name']] = value
+    data[CELLS_FIELD] = json.dumps(cells)
+    return data
+
+
+class FctTableGridPostTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # 200 Bohrungen x 3 Technologien: mehr als 1000 Felder
+        cls.system, _ = create_reference(features=200, technologies=3,
+                                         items=0)
+
+    def setUp(self):
+        self.grid = FctGrid(self.system.pk)
+        self.url = reverse('fct-table', args=[self.system.pk])
+
+    def all_fields(self):
+        # alle Felder der Tabelle mit den gespeicherten Werten
+        return {field_name(key, field): '' if value is None else str(value)
+                for key in self.grid.cells
+                for field, value in zip(CELL_FIELDS, self.grid.stored(key))}
+
+    def edit_row(self, data, merkmal, value):
+        # Übergang zwischen der ersten und zweiten Technologie verschieben
+        first, second = self.grid.keys(merkmal)[:2]
+        data[field_name(first, 'output')] = str(value)
+        data[field_name(second, 'input')] = str(value)
+        return first, second
+
+    def test_large_grid_is_saved(self):
+        data = self.all_fields()
+        self.assertGreater(len(data), settings.DATA_UPLOAD_MAX_NUMBER_FIELDS)
+        merkmal = self.grid.merkmale[0]
+        value = round(merkmal.value * 0.8, 3)
+        first, second = self.edit_row(data, merkmal, value)
+
+        response = self.client.post(self.url,
+                                    {CELLS_FIELD: json.dumps(data)})
+        self.assertRedirects(
+            response, reverse('referencemodel-detail', args=[self.system.pk]),
+            fetch_redirect_response=False)
+        self.assertEqual(FctAttribute.objects.get(pk=self.grid.cells[first][0])
+                         .output, value)
+        self.assertEqual(FctAttribute.objects.get(
+            pk=self.grid.cells[second][0]).input, value)
+
+        # gespeicherte Volumen entsprechen einer vollständigen Neuberechnung
+        members, features = volumes(self.system)
+        recalculate_membership_volumes(self.system.pk)
+        expected_members, expected_features = volumes(self.system)
+        np.testing.assert_allclose(members, expected_members, rtol=1e-12)
+        self.assertEqual(features.keys(), expected_features.keys())
+        for key, value in expected_features.items():
+            np.testing.assert_allclose(features[key], value, rtol=1e-12)
+
+    def test_rendered_form_is_saved(self):
+        parser = FormFields()
+        parser.feed(self.client.get(self.url).content.decode())
+        names = {field['name'] for field in parser.fields
+                 if 'fct-cell' in field['classes']}
+        # jedes Feld jeder Zelle wird vom Skript erfasst
+        self.assertEqual(names, set(self.all_fields()))
+        self.assertGreater(len(names), settings.DATA_UPLOAD_MAX_NUMBER_FIELDS)
+
+        merkmal = self.grid.merkmale[0]
+        value = round(merkmal.value * 0.8, 3)
+        changes = {}
+        first, second = self.edit_row(changes, merkmal, value)
+        data = submit(parser.fields, changes)
+        self.assertLessEqual(len(data), 2)
+        self.assertEqual(json.loads(data[CELLS_FIELD]), changes)
+
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(FctAttribute.objects.get(pk=self.grid.cells[first][0])
+                         .output, value)
+        self.assertEqual(FctAttribute.objects.get(
+            pk=self.grid.cells[second][0]).input, value)
+
+    def test_only_changed_fields_are_sent(self):
+        merkmal = self.grid.merkmale[0]
+        value = round(merkmal.value * 0.9, 3)
+        data = {}
+        first, _ = self.edit_row(data, merkmal, value)
+        response = self.client.post(self.url,
+                                    {CELLS_FIELD: json.dumps(data)})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(FctAttribute.objects.get(pk=self.grid.cells[first][0])
+                         .output, value)
+        # nicht gesendete Zellen bleiben unverändert
+        grid = FctGrid(self.system.pk)
+        for key in grid.keys(self.grid.merkmale[1]):
+            self.assertEqual(grid.stored(key), self.grid.stored(key))
+
+    def test_chaining_error_is_rendered(self):
+        merkmal = self.grid.merkmale[0]
+        first = self.grid.keys(merkmal)[0]
+        data = {field_name(first, 'output'): str(merkmal.value * 0.5)}
+        response = self.client.post(self.url,
+                                    {CELLS_FIELD: json.dumps(data)})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.context['error_count'], 0)
+        self.assertEqual(FctAttribute.objects.get(pk=self.grid.cells[first][0])
+                         .output, self.grid.stored(first)[1])
+
+    def test_invalid_json_is_rejected(self):
+        for cells in ['{', '[]']:
+            with self.subTest(cells=cells):
+                response = self.client.post(self.url, {CELLS_FIELD: cells})
+                self.assertEqual(response.status_code, 400)
@@ -0,0 +1,88 @@
+import numpy as np
+from django.test import TestCase
+
+from main.fct_table import (MEMBER_ORDER, recalculate_membership_volumes,
+                            update_membership_volumes)
+from main.models import (FctAttribute, FctMembership, Feature,
+                         FeatureAttribute, FeatureVolume)
+
+from .factories import create_reference
+
+
+def volumes(system):
+    # Volumen der Technologien und gespeicherte Volumen je Feature
+    members = np.array(list(FctMembership.objects.filter(reference=system)
+                            .order_by(*MEMBER_ORDER).values_list(
+        'input_volume', 'output_volume', 'difference_volume')))
+    features = dict(
+        ((feature, membership), (value_in, value_out))
+        for feature, membership, value_in, value_out in
+        FeatureVolume.objects.filter(membership__reference=system)
+        .values_list('feature_id', 'membership_id', 'input_volume',
+                     'output_volume'))
+    return members, features
+
+
+class UpdateMembershipVolumesTest(TestCase):
+
+    def setUp(self):
+        self.system, _ = create_reference(features=6, technologies=4,
+                                          items=0)
+
+    def edit_row(self, merkmal: FeatureAttribute, column: int,
+                 value: float) -> None:
+        # Übergang zwischen zwei Technologien einer Zeile verschieben
+        # (Output der Technologie = Input der nächsten)
+        cells = list(FctAttribute.objects.filter(feature_attribute=merkmal)
+                     .order_by('membership__position'))
+        cells[column].output = value
+        cells[column + 1].input = value
+        cells[column].save()
+        cells[column + 1].save()
+
+    def assertMatchesRecalculation(self):
+        incremental_members, incremental_features = volumes(self.system)
+        recalculate_membership_volumes(self.system.pk)
+        members, features = volumes(self.system)
+        np.testing.assert_allclose(incremental_members, members, rtol=1e-12)
+        self.assertEqual(incremental_features.keys(), features.keys())
+        for key, value in features.items():
+            np.testing.assert_allclose(incremental_features[key], value,
+                                       rtol=1e-12)
+
+    def bohrungen(self):
+        return list(Feature.objects.filter(
+            item__reference=self.system, is_positive=False).order_by('pk'))
+
+    def test_one_feature(self):
+        feature = self.bohrungen()[0]
+        merkmal = feature.featureattribute_set.get(name='durchmesser')
+        before, _ = volumes(self.system)
+        self.edit_row(merkmal, 1, merkmal.value * 0.8)
+        self.assertTrue(update_membership_volumes(self.system.pk,
+                                                  feature.pk))
+        after, _ = volumes(self.system)
+        self.assertFalse(np.allclose(before, after))
+        self.assertMatchesRecalculation()
+
+    def test_several_features(self):
+        for index, feature in enumerate(self.bohrungen()[:4]):
+            for merkmal in feature.featureattribute_set.all():
+                self.edit_row(merkmal, index % 3, merkmal.value * 0.9)
+            self.assertTrue(update_membership_volumes(self.system.pk,
+                                                      feature.pk))
+        self.assertMatchesRecalculation()
+
+    def test_unchanged_feature(self):
+        before = volumes(self.system)
+        feature = self.bohrungen()[0]
+        self.assertTrue(update_membership_volumes(self.system.pk,
+                                                  feature.pk))
+        self.assertEqual(volumes(self.system)[1], before[1])
+        np.testing.assert_array_equal(volumes(self.system)[0], before[0])
+
+    def test_missing_volumes_need_recalculation(self):
+        FeatureVolume.objects.all().delete()
+        feature = self.bohrungen()[0]
+        self.assertFalse(update_membership_volumes(self.system.pk,
+                                                   feature.pk))
@@ -0,0 +1,78 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from main.fuzzy import FuzzyProfiles, classify, classify_cells, labels
+from main.models import FctAttribute, ToolAttribute
+
+# Trapeze a-b-c-d, auch mit zusammenfallenden Eckpunkten
+PROFILES = [
+    ToolAttribute(pk=1, name='durchmesser', a=0, b=10, c=90, d=120),
+    ToolAttribute(pk=2, name='laenge', a=5, b=5, c=50, d=50),
+    ToolAttribute(pk=3, name='breite', a=-10, b=0, c=0, d=10),
+]
+VALUES = [-20, -10, -5, 0, 2.5, 5, 10, 45, 50, 90, 100, 120, 121, 1e6]
+
+
+class ClassifyTest(SimpleTestCase):
+
+    def test_matches_fuzzy_check(self):
+        for profile in PROFILES:
+            codes, _ = classify(VALUES, profile.a, profile.b, profile.c,
+                                profile.d)
+            self.assertEqual(list(labels(codes)),
+                             [profile.fuzzy_check(v) for v in VALUES],
+                             profile.name)
+
+    def test_profiles_broadcast_over_value_matrix(self):
+        profiles = FuzzyProfiles.from_tool_attributes(PROFILES)
+        values = np.array(VALUES, dtype=float).reshape(-1, 1)
+        ids = np.array([[p.pk for p in PROFILES]])
+        result, degree = profiles.evaluate(values, ids)
+        self.assertEqual(result.shape, (len(VALUES), len(PROFILES)))
+        for row, value in enumerate(VALUES):
+            for column, profile in enumerate(PROFILES):
+                self.assertEqual(result[row, column],
+                                 profile.fuzzy_check(value))
+        self.assertTrue(((degree >= 0) & (degree <= 1)).all())
+
+    def test_degree_of_membership(self):
+        codes, degree = classify([0, 5, 10, 50, 105, 120, 130],
+                                 0, 10, 90, 120)
+        np.testing.assert_allclose(degree, [0, 0.5, 1, 1, 0.5, 0, 0])
+        self.assertEqual(list(codes), [1, 1, 0, 0, 1, 1, 2])
+
+    def test_unknown_profile_is_rejected(self):
+        profiles = FuzzyProfiles.from_tool_attributes(PROFILES)
+        with self.assertRaises(ValueError):
+            profiles.evaluate([1.0], [99])
+
+
+class ClassifyCellsTest(SimpleTestCase):
+
+    def test_matches_calculate_difference_and_fuzzy_logic(self):
+        pairs = [(0, 45), (45, 50), (50, 50), (100, 130), (-5, 3)]
+        cells, expected = [], []
+        for profile in PROFILES:
+            for value_in, value_out in pairs:
+                cells.append(FctAttribute(input=value_in, output=value_out,
+                                          tool_attribute_id=profile.pk))
+                single = FctAttribute(input=value_in, output=value_out,
+                                      tool_attribute=profile)
+                single.calculate_difference_and_fuzzy_logic()
+                expected.append(single)
+
+        classify_cells(cells, FuzzyProfiles.from_tool_attributes(PROFILES))
+        for cell, single in zip(cells, expected):
+            self.assertEqual(
+                (cell.difference, cell.input_possible, cell.output_possible),
+                (single.difference, single.input_possible,
+                 single.output_possible))
+
+    def test_empty_cell_is_not_evaluated(self):
+        # leere Zellen (create_empty_cells) werden ohne Bewertung gespeichert
+        for values in [(None, None, None), (0, None, 1), (0, 5, None)]:
+            cell = FctAttribute(input=values[0], output=values[1],
+                                tool_attribute_id=values[2])
+            cell.calculate_difference_and_fuzzy_logic()
+            self.assertEqual((cell.difference, cell.input_possible,
+                              cell.output_possible), (None, '', ''))
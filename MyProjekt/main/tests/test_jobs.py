@@ -0,0 +1,53 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from main import jobs
+from main.models import Job
+
+
+def running_job(key: str, age: timedelta) -> Job:
+    # laufender Job, dessen Fortschritt zuletzt vor age gemeldet wurde
+    job = Job.objects.create(kind=Job.PRICE_ITEM, status=Job.RUNNING,
+                             key=key)
+    Job.objects.filter(pk=job.pk).update(updated=timezone.now() - age)
+    return job
+
+
+@override_settings(JOB_WORKERS=0, JOB_TIMEOUT=600)
+class StaleJobTest(TestCase):
+
+    def test_running_job_is_returned_within_timeout(self):
+        job = running_job('price_item:1:1', timedelta(seconds=30))
+        self.assertEqual(jobs.enqueue(Job.PRICE_ITEM, {}, key=job.key), job)
+
+    def test_stale_running_job_is_replaced(self):
+        stale = running_job('price_item:1:1', timedelta(hours=1))
+        job = jobs.enqueue(Job.PRICE_ITEM, {}, key=stale.key)
+        self.assertNotEqual(job, stale)
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(jobs.pending_jobs(), [job.pk])
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Job.FAILED)
+
+    def test_recover_only_touches_stale_jobs(self):
+        stale = running_job('a', timedelta(hours=1))
+        fresh = running_job('b', timedelta(seconds=30))
+        self.assertEqual(jobs.recover_stale_jobs(), 1)
+        self.assertEqual(
+            dict(Job.objects.values_list('pk', 'status')),
+            {stale.pk: Job.FAILED, fresh.pk: Job.RUNNING})
+
+    @override_settings(JOB_WORKERS=1)
+    def test_pending_jobs_are_resubmitted_when_pool_starts(self):
+        pending = Job.objects.create(kind=Job.PRICE_ITEM)
+        Job.objects.create(kind=Job.PRICE_ITEM, status=Job.DONE)
+        with mock.patch.object(jobs, '_executor', None), \
+                mock.patch.object(jobs, 'execute') as execute:
+            executor = jobs.start_workers()
+            # weitere Aufrufe verwenden denselben Pool
+            self.assertIs(jobs.start_workers(), executor)
+            executor.shutdown(wait=True)
+        execute.assert_called_once_with(pending.pk)
@@ -0,0 +1,46 @@
+from django.test import TestCase
+
+from main.models import Result
+from main.pricing import (ItemPricer, load_halbzeug_volumes,
+                          load_item_features, load_reference, price_items,
+                          price_reference_items)
+
+from .factories import create_reference
+
+
+def price_values(prices):
+    return [(price.item_id, price.cost, price.ecr, price.fuzzy)
+            for price in prices]
+
+
+class ItemPricerTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.system, cls.items = create_reference(features=4, technologies=3,
+                                                 items=5)
+        cls.item_ids = [item.pk for item in cls.items]
+
+    def test_process_pool_matches_serial(self):
+        basis = load_reference(self.system)
+        features = load_item_features(self.item_ids)
+        volumes = load_halbzeug_volumes(self.item_ids)
+        serial = price_items(basis, features, volumes, ignore_errors=True)
+        self.assertEqual(len(serial), len(self.items))
+        # kleine Blöcke, damit mehrere Aufträge an die Prozesse gehen
+        with ItemPricer(basis, workers=2, chunk_size=2) as pricer:
+            self.assertIsNotNone(pricer.executor)
+            parallel = pricer(features, volumes)
+        self.assertEqual(price_values(parallel), price_values(serial))
+
+    def test_saved_results_match_serial(self):
+        fields = ['npf_max', 'Kf_fpf', 'Krm', 'Kma', 'Kh', 'Kh_npf', 'Gpf']
+        results = {}
+        for workers in [1, 2]:
+            price_reference_items(self.system, self.item_ids,
+                                  workers=workers)
+            results[workers] = list(Result.objects.filter(
+                item__in=self.item_ids).order_by('item_id')
+                .values_list('item_id', *fields))
+            Result.objects.all().delete()
+        self.assertEqual(results[2], results[1])
@@ -0,0 +1,58 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from main.cost_engine import SystemParameters, calculate_costs
+from main.sweep import ParameterAxis, apply_axes, parse_axis, sweep_costs
+
+from .test_cost_engine import (HALBZEUG_VOLUME, MACHINES, MEMBERS, SYSTEM,
+                               TOOLS, chain_from_rows)
+
+
+class SweepTest(SimpleTestCase):
+
+    def setUp(self):
+        self.chain = chain_from_rows(MEMBERS, TOOLS, MACHINES)
+        self.system = SystemParameters(**SYSTEM)
+
+    def test_grid_point_matches_single_calculation(self):
+        axes = [parse_axis('stundenlohn=30,40'),
+                parse_axis('strompreis=0.1:0.3:3'),
+                parse_axis('hauptzeit@bohren=40,50')]
+        result = sweep_costs(self.chain, self.system, HALBZEUG_VOLUME, axes)
+        self.assertEqual(result.shape, (2, 3, 2))
+
+        chain = self.chain.replace(
+            stundenlohn=np.full(3, 40.0), strompreis=np.full(3, 0.2),
+            hauptzeit=[60, 50, 90])
+        expected = calculate_costs(chain, self.system,
+                                   HALBZEUG_VOLUME).general()
+        for name, value in expected.items():
+            self.assertAlmostEqual(float(result[name][1, 1, 1]), value)
+
+    def test_every_axis_changes_the_result(self):
+        axes = [parse_axis('stundenlohn=30,40'),
+                parse_axis('stundenlohn@schlichten=50,60,70')]
+        with self.assertRaises(ValueError):
+            sweep_costs(self.chain, self.system, HALBZEUG_VOLUME, axes)
+        axes = [parse_axis('stundenlohn@bohren=30,40'),
+                parse_axis('stundenlohn@schlichten=50,60,70')]
+        kh = sweep_costs(self.chain, self.system, HALBZEUG_VOLUME, axes)['Kh']
+        self.assertTrue((np.diff(kh, axis=0) != 0).all())
+        self.assertTrue((np.diff(kh, axis=1) != 0).all())
+
+    def test_duplicate_axes_are_rejected(self):
+        for specs in [['stundenlohn=30,40', 'stundenlohn=50,60,70'],
+                      ['strompreis@bohren=0.1', 'strompreis@bohren=0.2'],
+                      ['produktpreis=70,80', 'produktpreis=90'],
+                      ['hauptzeit@bohren=40', 'hauptzeit=50,60']]:
+            with self.subTest(specs=specs), self.assertRaises(ValueError):
+                apply_axes(self.chain, self.system,
+                           [parse_axis(spec) for spec in specs])
+
+    def test_invalid_axes_are_rejected(self):
+        for axis in [ParameterAxis('unbekannt', [1.0]),
+                     ParameterAxis('stundenlohn', [1.0], 'fräsen'),
+                     ParameterAxis('produktpreis', [1.0], 'bohren'),
+                     ParameterAxis('stundenlohn', [])]:
+            with self.subTest(axis=axis), self.assertRaises(ValueError):
+                apply_axes(self.chain, self.system, [axis])
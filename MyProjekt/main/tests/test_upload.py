@@ -0,0 +1,100 @@
+import io
+import warnings
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+from openpyxl import Workbook
+
+from main.utils import processing_excel_file_buffer, read_feature_rows
+
+# Beispieldateien im Wurzelverzeichnis des Repositorys
+SAMPLE_DIR = settings.BASE_DIR.parent
+REFERENCE_FILE = SAMPLE_DIR / 'Rotationssymmetrisches Bauteil.xlsx'
+COMPARE_FILE = SAMPLE_DIR / 'Rotationssymmetrisches Bauteil-vergleich.xlsx'
+
+HALBZEUG_ROW = {
+    '#': '2', 'name': 'halbzeug_rotatorisch',
+    'classifier': 'Halbzeug_rotatorisch', 'prismatic': False,
+    'positive': True,
+    'attributes': {'durchmesser': 100.0, 'länge': 40.0,
+                   'werkstoffbezeichnung': 'S355J2+N'}}
+
+
+def bohrung_row(durchmesser: float):
+    return {'#': '1', 'name': 'bohrung1', 'classifier': 'Bohrung',
+            'prismatic': False, 'positive': False,
+            'attributes': {'bohrungsground': 'kegel',
+                           'durchmesser': durchmesser,
+                           'durchmesser+': 0.217, 'durchmesser-': 0.083,
+                           'länge': 18.0}}
+
+
+def read_file(path):
+    # openpyxl warnt bei unbekannten Excel-Erweiterungen der Beispieldateien
+    with open(path, 'rb') as file, warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        return list(read_feature_rows(file))
+
+
+def workbook_buffer(*rows) -> io.BytesIO:
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class ReadFeatureRowsTest(SimpleTestCase):
+
+    def test_reference_sample(self):
+        self.assertEqual(read_file(REFERENCE_FILE),
+                         [bohrung_row(50.0), HALBZEUG_ROW])
+
+    def test_compare_sample(self):
+        self.assertEqual(read_file(COMPARE_FILE),
+                         [bohrung_row(49.0), HALBZEUG_ROW])
+
+    def test_cell_types_from_header(self):
+        buffer = workbook_buffer(
+            ['Featuretabelle'],
+            ['#', 'Name', 'Classifier', 'prismatic : Boolean',
+             'positive : Boolean', 'Länge : length[millimetre]', 'Gewinde'],
+            [1, 'nut1', 'Nut', 'TRUE', 'false', '12,5 mm', None],
+            [None, None, None, None, None, None, None],
+            [2, 'bohrung2', 'Bohrung', True, False, 40, 'M8'])
+        rows = list(read_feature_rows(buffer))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual((rows[0]['prismatic'], rows[0]['positive']),
+                         (True, False))
+        self.assertEqual(rows[0]['attributes'], {'länge': 12.5})
+        self.assertEqual(rows[1]['attributes'],
+                         {'länge': 40.0, 'gewinde': 'M8'})
+
+    def test_missing_columns_are_rejected(self):
+        buffer = workbook_buffer(['Featuretabelle'], ['#', 'Name'],
+                                 [1, 'nut1'])
+        with self.assertRaises(ValidationError):
+            list(read_feature_rows(buffer))
+
+    def test_invalid_length_is_rejected(self):
+        buffer = workbook_buffer(
+            ['Featuretabelle'],
+            ['#', 'Name', 'Classifier', 'prismatic : Boolean',
+             'positive : Boolean', 'Länge : length[millimetre]'],
+            [1, 'nut1', 'Nut', 'true', 'false', 'zwölf'])
+        with self.assertRaises(ValidationError):
+            list(read_feature_rows(buffer))
+
+    def test_contour_is_appended(self):
+        with open(REFERENCE_FILE, 'rb') as file, warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            rows = processing_excel_file_buffer(
+                {'prismatic': False, 'laenge': 40, 'durchmesser': 100},
+                file)
+        self.assertEqual(rows[-1]['name'], 'kontur')
+        self.assertEqual(rows[-1]['classifier'], 'rotationssymmetrisch')
+        self.assertEqual(rows[-1]['attributes'],
+                         {'länge': 40.0, 'durchmesser': 100.0})
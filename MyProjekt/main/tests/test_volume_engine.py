@@ -0,0 +1,53 @@
+import math
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+
+from main.models import Volume
+from main.volume_engine import (REQUIRED_FIELDS, VOLUME_FIELDS,
+                                calculate_volumes, volume_type_codes)
+
+# Merkmale eines Feature (alle Typen benutzen eine Teilmenge)
+PARAMETERS = {'laenge': 20.0, 'breite': 8.0, 'hoehe': 5.0, 'tiefe': 3.0,
+              'durchmesser': 12.0, 'breite_fuss': 10.0, 'tiefe_fuss': 2.0,
+              'winkel': 0.3}
+
+
+class CalculateVolumesTest(SimpleTestCase):
+
+    def test_each_volume_type_matches_calculate_volume(self):
+        for volume_type, required in REQUIRED_FIELDS.items():
+            with self.subTest(volume_type=volume_type):
+                parameters = {name: PARAMETERS[name] for name in required}
+                expected = Volume(volume_type=volume_type,
+                                  **parameters).calculate_volume()
+                volume = calculate_volumes(
+                    volume_type_codes([volume_type]),
+                    **{name: [value] for name, value in parameters.items()})
+                self.assertTrue(math.isclose(volume[0], expected,
+                                             rel_tol=1e-12))
+
+    def test_mixed_volume_types_in_one_call(self):
+        volume_types = list(REQUIRED_FIELDS) * 3
+        rng = np.random.default_rng(0)
+        values = {name: rng.uniform(1, 50, len(volume_types))
+                  for name in VOLUME_FIELDS}
+        values['winkel'] = rng.uniform(0.1, 0.5, len(volume_types))
+        volumes = calculate_volumes(volume_type_codes(volume_types),
+                                    **values)
+        for index, volume_type in enumerate(volume_types):
+            expected = Volume(volume_type=volume_type, **{
+                name: float(values[name][index])
+                for name in REQUIRED_FIELDS[volume_type]}).calculate_volume()
+            self.assertTrue(math.isclose(volumes[index], expected,
+                                         rel_tol=1e-12), volume_type)
+
+    def test_missing_value_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            calculate_volumes(volume_type_codes([Volume.BOHRUNG]),
+                              durchmesser=[10.0])
+
+    def test_unknown_volume_type_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            volume_type_codes(['kugel'])
@@ -0,0 +1,96 @@
+'''
+Zwischenspeicher für hochgeladene Excel-Dateien
+
+Schlüssel ist ein Hash aus Dateiinhalt und Konturangaben des Formulars
+(prismatic, laenge, breite, hoehe, durchmesser), der Name des Bauteils geht
+nicht ein. Beim erneuten Hochladen derselben Datei werden die bereits
+gelesenen Feature-Zeilen verwendet. Für Vergleichsbauteile werden zudem
+Feature, Merkmale, Volumen und Halbzeug eines bereits aus der Datei
+angelegten Bauteils kopiert, statt sie erneut aufzubauen.
+'''
+import hashlib
+import io
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+
+from .models import Feature, Halbzeug, Item, UploadCache
+from .utils import FeatureRow, clone_features, processing_excel_file_buffer
+
+log = logging.getLogger(__name__)
+
+# Formularangaben, die das Ergebnis des Einlesens bestimmen
+GEOMETRY_FIELDS = ['prismatic', 'laenge', 'breite', 'hoehe', 'durchmesser']
+
+# Anzahl der gespeicherten Dateien (älteste werden zuerst verworfen)
+CACHE_SIZE = 500
+
+
+def upload_key(parameters: Dict[str, Any], payload: bytes) -> str:
+    # Hash aus Dateiinhalt und Konturangaben (float, damit 40 == 40.0)
+    geometry = {name: bool(parameters.get(name)) if name == 'prismatic'
+                else None if parameters.get(name) is None
+                else float(parameters.get(name))
+                for name in GEOMETRY_FIELDS}
+    digest = hashlib.sha256(bytes(payload))
+    digest.update(json.dumps(geometry, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def is_cached(parameters: Dict[str, Any], payload: bytes) -> bool:
+    return UploadCache.objects.filter(
+        key=upload_key(parameters, payload)).exists()
+
+
+def read_upload(parameters: Dict[str, Any], payload: bytes
+                ) -> Tuple[str, List[FeatureRow], Optional[Item]]:
+    '''
+    Feature-Zeilen einer hochgeladenen Datei (aus dem Zwischenspeicher oder
+    eingelesen und abgelegt)
+    Rückgabe: Schlüssel, Zeilen und ggf. Vergleichsbauteil als Vorlage
+    '''
+    key = upload_key(parameters, payload)
+    cached = UploadCache.objects.select_related('item') \
+        .filter(key=key).first()
+    if cached is not None:
+        log.debug(f'Upload {key[:12]}: {len(cached.rows)} Zeilen gespeichert')
+        return key, cached.rows, cached.item
+
+    rows = processing_excel_file_buffer(parameters,
+                                        io.BytesIO(bytes(payload)))
+    try:
+        with transaction.atomic():
+            UploadCache.objects.create(key=key, rows=rows)
+    except IntegrityError:
+        # gleichzeitig von einem anderen Auftrag abgelegt
+        pass
+    prune()
+    return key, rows, None
+
+
+def remember_item(key: str, item: Item) -> None:
+    # Vergleichsbauteil als Vorlage für weitere Uploads der Datei merken
+    UploadCache.objects.filter(key=key).update(item=item)
+
+
+def clone_item(source: Item, item: Item) -> None:
+    '''
+    Feature (mit Merkmalen und Volumen) und Halbzeug eines
+    Vergleichsbauteils kopieren (innerhalb von transaction.atomic())
+    Markierungen aus "FCT-Erweitern" werden nicht übernommen
+    '''
+    clone_features(list(Feature.objects.filter(item=source).order_by('pk')),
+                   item, add_to_fct=None)
+    halbzeuge = list(Halbzeug.objects.filter(item=source).order_by('pk'))
+    for halbzeug in halbzeuge:
+        halbzeug.pk = None
+        halbzeug.item = item
+    Halbzeug.objects.bulk_create(halbzeuge)
+
+
+def prune(size: int = CACHE_SIZE) -> None:
+    # nur die zuletzt hochgeladenen Dateien behalten
+    keep = UploadCache.objects.order_by('-pk').values('pk')[:size]
+    UploadCache.objects.exclude(pk__in=keep).delete()
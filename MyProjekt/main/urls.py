@@ -68,14 +68,16 @@ urlpatterns += [
 
 # CRUD-Aktionen FctTabelle
 urlpatterns += [
-    path('fct_tabelle/<int:pk>/<int:merkmal>',
-         views.FctTableForm.as_view(), name='fct-table')
+    path('fct_tabelle/<int:pk>',
+         views.FctTableGrid.as_view(), name='fct-table')
 ]
 
 # Redirect \ calculation fct_column volumes
 urlpatterns += [
     path('fct_volume/<int:pk>',
          views.CalculateFctTableVolumes.as_view(), name='fct-volume'),
+    path('reference/<int:pk>/price_items',
+         views.ReferencePriceItems.as_view(), name='reference-price-items'),
 
 ]
 
@@ -93,3 +95,9 @@ urlpatterns += [
     path('item_add/<int:pk>/<int:reference>',
          views.ItemAddFeatureToReference.as_view(), name='item-add')
 ]
+
+# Hintergrundaufträge (Upload)
+urlpatterns += [
+    path('job/<int:pk>/', views.JobDetail.as_view(), name='job-detail'),
+    path('job/<int:pk>/status', views.JobStatus.as_view(), name='job-status'),
+]
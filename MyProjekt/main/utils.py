@@ -1,79 +1,178 @@
-from typing import Dict, List
+import re
+from typing import Any, Dict, Iterator, List, Tuple
+import numpy as np
 from django.core.exceptions import ValidationError
-import pandas as pd
+from django.db import connection
+from django.db.transaction import TransactionManagementError
+from django.db.models import Model
+from openpyxl import load_workbook
 from .models import (FeatureAttribute, Item, Feature, Volume,
                      FeatureAttributeText, Halbzeug)
+from .volume_engine import VOLUME_FIELDS, calculate_volumes, volume_type_codes
 
+# Pflichtspalten der Excel-Datei
+VERIFICATION_NAMES = ['name', 'classifier', 'prismatic', 'positive']
 
-def processing_excel_file_buffer(form, xlsx_buffer) -> pd.DataFrame:
+# Anzahl der führenden Spalten (#, Name, Classifier, prismatic, positive),
+# alle folgenden Spalten sind Merkmale
+ATTRIBUTE_OFFSET = 5
+
+# Längenangaben wie "12,5 mm", "50,0mm" oder "40"
+LENGTH_PATTERN = re.compile(r'^\s*([-+]?\d*[.,]?\d+)\s*(mm)?\s*$')
+
+# Zeile der Excel-Datei: name, classifier, prismatic, positive und
+# attributes (Merkmalsname -> float/str, nur belegte Zellen)
+FeatureRow = Dict[str, Any]
+
+
+def parse_length(value: Any) -> float:
+    # Längenangabe in float umwandeln (Einheit entfernen, Komma ersetzen)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = LENGTH_PATTERN.match(str(value))
+    if not match:
+        raise ValidationError(f'Längenangabe "{value}" ungültig')
+    return float(match.group(1).replace(',', '.'))
+
+
+def parse_boolean(value: Any) -> bool:
+    # Boolean-Zellen sind als Text ("true"/"false") oder Wahrheitswert gepflegt
+    if isinstance(value, str):
+        return value.strip().lower() in ['true', 'wahr', '1', 'ja']
+    return bool(value)
+
+
+def is_empty(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def read_feature_rows(xlsx_buffer) -> Iterator[FeatureRow]:
+    '''
+    Excel-Datei zeilenweise lesen (openpyxl read_only)
+    Zeile 2 enthält die Spaltennamen, der Datentyp ergibt sich aus dem
+    Spaltennamen (Boolean, length, sonst Text)
+    Spaltennamen werden gekürzt, sodass nur noch Merkmalsname bleibt
+    alle leeren Zeilen und Zellen werden verworfen
+    '''
+    workbook = load_workbook(xlsx_buffer, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        next(rows, None)
+        header = next(rows, None) or ()
+
+        # (Spaltenindex, Merkmalsname, Parser) aller benannten Spalten
+        columns = []
+        for index, col in enumerate(header):
+            if is_empty(col):
+                continue
+            col = str(col)
+            if 'Boolean' in col:
+                parser = parse_boolean
+            elif 'length' in col:
+                parser = parse_length
+            else:
+                parser = str
+            columns.append((index, col.split(':')[0].strip().lower(), parser))
+
+        names = [name for _, name, _ in columns]
+        if not all(name in names for name in VERIFICATION_NAMES):
+            raise ValidationError('Excel-Format stimmt nicht.')
+
+        for values in rows:
+            row = {'name': None, 'classifier': None, 'prismatic': True,
+                   'positive': True, 'attributes': {}}
+            for index, name, parser in columns:
+                value = values[index] if index < len(values) else None
+                if is_empty(value):
+                    continue
+                value = parser(value)
+                if index < ATTRIBUTE_OFFSET:
+                    row[name] = value
+                else:
+                    row['attributes'][name] = value
+            if row['name'] is None and row['classifier'] is None \
+                    and not row['attributes']:
+                continue
+            yield row
+    finally:
+        workbook.close()
+
+
+def contour_row(cleaned_data: Dict[str, Any]) -> FeatureRow:
+    # Initialfeature (Kontur) aus den Formularangaben
+    if cleaned_data.get('prismatic'):
+        classifier = 'prismatisch'
+        geometry = {'länge': 'laenge', 'höhe': 'hoehe', 'breite': 'breite'}
+    else:
+        classifier = 'rotationssymmetrisch'
+        geometry = {'länge': 'laenge', 'durchmesser': 'durchmesser'}
+
+    attributes = {}
+    for name, field in geometry.items():
+        value = cleaned_data.get(field)
+        if value is None:
+            raise ValidationError(f'Kontur: "{name}" fehlt')
+        attributes[name] = float(value)
+
+    return {'name': 'kontur', 'classifier': classifier,
+            'prismatic': True, 'positive': True,
+            'attributes': attributes}
+
+
+def check_excel_file(xlsx_buffer) -> None:
+    # schnelle Prüfung beim Hochladen: nur Spaltennamen und erste Zeile lesen
+    rows = read_feature_rows(xlsx_buffer)
+    try:
+        next(rows, None)
+    finally:
+        rows.close()
+
+
+def processing_excel_file_buffer(cleaned_data: Dict[str, Any],
+                                 xlsx_buffer) -> List[FeatureRow]:
     '''
     Nach dem hochladen der Ecxel:
-    in DataFrame umwandeln 
-    Initialfeature an DataFrame anhängen
-    Datan-Typen zuweisen und Einheiten sowie Komma mit Punkt ersetzen
-    Spaltennamen kürzen, sodass nur noch Merkmalsname bleibt
-    alle leeren Zeilen und Spalten werden verworfen
+    Zeilen als typisierte Feature-Zeilen lesen
+    Initialfeature (Kontur) aus den Formularangaben anhängen
     '''
-    df = pd.read_excel(xlsx_buffer, header=1)
+    rows = list(read_feature_rows(xlsx_buffer))
 
     # append initialfeature an FCT-Tabelle anhängen
-    # TODO: add non-prismatic check and if-clause
-    if form.cleaned_data.get('prismatic'):
-        df = df.append({
-            'Name': 'kontur',
-            'Classifier': 'prismatisch',
-            'Länge : length[millimetre]': f"{form.cleaned_data.get('laenge')} mm",
-            'Höhe : length[millimetre]': f"{form.cleaned_data.get('hoehe')} mm",
-            'Breite : length[millimetre]': f"{form.cleaned_data.get('breite')} mm",
-        }, ignore_index=True)
-    else:
-        df = df.append({
-            'Name': 'kontur',
-            'Classifier': 'rotationssymmetrisch',
-            'Länge : length[millimetre]': f"{form.cleaned_data.get('laenge')} mm",
-            'Durchmesser : length[millimetre]': f"{form.cleaned_data.get('durchmesser')} mm",
-        }, ignore_index=True)
-    # Datentypen zuweisen
-    for col in df.columns.tolist():
-        if 'Boolean' in col:
-            df[col] = df[col].astype('bool')
-        elif 'length' in col:
-            df[col] = df[col].apply(str).str.replace('mm', '')
-            df[col] = df[col].str.replace(',', '.')
-            df[col] = df[col].astype('float64')
-        else:
-            df[col] = df[col].astype('string')
-    # Spaltenname vereinfachen
-    df.columns = [col.split(':')[0].strip().lower()
-                  for col in df.columns.tolist()]
-    # Alle NaN-Spalten und NaN-Zeilen droppen
-    df = df.dropna(how='all')
-    df = df.dropna(axis=1, how='all')
-    return df
+    rows.append(contour_row(cleaned_data))
+    return rows
 
 
-def create_features_from_df(df: pd.DataFrame, model: Item) -> None:
-    for index, row in df.iterrows():
+def create_features_from_rows(rows: List[FeatureRow], model: Item) -> None:
+    '''
+    Feature, Merkmale, Volumen und Halbzeug zuerst im Speicher aufbauen und
+    validieren, anschließend mit bulk_create abspeichern
+    (Aufruf innerhalb von transaction.atomic())
+    '''
+    halbzeuge = []
+    features = []
+    attributes = []
+    volumes = []
+    for row in rows:
+        values = row['attributes']
 
         # create feature
         if row['name'] == 'halbzeug_prismatisch':
-            # hier Halbzeug abspeichern
-            # TODO: unterscheidung prismatisch
+            # hier Halbzeug anlegen
             # TODO: validate that only one halbzeug is created
-            Halbzeug(
+            halbzeuge.append(Halbzeug(
                 item=model,
-                laenge=row['länge'],
-                hoehe=row['höhe'],
-                breite=row['breite'],
-            ).save()
+                laenge=values.get('länge'),
+                hoehe=values.get('höhe'),
+                breite=values.get('breite'),
+            ))
         elif row['name'] == 'halbzeug_rotatorisch':
-            Halbzeug(
+            halbzeuge.append(Halbzeug(
                 item=model,
-                laenge=row['länge'],
-                durchmesser=row['durchmesser'],
-            ).save()
+                laenge=values.get('länge'),
+                durchmesser=values.get('durchmesser'),
+            ))
         else:
-            # hier Feature abspeichern
+            # hier Feature anlegen
             feature = Feature(
                 name=row['name'],
                 classifier=row['classifier'],
@@ -81,62 +180,94 @@ def create_features_from_df(df: pd.DataFrame, model: Item) -> None:
                 is_positive=row['positive']
             )
             feature.clean()
-            feature.save()
+            feature.clean_fields(exclude=['item'])
+            features.append(feature)
 
-            # create attribute with filtered indices (only values)
+            # create attribute (only values)
             # Merkmale bestimmen
-            filtered_indices = row.iloc[5:].dropna().index.tolist()
-            data_dict = create_attributes(row, filtered_indices, feature)
+            feature_attributes, data_dict = create_attributes(values, feature)
+            attributes.extend(feature_attributes)
 
             # if volume data then create volume and reference feature
             if data_dict:
                 data_dict['feature'] = feature
                 data_dict['volume_type'] = row['classifier'].lower()
-                create_feature_volume(data_dict)
+                volumes.append(create_feature_volume(data_dict))
+
+    for halbzeug in halbzeuge:
+        halbzeug.calculate_volume()
 
+    # abspeichern (Feature zuerst, damit die Fremdschlüssel gesetzt sind)
+    Halbzeug.objects.bulk_create(halbzeuge)
+    bulk_create_with_pk(features)
+    FeatureAttribute.objects.bulk_create(
+        [attr for attr in attributes if isinstance(attr, FeatureAttribute)])
+    FeatureAttributeText.objects.bulk_create(
+        [attr for attr in attributes if isinstance(attr, FeatureAttributeText)])
 
-def create_attributes(row: pd.Series, indices: List[str],
-                      model: Feature) -> Dict:
-    # Merkmale sortieren und abspeichern
+    # Volumen validieren und in einem Aufruf berechnen (der Fremdschlüssel
+    # wird nach dem Speichern der Feature übernommen)
+    for volume in volumes:
+        volume.clean()
+        volume.feature_id = volume.feature.pk
+    calculate_feature_volumes(volumes)
+    Volume.objects.bulk_create(volumes)
+
+
+def create_attributes(attributes: Dict[str, Any],
+                      model: Feature) -> Tuple[List[Model], Dict]:
+    # Merkmale sortieren und validieren (noch nicht abgespeichert)
     # add possible volume_fields to dict
     data_dict = {}
+    feature_attributes = []
     possible_volume_fields = ['länge', 'breite', 'höhe', 'tiefe', 'durchmesser',
                               'breite_fuss', 'tiefe_fuss', 'winkel']
-    for column_name in indices:
+    for column_name, value in attributes.items():
         # ignore tolerance (for now)
         if not '+' in column_name and not '-' in column_name:
-            if isinstance(row[column_name], str):
-                # save TextAttribute
+            if isinstance(value, str):
+                # TextAttribute
                 attr = FeatureAttributeText(
                     name=column_name,
-                    value=row[column_name],
+                    value=value,
                     feature=model)
-            elif isinstance(row[column_name], float):
-                # save NumericAttribute
+            elif isinstance(value, float):
+                # NumericAttribute
                 attr = FeatureAttribute(
                     name=column_name,
-                    value=row[column_name],
+                    value=value,
                     feature=model)
                 # add attribute to data_dict for volume calculation
                 if column_name in possible_volume_fields:
-                    data_dict[remove_umlaut(column_name)] = row[column_name]
+                    data_dict[remove_umlaut(column_name)] = value
 
             else:
                 # should be string or float -> reduce ambiguity
                 raise ValidationError('Spalten-Typ nicht definiert.')
             attr.clean()
-            attr.save()
-            print(attr)
+            attr.clean_fields(exclude=['feature'])
+            feature_attributes.append(attr)
 
-    return data_dict
+    return feature_attributes, data_dict
 
 
-def create_feature_volume(data_dict: Dict) -> None:
+def create_feature_volume(data_dict: Dict) -> Volume:
     # Volumen aller Feature der Excel-Datei
-    # create feature volume from dict
-    volume = Volume(**data_dict)
-    volume.clean()
-    volume.save()
+    # create feature volume from dict (validiert nach dem Speichern der Feature)
+    return Volume(**data_dict)
+
+
+def calculate_feature_volumes(volumes: List[Volume]) -> None:
+    # Volumen ohne Volume.save() berechnen (bulk_create ruft save nicht auf)
+    if not volumes:
+        return
+    values = calculate_volumes(
+        volume_type_codes([volume.volume_type for volume in volumes]),
+        **{name: [np.nan if getattr(volume, name) is None
+                  else getattr(volume, name) for volume in volumes]
+           for name in VOLUME_FIELDS})
+    for volume, value in zip(volumes, values):
+        volume.volume = float(value)
 
 
 def remove_umlaut(string: str):
@@ -160,3 +291,79 @@ def remove_umlaut(string: str):
 
     string = string.decode('utf-8')
     return string
+
+
+def bulk_create_with_pk(objs: List[Model], batch_size: int = None) -> List[Model]:
+    '''
+    bulk_create mit anschließender Zuweisung der Primärschlüssel
+    SQLite liefert bei bulk_create keine ids zurück. Nach dem INSERT hält die
+    Transaktion die Schreibsperre, daher sind die letzten len(objs) Zeilen
+    der Tabelle die eigenen (nur innerhalb von transaction.atomic() verwenden)
+    '''
+    if not objs:
+        return objs
+    if not connection.in_atomic_block:
+        raise TransactionManagementError(
+            'bulk_create_with_pk nur innerhalb von transaction.atomic()')
+    model = type(objs[0])
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    # Datenbanken mit RETURNING setzen die ids bereits selbst
+    if not connection.features.can_return_rows_from_bulk_insert and \
+            objs[0].pk is None:
+        pks = model.objects.order_by('-pk').values_list(
+            'pk', flat=True)[:len(objs)]
+        for obj, pk in zip(objs, reversed(list(pks))):
+            obj.pk = pk
+    return objs
+
+
+def clone_features(features: List[Feature], item: Item,
+                   **changes: Any) -> Tuple[List[Feature], List[FeatureAttribute]]:
+    '''
+    Feature mit Merkmalen, Text-Merkmalen und Volumen an ein anderes Bauteil
+    kopieren (feste Anzahl an Abfragen, innerhalb von transaction.atomic())
+    changes: zusätzlich gesetzte Felder der Kopien (z.B. add_to_fct=True)
+    Rückgabe: neue Feature und neue Merkmale (mit Primärschlüssel)
+    '''
+    if not features:
+        return [], []
+    old_ids = [f.pk for f in features]
+    attributes = list(FeatureAttribute.objects.filter(
+        feature_id__in=old_ids).order_by('pk'))
+    texts = list(FeatureAttributeText.objects.filter(
+        feature_id__in=old_ids).order_by('pk'))
+    volumes = list(Volume.objects.filter(
+        feature_id__in=old_ids).order_by('pk'))
+
+    # Feature kopieren (ids werden für die Fremdschlüssel benötigt)
+    clones = {}
+    for f in features:
+        old_id = f.pk
+        f.pk = None
+        f.item = item
+        for name, value in changes.items():
+            setattr(f, name, value)
+        clones[old_id] = f
+    bulk_create_with_pk(features)
+
+    # Kinder auf die Kopien umhängen
+    for child in attributes + texts + volumes:
+        child.feature = clones[child.feature_id]
+        child.pk = None
+    bulk_create_with_pk(attributes)
+    FeatureAttributeText.objects.bulk_create(texts)
+    Volume.objects.bulk_create(volumes)
+    return features, attributes
+
+
+def clone_attributes(attributes: List[FeatureAttribute],
+                     features: Dict[str, Feature]) -> List[FeatureAttribute]:
+    '''
+    Merkmale an gleichnamige Feature eines anderen Bauteils kopieren
+    features: Featurename -> Feature des Zielbauteils
+    (ein bulk_create, innerhalb von transaction.atomic())
+    '''
+    for attr in attributes:
+        attr.feature = features[attr.feature.name]
+        attr.pk = None
+    return bulk_create_with_pk(attributes)
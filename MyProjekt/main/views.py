@@ -1,14 +1,16 @@
+import json
 import logging
-import pprint
 from typing import Any, Dict, List, Optional
-from django.core.exceptions import ObjectDoesNotExist, ValidationError, ViewDoesNotExist
+from django.core.exceptions import ObjectDoesNotExist, ViewDoesNotExist
 from django.db.models.fields import PositiveIntegerRelDbTypeMixin
 from django.db.models.query import QuerySet
 from django.views.generic.base import RedirectView
 from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
 from django.forms.models import BaseModelForm
 from django.http.request import HttpRequest
-from django.http.response import HttpResponse
+from django.http.response import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.urls.base import reverse
 from django.views.generic.detail import DetailView
@@ -16,13 +18,21 @@ from django.views.generic.list import ListView
 from django.views.generic import TemplateView
 from django.views.generic.edit import (
     CreateView, FormView, UpdateView, DeleteView)
-from extra_views.formsets import ModelFormSetMixin, ModelFormSetView
 
-from .models import CostReference, EcrCost, EcrFuzzy, FctAttribute, FctMembership, Feature, FeatureAttribute, Halbzeug, Result
+from .models import CostReference, EcrCost, EcrFuzzy, FctMembership, Feature, FeatureAttribute, FeatureVolume, Result
 from .models import Item, ReferenceSystem, Technology, Tool, ToolAttribute
-from .models import Volume
+from .models import Job
+from .pricing import price_reference_items
+from .fct_grid import CELLS_FIELD, FctGrid
+from .fct_table import (FctStatus, create_empty_cells,
+                        recalculate_membership_volumes,
+                        update_membership_volumes)
+from .item_diff import (added_features, added_merkmale, item_differences,
+                        removed_features, update_differences)
+from .jobs import enqueue, price_item_key, start_workers
+from .pagination import KeysetPaginationMixin
 from .forms import AddTechnologyToReferenceSystemForm, ItemUploadForm, ReferenceItemUploadForm
-from .utils import create_features_from_df, remove_umlaut
+from .utils import clone_attributes, clone_features
 
 log = logging.getLogger(__name__)
 
@@ -36,13 +46,21 @@ class IndexView(TemplateView):
         return ['main/index.html']
 
 
-class ReferenceList(ListView):
+class ReferenceList(KeysetPaginationMixin, ListView):
     '''
     Liste aller Referenzsysteme
     '''
     model = ReferenceSystem
     template_name = 'main/reference/list.html'
 
+    def get_queryset(self) -> QuerySet:
+        # nur die angezeigten Spalten, Anzahlen per SQL
+        return super().get_queryset().only(
+            'name', 'laufzeit_jahr', 'betrachtungszeitraum', 'produktpreis',
+            'lohnnebenkostenanteil', 'dichte', 'kilopreis').annotate(
+            technology_count=Count('fctmembership', distinct=True),
+            item_count=Count('compare_reference', distinct=True))
+
 
 class ReferenceDetail(DetailView):
     '''
@@ -54,27 +72,30 @@ class ReferenceDetail(DetailView):
 
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        fea = Feature.objects.filter(
-            item__reference_id=self.kwargs.get('pk'))
-        tech = FctMembership.objects.filter(
-            reference=self.kwargs.get('pk'))
-
-        # Buttons für Volumenberechnung nur Anzeigen, wenn WERTE in FCT-Tabelle
-        length = 0
-        for f in fea:
-            length += len(f.featureattribute_set.all())
-        context['features'] = fea
-
-        if tech:
-            show_get_volume = True
-        else:
-            show_get_volume = False
-        for t in tech:
-            if length != len(t.fctattribute_set.all()):
-                show_get_volume = False
-
-        context['technologies'] = tech
-        context['show'] = show_get_volume
+        context['features'] = Feature.objects.filter(
+            item__reference_id=self.kwargs.get('pk')).exists()
+
+        # Buttons für Volumenberechnung nur Anzeigen, wenn alle WERTE in
+        # FCT-Tabelle eingetragen sind (Anzahl je Technologie per SQL)
+        status = FctStatus.load(self.kwargs.get('pk'))
+        context['technologies'] = status.members
+        context['show'] = status.complete
+
+        # gespeicherte Volumenänderung je Feature und Technologie
+        # (Zeilen: Feature, Spalten: Technologien der Fertigungsprozessfolge)
+        columns = {member.pk: index
+                   for index, member in enumerate(status.members)}
+        feature_volumes = {}
+        for f_name, feature_id, membership_id, volume_in, volume_out in \
+                FeatureVolume.objects.filter(
+                    membership__reference=self.kwargs.get('pk'))\
+                .order_by('feature_id').values_list(
+                    'feature__name', 'feature_id', 'membership_id',
+                    'input_volume', 'output_volume'):
+            row = feature_volumes.setdefault(
+                feature_id, (f_name, [None] * len(columns)))
+            row[1][columns[membership_id]] = volume_out - volume_in
+        context['feature_volumes'] = list(feature_volumes.values())
         ref = Item.objects.filter(compare_reference=self.kwargs.get('pk'))
         if ref:
             context['add_to_fct'] = ref[0].feature_set.filter(
@@ -177,6 +198,12 @@ class ReferenceSystemDelete(DeleteView):
         return context
 
 
+def upload_parameters(form) -> Dict[str, Any]:
+    # Formularangaben für den Hintergrundauftrag (JSON-serialisierbar)
+    return {name: form.cleaned_data.get(name) for name in
+            ['name', 'prismatic', 'laenge', 'breite', 'hoehe', 'durchmesser']}
+
+
 class ReferenceUpload(FormView):
     '''
     Hochladen eines Referenzsystems mit Button für zurück
@@ -191,48 +218,32 @@ class ReferenceUpload(FormView):
         context['reference'] = self.reference
         return context
 
-    def get_success_url(self) -> str:
-        # access model from form_valid to generate complete url
-        return reverse('refupload', args=[str(self.model.id)])
-
     def form_valid(self, form: ReferenceItemUploadForm) -> HttpResponse:
-        try:
+        # Datei im Hintergrund einlesen und auf die Statusseite weiterleiten
+        job = enqueue(Job.UPLOAD_REFERENCE,
+                      dict(upload_parameters(form),
+                           reference=self.kwargs.get('pk')),
+                      form.cleaned_data['file'].read())
+        return redirect(job)
 
-            # add attribute to instance to access it in get_success_url
-            # kwargs ist keyword und zieht die Informationen aus der url
-            self.model = ReferenceSystem.objects.get(pk=self.kwargs.get('pk'))
 
-            # create item for reference system
-            item = Item(reference=self.model,
-                        name=form.cleaned_data.get('name'))
-
-            # start transaction to save df to db as features and attrs
-            with transaction.atomic():
-                item.save()
-
-                # create features and merkmale
-                create_features_from_df(
-                    form.process_dataframe, item)
-
-                # return form is valid and saved
-                return super().form_valid(form)
-
-        # raise exception if transaction failed
-        except Exception as err:
-            log.exception(err)
-            form.add_error(
-                None, error='Database INSERT failed => Transaction ROLLBACK')
-            # return form with errors
-            return super().form_invalid(form)
-
-
-class TechnologyList(ListView):
+class TechnologyList(KeysetPaginationMixin, ListView):
     '''
     Liste aller Technologien in der Datenbank
     '''
     model = Technology
     template_name = 'main/technology/list.html'
 
+    def get_queryset(self) -> QuerySet:
+        # nur die angezeigten Spalten, Anzahlen per SQL
+        return super().get_queryset().only(
+            'name', 'anschaffungswert', 'verkaufserlös', 'abschreibungsdauer',
+            'platzbedarf', 'mittlere_leistung', 'stundenlohn',
+            'fertigungsmittelanzahl', 'bediehnverhaeltnis').annotate(
+            tool_count=Count('tool', distinct=True),
+            reference_count=Count('tool__fctmembership__reference',
+                                  distinct=True))
+
 
 class TechnologyDetail(DetailView):
     '''
@@ -385,128 +396,59 @@ class ToolAttributeDelete(DeleteView):
         return reverse('technology-detail', args=[str(self.kwargs.get('technology_id'))])
 
 
-class FctTableForm(ModelFormSetView):
+class FctTableGrid(TemplateView):
     '''
-    Darstellung der FCT-Tabelle
-    ModelFormSetView ist eine Extension und kombiniert
+    Bearbeitung der gesamten FCT-Tabelle (alle Merkmale x Technologien)
+    auf einer Seite, Laden und Prüfen siehe fct_grid.FctGrid
     '''
-    template_name = 'main/reference/fct_table_form.html'
-    model = FctAttribute
-    exclude = ['difference', 'input_possible', 'output_possible']
+    template_name = 'main/reference/fct_grid.html'
 
-    # Informationen und Aktionen die auf der Seite Angezeigt/Durchgeführt
-    # werden sollen
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        grid = kwargs.pop('grid', None) or FctGrid(self.kwargs.get('pk'))
+        errors = kwargs.pop('errors', {})
+        rows = grid.rows(kwargs.pop('values', None), errors)
         context = super().get_context_data(**kwargs)
-
-        context['merkmal'] = self.merkmal
-
-        # get next and previous merkmal
-        context['next'] = FeatureAttribute.objects.filter(
-            feature__item__reference=self.kwargs.get('pk'), id__gt=self.merkmal.id,
-        ).first()
-
-        context['back'] = FeatureAttribute.objects.filter(
-            feature__item__reference=self.kwargs.get('pk'),
-            id__lt=self.merkmal.id).order_by('-id').first()
-
-        # get reference system
         context['reference'] = ReferenceSystem.objects.get(
             pk=self.kwargs.get('pk'))
-
-        print(context['next'])
-
-        # print(Feature.objects.filter(item__reference=self.kwargs.get('pk')).all())
+        context['members'] = grid.members
+        context['rows'] = rows
+        context['error_count'] = sum(len(cell) for cell in errors.values())
         return context
 
-    def get_factory_kwargs(self):
-        # get current merkmal
-        self.merkmal = FeatureAttribute.objects.get(
-            pk=self.kwargs.get('merkmal'))
-
-        # die Anzahl der Spalten wird an formset übergeben
-        # generate arguments for formset_factory
-        kwargs = super().get_factory_kwargs()
-        self.members = FctMembership.objects.filter(
-            reference=self.kwargs.get('pk'))
-        kwargs['max_num'] = len(self.members)
-        kwargs['min_num'] = len(self.members)
-        print(len(self.members))
-        return kwargs
-
-    def get_queryset(self) -> QuerySet:
-        # get all fctattribute for update
+    def post(self, request: HttpRequest, *args: Any, **kwargs: Any
+             ) -> HttpResponse:
         reference_pk = self.kwargs.get('pk')
-        queryset = super(FctTableForm, self).get_queryset().filter(
-            membership__reference__id=reference_pk,
-            feature_attribute__id=self.kwargs.get('merkmal')).order_by('membership')
-        return queryset
-
-    def get_initial(self):
-        # initialize empty forms
-        attribute = FeatureAttribute.objects.get(pk=self.kwargs.get('merkmal'))
-        initial_data = [{'feature_attribute': attribute.id,
-                         'membership': member.id} for member in self.members]
-        return initial_data
-
-    def construct_formset(self):
-        formset = super().construct_formset()
-        # add choices filtered by fctmembership
-        for index, form in enumerate(formset):
-            if not form.fields.get('tool_attribute').queryset:
-                form.fields.get(
-                    'tool_attribute').queryset = self.members[index] \
-                    .tool.toolattribute_set.all()
-        return formset
-
-    def formset_valid(self, formset):
-        # validate in- and outputs then save forms
-        self.object_list = formset.save(commit=False)
-        try:
-            # start saving models with transaction
-            with transaction.atomic():
-                for index, form in enumerate(formset):
-
-                    # check for misaligned in and output
-                    if index < len(formset) - 1 and \
-                        form.cleaned_data['output'] != \
-                            formset[index + 1].cleaned_data['input']:
-                        form.add_error(
-                            'output', error='ouput checken')
-                        formset[index + 1].add_error(
-                            'input', error='input checken')
-                        raise ValidationError(f'Form-{index}: Input != Output')
-
-                    # check if output matches target from merkmal
-                    elif index == len(formset) - 1 and \
-                            form.cleaned_data['output'] != self.merkmal.value:
-                        form.add_error(
-                            'output', error='stimmt nicht mit Zielwert überein')
-                        raise ValidationError(
-                            f'Form-{index}: Output != Zielwert')
-
-                    # wenn kein fehler auftritt, werden die FCT In- und Outputs in
-                    # die Tabelle FCT-Attribute abgespeichert
-                    form.save()
-            return super(ModelFormSetMixin, self).formset_valid(formset)
-
-        # consume exception and render form with error
-        except Exception as err:
-            log.exception(err)
-            return super().formset_invalid(formset)
-
-    def get_success_url(self) -> str:
-        next_merkmal = FeatureAttribute.objects.filter(
-            feature__item__reference=self.kwargs.get('pk'),
-            id__gt=self.merkmal.id).first()
-        # got to next fct-table row if there is next_merkmal
-        if next_merkmal:
-            return reverse('fct-table', args=[str(self.kwargs.get('pk')),
-                                              str(next_merkmal.id)])
-        # else go back to reference-system overview
-        else:
-            return reverse('referencemodel-detail',
-                           args=[str(self.kwargs.get('pk'))])
+        # geänderte Felder als ein JSON-Feld (siehe fct_grid.CELLS_FIELD),
+        # ohne JavaScript einzelne Formularfelder
+        data = request.POST
+        if CELLS_FIELD in request.POST:
+            try:
+                data = json.loads(request.POST[CELLS_FIELD])
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                return HttpResponseBadRequest('ungültige FCT-Tabelle')
+        grid = FctGrid(reference_pk)
+        values, errors = grid.parse(data)
+        rows = grid.validate(values, errors)
+        if errors:
+            # Formular mit den eingetragenen Werten und Fehlern anzeigen
+            return self.render_to_response(self.get_context_data(
+                grid=grid, values=values, errors=errors))
+
+        with transaction.atomic():
+            features = grid.save(values, rows)
+            # Volumen der Technologien nur um die Änderung eines Features
+            # anpassen, sonst (mehrere Feature, erste vollständige Tabelle)
+            # alle Volumen neu berechnen
+            if features and not (
+                    len(features) == 1 and update_membership_volumes(
+                        reference_pk, next(iter(features)))) and \
+                    FctStatus.load(reference_pk).complete:
+                recalculate_membership_volumes(reference_pk)
+        log.debug(f'FCT-Tabelle {reference_pk}: {len(features)} Feature '
+                  f'geändert')
+        return redirect('referencemodel-detail', pk=reference_pk)
 
 
 class CalculateFctTableVolumes(RedirectView):
@@ -517,103 +459,18 @@ class CalculateFctTableVolumes(RedirectView):
     # TODO: set messages for errors
 
     def dispatch(self, request, *args, **kwargs):
-        # get all technologies
-        members = FctMembership.objects.filter(
-            reference=self.kwargs.get('pk')).all()
-        # get all features
-        features = Feature.objects.filter(
-            item__reference_id=self.kwargs.get('pk'))
-
-        # beschreibt die volumenbeschreibenden Merkmale
-        # wird für die Bestimmung der benötigten Merkmale für die Berechnung der
-        # Volumen verwendet
-        possible_volume_fields = ['länge', 'breite', 'höhe', 'tiefe', 'durchmesser',
-                                  'breite_fuss', 'tiefe_fuss', 'winkel']
-
         try:
+            # die gesamte FCT-Tabelle wird mit wenigen Abfragen als
+            # (Merkmal x Technologie) Input- und Output-Matrix geladen,
+            # die Volumen aller Feature werden in Abhängigkeit des
+            # Vorzeichens (is_positive) aufsummiert und in FCT-Membership
+            # abgespeichert
             with transaction.atomic():
-                # set volumes for every technology
-                # durch die Spalten jeder Technologie in der Fertigungsprozessfolge
-                # FCT_Member
-
-                for technology in members:
-
-                    volume_input_num = 0
-                    volume_output_num = 0
-                    # itereate over features and create dict to hold values for volume
-                    # jedes Feature nehmen und in Abhängigkeit des Classifiers in ein
-                    # dict speichern (für In- und Output)
-                    for feature in features:
-                        # zwei Dictionarys werden instanziirt für Input und Output
-                        # der erste Key ist volume_type und wird mit dem Classifier des Features gefüllt
-                        volume_input = {
-                            'volume_type': feature.classifier.lower()}
-                        volume_output = {
-                            'volume_type': feature.classifier.lower()}
-                        # iterate over merkmale and save value in corresponding dicts
-                        # alle Merkmale des betrachteten Features werden genommen und einzelnt
-                        # durchiteriert
-                        merkmale = feature.featureattribute_set.all()
-                        for merkmal in merkmale:
-                            # in diesem Schritt werden die volumenbeschreibenden Merkmale eines Features ausgewählt
-                            # falls ein Merkmal in der Iteration ist, wird die Schleife von vorne begonnen mit dem nächsten
-                            # Merkmal
-                            if merkmal.name not in possible_volume_fields:
-                                continue
-                            # ist ein Merkmal in der Liste der volumenbeschreibden Feature,
-                            # so wird der Input und der Output aus FCT-Attribute des Merkmals
-                            # für das zugehörenden FCT-Member Spalte in die Dicts für Vol_in und Vol_out gespeichert
-                            volume_input[remove_umlaut(merkmal.name)] = merkmal \
-                                .fctattribute_set.filter(
-                                membership=technology.id).first().input
-                            volume_output[remove_umlaut(merkmal.name)] = merkmal. \
-                                fctattribute_set.filter(
-                                membership=technology.id).first().output
-
-                       # calculate volumes
-                       # Volumenberechnung in Abhängigkeit des Vorzeichens
-                       # (is_positive True oder False)
-                       # in diesem Punkt wird das Dict mit den In- und Outputs alles volumenbeschreibender
-                       # Merkmale des Features zu einem Volumen berechnet
-                       # hierbei wird unterschieden, ob es ein positives oder negatives Formelement ist (is_positive)
-                        if feature.is_positive:
-                            # wenn positive += addieren
-                            # das dict vol_input für ein Feature der ausgewählten Spalte (FCT-Member) wird an die Klasse Volume
-                            # übergeben. hier werden die Volumenfunktionen in Abhängigkeit des volume_types aufgerufen und berechnet
-                            volume_input_num += Volume(
-                                **volume_input).calculate_volume()
-                            volume_output_num += Volume(
-                                **volume_output).calculate_volume()
-
-                        else:
-                            # wenn nicht positive -= subtrahieren
-                            # analog wie bei oben bei if is_positive
-                            volume_input_num -= Volume(
-                                **volume_input).calculate_volume()
-                            volume_output_num -= Volume(
-                                **volume_output).calculate_volume()
-
-                    # die Ergebnisse für jedes Feature im gleichen FCT-Member werden auf vol_in_num und vol_out_num draufaddiert
-                    # sodass nach dem letzte Feature das Gesamtvolumen für die Technologie (FCT-Member) in die Tabelle FCT-Member
-                    # Abgespeichert werden kann
-                    # pro feature in und output sind somit berechnet für eine FCT-Member-Spalte und haben ein
-                    # positives oder negative Forzeichen (is_positive = True or False)
-
-                    # ist eine Technologie (Spalte FCT-Member) durchlaufe wird die nächste Technologie durchiteriert.
-                    # Damit nicht die Werte aus der vorherigen Technologie für vol_in_num und vol_out_num verwendet werden wird zu beginn
-                    # dieser immer auf 0 gesetzt (siehe oben)
-
-                    # an Technologie anhängen und in FCT-Membership abspeichern
-                    # Input und Outputvolumen pro Technologie in FCT
-                    technology.input_volume = volume_input_num
-                    technology.output_volume = volume_output_num
-                    technology.difference_volume = abs(
-                        volume_output_num - volume_input_num)
-                    technology.save()
+                recalculate_membership_volumes(self.kwargs.get('pk'))
 
         # consume errors and TODO: send messsage
         # Fehlermeldungen
-        except AttributeError as err:
+        except ValueError as err:
             log.exception(err)
             log.debug('//Es sind nicht alle In- und Outputs eingetragen//')
 
@@ -628,7 +485,7 @@ class CalculateFctTableVolumes(RedirectView):
                        args=[str(self.kwargs.get('pk'))])
 
 
-class CustomerItems(ListView):
+class CustomerItems(KeysetPaginationMixin, ListView):
     '''
     Zusammenfassung der Vergleichsbauteile
     '''
@@ -636,7 +493,15 @@ class CustomerItems(ListView):
     model = Item
 
     def get_queryset(self) -> QuerySet:
-        return super().get_queryset().filter(reference=None)
+        # letzte Änderungskosten und Anzahl der Abweichungen per SQL
+        # statt zwei Abfragen pro Bauteil
+        last_cost = EcrCost.objects.filter(item=OuterRef('pk')) \
+            .order_by('-pk').values('G')[:1]
+        return super().get_queryset().filter(reference=None) \
+            .select_related('compare_reference') \
+            .only('name', 'compare_reference__name').annotate(
+                cost=Subquery(last_cost),
+                difference_count=Count('itemdifference'))
 
 
 class CustomerItem(DetailView):
@@ -680,60 +545,13 @@ class CustomerItem(DetailView):
         context['fuzzy_maybe'] = fuzzy_maybe
         context['fuzzy_not'] = fuzzy_not
 
-        # Referenzsystem
-        system = item.compare_reference
-
-        # Features des Referenzbauteils
-        s = system.item.feature_set.all()
-
-        # Features des Vergleichsbauteils
-        i = item.feature_set.all()
-
-        # Bauteilvergleich auf Featureebene
-        s_name = set([si.name for si in s])
-        i_name = set([si.name for si in i])
-        duplicates = s_name & i_name
-        only_s = s_name.difference(i_name)
-        only_i = i_name.difference(s_name)
-
-        if only_i or only_s:
-            # true if ungleich
-            print(only_s)
-            print(only_i)
-
-        # Bauteilvergleich auf Merkmalsebene
-        # alle Feature die im Referenzbauteil als auch im Vergleichsbauteil
-        # sind werden hinsichtlich ihrer Merkmale verglichen
-        for name in duplicates:
-            # Feature des Vergleichsbauteils mit dem betrachteten Namen in
-            # Iteration
-            f_i = i.filter(name=name).first()
-            # alle Merkmale des Features des Vergleichsbauteils
-            f_att_i = f_i.featureattribute_set.all()
-            # Feature des Referenzbauteils mit dem betrachteten Namen in
-            # der Iteration
-            f_s = s.filter(name=name).first()
-            # alle Merkmale des Features des Referenzbauteils
-            f_att_s = f_s.featureattribute_set.all()
-
-            fs_name = set([si.name for si in f_att_s])
-            fi_name = set([si.name for si in f_att_i])
-            duplicates = fs_name & fi_name
-
-            only_fs_name = fs_name.difference(fi_name)
-            # alle Merkmale des betrachteten Features die ausschließlich im
-            # Vergleichsbauteil sind
-            only_fi_name = fi_name.difference(fs_name)
-
-            if only_fi_name or only_fs_name:
-                # true if ungleich
-                print('nur im vergleich')
-                print(only_fi_name)
-                print('nur im ref')
-                print(only_fs_name)
-
-        context['only_item_merkmale'] = only_fi_name
-        context['only_item'] = only_i
+        # Bauteilvergleich auf Feature- und Merkmalsebene (beim Hochladen
+        # berechnet, siehe item_diff.py)
+        differences = item_differences(item)
+        context['differences'] = differences
+        context['only_item_merkmale'] = [
+            d.merkmal_name for d in added_merkmale(differences)]
+        context['only_item'] = added_features(differences)
 
         return context
 
@@ -748,49 +566,45 @@ class ItemAddFeatureToReference(RedirectView):
 
         system = ReferenceSystem.objects.get(pk=self.kwargs.get('reference'))
         item = Item.objects.get(pk=self.kwargs.get('pk'))
-
-        s = system.item.feature_set.all()
-        i = item.feature_set.all()
-
-        # neue Features des Vergleichsbauteils ans Referenzbauteil hängen
-        s_name = set([si.name for si in s])
-        i_name = set([si.name for si in i])
-        duplicates = s_name & i_name
-        only_i = i_name.difference(s_name)
-
-        # Abspeicherung des Features zum Referenzbauteil
-        for f in i:
-            if f.name in only_i:
-                new_attrs = f.featureattribute_set.all()
-                f.add_to_fct = True
-                f.pk = None
-                f.item = system.item
-                f.save()
-                for attr in new_attrs:
-                    attr.feature = f.pk
-                    attr.pk = None
-                    attr.save()
-
-        # neue Merkmale bekannter Features des Vergleichsbauteils ans
-        # Referenzbauteils hängen
-        for name in duplicates:
-            f_i = i.filter(name=name).first()
-            f_att_i = f_i.featureattribute_set.all()
-            f_s = s.filter(name=name).first()
-            f_att_s = f_s.featureattribute_set.all()
-
-            fs_name = set([si.name for si in f_att_s])
-            fi_name = set([si.name for si in f_att_i])
-            duplicates = fs_name & fi_name
-
-            only_fi_name = fi_name.difference(fs_name)
-
-            # Abspeicherung des Merkmals zum Features des Referenzbauteils
-            for ofi in only_fi_name:
-                new_att = f_att_i.filter(name=ofi).first()
-                new_att.pk = None
-                new_att.feature = f_s
-                new_att.save()
+        differences = item_differences(item)
+
+        with transaction.atomic():
+            # neue Features des Vergleichsbauteils (mit Merkmalen und
+            # Volumen) ans Referenzbauteil hängen
+            _, new_attrs = clone_features(
+                list(item.feature_set.filter(
+                    name__in=added_features(differences)).order_by('pk')),
+                system.item, add_to_fct=True)
+
+            # neue Merkmale bekannter Features des Vergleichsbauteils ans
+            # Referenzbauteils hängen
+            new_merkmale = set((d.feature_name, d.merkmal_name)
+                               for d in added_merkmale(differences))
+            if new_merkmale:
+                f_names = set(f_name for f_name, _ in new_merkmale)
+                reference_features = {}
+                for f_s in system.item.feature_set.filter(
+                        name__in=f_names).order_by('-pk'):
+                    reference_features[f_s.name] = f_s
+
+                attributes = []
+                for new_att in FeatureAttribute.objects.filter(
+                        feature__item=item, feature__name__in=f_names) \
+                        .select_related('feature').order_by('pk'):
+                    key = (new_att.feature.name, new_att.name)
+                    if key in new_merkmale:
+                        new_merkmale.remove(key)
+                        attributes.append(new_att)
+                new_attrs += clone_attributes(attributes, reference_features)
+
+            # leere FCT-Zellen für alle Technologien anlegen
+            create_empty_cells(
+                list(FctMembership.objects.filter(reference=system)),
+                new_attrs)
+
+        # Referenzbauteil geändert --> Strukturvergleich aller
+        # Vergleichsbauteile aktualisieren
+        update_differences(system.pk)
 
         return super().dispatch(request, *args, **kwargs)
 
@@ -805,30 +619,13 @@ class ItemUpload(FormView):
     form_class = ItemUploadForm
     template_name = 'main/item/features_upload.html'
 
-    def get_success_url(self) -> str:
-        # access model from form_valid to generate complete url
-        return reverse('item-list')
-
     def form_valid(self, form: ItemUploadForm) -> HttpResponse:
-        try:
-            # create item for reference system
-            item = Item(compare_reference=form.cleaned_data.get('compare_reference'),
-                        name=form.cleaned_data.get('name'))
-
-            # start transaction to save df to db as features and attrs
-            with transaction.atomic():
-                self.model = item.save()
-                create_features_from_df(
-                    form.process_dataframe, item)
-                return super().form_valid(form)
-
-        # raise exception if transaction failed
-        except Exception as err:
-            log.exception(err)
-            form.add_error(
-                None, error='Database INSERT failed => Transaction ROLLBACK')
-            # return form with errors
-            return super().form_invalid(form)
+        # Datei im Hintergrund einlesen und auf die Statusseite weiterleiten
+        job = enqueue(Job.UPLOAD_ITEM,
+                      dict(upload_parameters(form),
+                           compare_reference=form.cleaned_data['compare_reference'].pk),
+                      form.cleaned_data['file'].read())
+        return redirect(job)
 
 
 class CustomerItemDelete(DeleteView):
@@ -845,407 +642,19 @@ class ItemFctBackwards(RedirectView):
     Volumen berechnen
     Volumenänderung bestimmen und Hauptzeiten, Standmenge und Losgrößen für Vergleichsbauteil berechnen
     Gewinnkostenberechnung für das Referenzbauteil und das Vergleichsbauteil
+    (als Hintergrundauftrag, Ergebnis auf der Detailseite des Bauteils)
     '''
 
     def dispatch(self, request, *args, **kwargs):
-        new_fct_table = {}
-
-        # alle Feature des Referenzbauteils
-        feature = Feature.objects.filter(
-            item__reference_id=self.kwargs.get('reference'))
-
-        # Alle FCT-Member des Referenzbauteils
-        members = FctMembership.objects.filter(
-            reference=self.kwargs.get('reference'))
-
-        # Liste aller Merkmale die für die Berechnung der Volumen genutzt werden
-        possible_volume_fields = ['laenge', 'breite', 'hoehe', 'tiefe', 'durchmesser',
-                                  'breite_fuss', 'tiefe_fuss', 'winkel']
-        # create dict template for fct table
-        for f in feature:
-            # Dictionary für jedes Feature worin der Volumentype (classifier),
-            # das Formelement (is_positive) und das Volumen gespeichert werden
-            new_fct_table[f.name] = {
-                'volume_type': f.classifier.lower(),
-                'positive': f.is_positive,
-                'volumes': [],
-                't_id': {}}
-            # für jedes Feature werden die Merkmale (Featureattributes) einzeln betrachtet
-            for m in f.featureattribute_set.all():
-                # Umlaute werden entfernt
-                m_name = remove_umlaut(m.name)
-                # eine Liste wird instanziert für jedes Merkmal
-                new_fct_table[f.name]['t_id'][m_name] = []
-                new_fct_table[f.name][m_name] = []
-                for c in m.fctattribute_set.all():
-                    # Leistungsfähigkeitsprofile für das betrachtete Merkmal ins Dict abspeichern
-                    new_fct_table[f.name]['t_id'][m_name].append(
-                        c.tool_attribute)
-
-                    if c.input == 0 and c.output != 0:
-                        new_fct_table[f.name][m_name].append('Zero')
-                    else:
-                        new_fct_table[f.name][m_name].append(c.difference)
-                # nach diesem Schritt ist die Liste new_fct_table mit den Differenzen aus der In- und
-                # Outputs für ein Merkmal gefüllt
-                # das heißt sind drei Technologien in der FCT so sind 3 Differenzen vorhanden
-            # nach dieser Schleife ist das Dictionary (ein Feature) mit allen Merkmalen gefüllt
-            # jedes Merkmal besitzt die Differenzen in der FCT-Tabelle
-        # add target value to the end of value array
-        ecr_fuzzy_models = []
-        item = Item.objects.get(pk=self.kwargs.get('pk'))
-        for f in item.feature_set.all():
-            # feature des Vergleichsbauteils
-            for m in f.featureattribute_set.all():
-                # Merkmale eines Features des Vergleichsbauteils
-                new_fct_table[f.name][remove_umlaut(m.name)].append(m.value)
-                # an die Differenzen aus der Referenz FCT-Tabelle werden die Bauteilanforderungen des
-                # Vergleichsbauteils angehängt (u.a. die veränderten Merkmalsanforderungen)
-                # eine Liste mit den Merkmalsdifferenzen sowie der neuen Merkmalsanforderung
-                for index, diff in reversed(list(enumerate(new_fct_table[f.name][remove_umlaut(m.name)]))):
-                    # diese Liste wird von hinten nach vorne durchiteriert sowie mit jedem Durchlauf von 0 aufwärts mitgezählt
-                    if m.value == diff:
-                        # wenn der Eintrag = der Merkmalsanforderung des Vergleichbauteil
-                        # ist, so wird die nächste
-                        # Differenz genomme --> Startwert
-                        continue
-                    if isinstance(diff, str):
-                        # Falls Differenz Sting = Zero
-                        new_fct_table[f.name][remove_umlaut(
-                            m.name)][index] = new_fct_table[f.name][remove_umlaut(
-                                m.name)][index + 1] - new_fct_table[f.name][remove_umlaut(
-                                    m.name)][index + 1]
-                        # Zeilen für die technologische Überprüfung, wenn ein Input = 0 ist
-                        # also ein Zero-Wert in der Zeile
-                        new_value_diff_null = new_fct_table[f.name][remove_umlaut(
-                            m.name)][index + 1] - new_fct_table[f.name][remove_umlaut(
-                                m.name)][index + 1]
-                        t_id_diff_null = new_fct_table[f.name]['t_id'][remove_umlaut(
-                            m.name)][index]
-                        # übergeben an die Funktion fuzzy_check() für die technologische Machbarkeit
-                        tech_check = t_id_diff_null.fuzzy_check(new_value_diff_null + new_fct_table[f.name][remove_umlaut(
-                            m.name)][index + 1])
-                        # abspeichern in der Liste ecr_fuzzy_models
-                        ecr_fuzzy_models.append(EcrFuzzy(f_name=f.name, m_name=m.name, tool_name=t_id_diff_null,
-                                                         value=new_value_diff_null + new_fct_table[f.name][remove_umlaut(
-                                                             m.name)][index + 1], fuzzy=tech_check))
-
-                    else:
-                        new_value = new_fct_table[f.name][remove_umlaut(
-                            m.name)][index + 1] - diff
-                        t_id = new_fct_table[f.name]['t_id'][remove_umlaut(
-                            m.name)][index]
-
-                        # technologische Bewertung und abspeicherung in der Liste ecr_fuzzy_models
-                        tech_check = t_id.fuzzy_check(new_value + diff)
-                        ecr_fuzzy_models.append(EcrFuzzy(f_name=f.name, m_name=m.name, tool_name=t_id,
-                                                         value=new_value + diff, fuzzy=tech_check))
-
-                        # für alle anderen Differenzen
-                        new_fct_table[f.name][remove_umlaut(
-                            m.name)][index] = new_fct_table[f.name][remove_umlaut(
-                                m.name)][index + 1] - diff
-
-        # save length
-        # die Anzahl der Technologien in der Fertigungsprozessfolge
-        length_diff = len(
-            new_fct_table[f.name][remove_umlaut(f.featureattribute_set.first().name)])
-
-        # calculate feature volume for every technology
-        # an dieser Stelle wird das Volumen der In - und Outputs aller Features für
-        # eine Technologie berechnet
-        for f in new_fct_table:
-            # dict wird instanziiert
-            # es wird durch das oben instanziierte FCT-Dict durchiteriirt
-            # ein Dict vol_dict wird neu instanziiert in das für jedes Feature der
-            # Classifier abgespeichert wird
-            vol_dict = {'volume_type': new_fct_table[f]['volume_type']}
-            # diese Iteration wird genau so oft Durchlaufen, wie es Features/Zwischenergebniss
-            #  im Vergleichsbauteil gibt
-            for counter in range(length_diff):
-                # jeder Eintage (value) eines Feature im Dict new_fct_table wird durchiteriert
-                for m in new_fct_table[f]:
-
-                    # wenn der Eintrag ein Merkmal in der Liste possible_volume_fields (s.o)
-                    if m in possible_volume_fields:
-                        # if isinstance(new_fct_table[f][m], list):
-                        vol_dict[m] = new_fct_table[f][m][counter]
-                        # else:
-                        #     vol_dict[m] = new_fct_table[f][m]
-
-                vol = Volume(**vol_dict).calculate_volume()
-                new_fct_table[f]['volumes'].append(vol)
-
-        # pprint.pprint(new_fct_table)
-        # calculate volume per input for every technology
-        # dictionary mit so vielen Eintragen wie Technologien in Fertigungsprozessfolge sind
-        item_vols = {}
-        for i, m in enumerate(members):
-            item_vols[i] = []
-
-        # iterieren durch die Technologien FCT-membership
-        for index, member in enumerate(members):
-            # instanziiren leere Liste
-            member_volumes = []
-            # iterrieren für jedes Feature die new fct tabele durch
-            for f in new_fct_table:
-                if new_fct_table[f]['positive']:
-                    member_volumes.append(
-                        new_fct_table[f]['volumes'][index + 1] - new_fct_table[f]['volumes'][index])
-                else:
-                    member_volumes.append(
-                        - (new_fct_table[f]['volumes'][index + 1] - new_fct_table[f]['volumes'][index]))
-
-            item_vols[index].append(sum(member_volumes))
-            # berechung der outputvolumen
-            # erst in der letzte iterationsschleife
-            if index == len(members) - 1:
-                item_vols[index + 1] = []
-                item_vols[index + 1].append(member.output_volume)
-        pprint.pprint(new_fct_table)
-        print('------------item_vol-----------')
-        print(item_vols)
-        # cost Referenszbauteil
-        # in diesem Abschnitt werden die Kostenberechnungen für das Referenzabauteil durchgeführt
-        cost_overview = {
-            "cost_fct_column": {},
-            "cost_general": {}
-        }
-
-        cost_parameter = cost_overview['cost_fct_column']
-        cost_fpf = cost_overview['cost_general']
+        item_id = self.kwargs.get('pk')
+        reference_id = self.kwargs.get('reference')
 
-        system = ReferenceSystem.objects.get(pk=self.kwargs.get('reference'))
-        hz = system.item.halbzeug_set.first()
-        hz: Halbzeug
-        print('Halbezug1111111')
-        print(hz.pk)
-
-        # für jede Technologie der Fertigungsprozessfolge werden die KOSTEN berechnet
-        for ref in members:
-            '''
-            Alle Kosten die bestimmt werden können ohne Npf_gesamt der Fertigungsprozessfolge
-            '''
-            tool = ref.tool
-            machine = ref.tool.technology
-
-            cost_parameter[tool.name] = {}
-
-            cost_parameter[tool.name]['mittlere_leistung'] = machine.mittlere_leistung
-            cost_parameter[tool.name]['betrachtungszeitraum'] = system.betrachtungszeitraum
-            cost_parameter[tool.name]['strompreis'] = machine.strompreis
-            cost_parameter[tool.name]['laufzeit_jahr'] = system.laufzeit_jahr
-
-            cost_parameter[tool.name]['tn'] = (tool.ruestzeit / ref.losgroesse) + \
-                (tool.werkzeugwechselzeit / ref.standmenge) +  \
-                tool.werkstueckwechselzeit
-            cost_parameter[tool.name]['tg'] = ref.hauptzeit + \
-                cost_parameter[tool.name]['tn']
-            cost_parameter[tool.name]['te'] = cost_parameter[tool.name]['tg'] + \
-                tool.verteilzeit + tool.erholungszeit
-
-            cost_parameter[tool.name]['npf'] = (
-                system.laufzeit_jahr * system.betrachtungszeitraum) / (cost_parameter[tool.name]['te'] / (60 * 60))
-
-            cost_parameter[tool.name]['betriebsstoffkosten'] = tool.betriebsstoffkosten
-            cost_parameter[tool.name]['restfertigungsgemeinkosten'] = machine.restfertigungsgemeinkosten
-            cost_parameter[tool.name]['Ka'] = (
-                machine.anschaffungswert - machine.verkaufserlös) / machine.abschreibungsdauer
-            cost_parameter[tool.name]['Kr'] = machine.quadratmeterpreis * \
-                machine.platzbedarf
-            cost_parameter[tool.name]['Ki'] = machine.anschaffungswert * \
-                machine.instandhaltungsfaktor
-            cost_parameter[tool.name]['Kz'] = 0.5 * \
-                (machine.anschaffungswert + machine.verkaufserlös) * machine.zinsatz
-            cost_parameter[tool.name]['Kw'] = tool.werkzeugpreis / \
-                ref.standmenge
-            cost_parameter[tool.name]['Kl'] = machine.stundenlohn * (1 + system.lohnnebenkostenanteil) * (
-                cost_parameter[tool.name]['te'] / (60 * 60)) * machine.bediehnverhaeltnis * machine.fertigungsmittelanzahl
-
-        cost_fpf['npf_max'] = min([v['npf']
-                                   for k, v in cost_parameter.items()])
-
-        # Berechnung aller Kostenbestandteile die Abhängig von der Stückzahl sind
-        for name in cost_parameter:
-            cost_parameter[name]['npa'] = cost_overview['cost_general']['npf_max'] / \
-                cost_parameter[name]['betrachtungszeitraum']
-            cost_parameter[name]['Ke'] = cost_parameter[name]['mittlere_leistung'] * (cost_parameter[name]['te'] / (
-                60 * 60)) * cost_parameter[name]['npa'] * cost_parameter[name]['strompreis']
-
-            cost_parameter[name]['Kmh'] = (cost_parameter[name]['Ka'] + cost_parameter[name]['Kr'] + cost_parameter[name]
-                                           ['Ki'] + cost_parameter[name]['Ke'] + cost_parameter[name]['Kz']) / cost_parameter[name]['laufzeit_jahr']
-            cost_parameter[name]['Km'] = cost_parameter[name]['Kmh'] * \
-                (cost_parameter[name]['te'] / (60 * 60))
-
-            cost_parameter[name]['Kf'] = cost_parameter[name]['Kl'] + \
-                cost_parameter[name]['Km'] + \
-                cost_parameter[name]['Kw'] + \
-                cost_parameter[name]['restfertigungsgemeinkosten']
-            cost_parameter[name]['Khb'] = cost_parameter[name]['betriebsstoffkosten'] / \
-                cost_overview['cost_general']['npf_max']
-
-        cost_fpf['Kf_fpf'] = sum([v['Kf'] for k, v in cost_parameter.items()])
-
-        cost_fpf['Krm'] = hz.volume * system.dichte * \
-            system.kilopreis * pow(10, -3)
-        cost_fpf['Kma'] = cost_fpf['Krm'] + \
-            sum([v['Khb'] for k, v in cost_parameter.items()])
-
-        cost_fpf['Kh'] = cost_fpf['Kf_fpf'] + cost_fpf['Kma']
-        cost_fpf['Kh_npf'] = cost_fpf['Kh'] * cost_fpf['npf_max']
-
-        cost_fpf['Gpf'] = system.produktpreis * \
-            cost_fpf['npf_max'] - cost_fpf['Kh_npf']
-
-        cost_fpf['reference'] = system
-        res = system.costreference_set.first()
-        CostReference(**cost_fpf).save()
-
-        print('------------Kosten Referenzbauteil-------------')
-        pprint.pprint(cost_overview)
-
-        # mit diesem Schritt wird immer nur einmal ein Ergebnis gespeichert
-        # der obere Schritt speichert immer wieder einen neuen Datensatz in die Tabelle CostReference
-        '''
-        if not res:
-            Result(**cost_fpf).save()
-        else:
-            print('ergebnis schon vorhanden')
-        '''
-
-        # Bestimmung der bauteilabhängigen Parameter Hauptzei, Standmenge und Losgröße
-        # in Abhängigkeit der Änderungsvolumina der Technoloien für Referenzbauteil und Vergelichsbauteil
-        hauptzeit_item = []
-        standmenge_item = []
-        losgroesse_item = []
-
-        for index, ref in enumerate(members):
-            vol_ref = ref.difference_volume
-            vol_item = item_vols[index][0]
-
-            relation = abs(vol_item / vol_ref)
-
-            th_ref = ref.hauptzeit
-            nwz_ref = ref.standmenge
-            nl_ref = ref.losgroesse
-
-            hauptzeit_item.append(relation * th_ref)
-            standmenge_item.append(nwz_ref * (1 / relation))
-            losgroesse_item.append(nl_ref * (1 / relation))
-
-        # Berechnung der KOSTEN des Vergleichsbauteil
-        cost_overview = {
-            "cost_fct_column": {},
-            "cost_general": {}
-        }
-
-        cost_parameter = cost_overview['cost_fct_column']
-        cost_fpf = cost_overview['cost_general']
-
-        refs = system.fctmembership_set.all()
-        hz = item.halbzeug_set.first()
-
-        for index, ref in enumerate(members):
-            '''
-            Alle Kosten die bestimmt werden können ohne Npf_gesamt der Fertigungsprozessfolge
-            '''
-            tool = ref.tool
-            machine = Technology.objects.get(pk=tool.technology.id)
-
-            cost_parameter[tool.name] = {}
-
-            cost_parameter[tool.name]['mittlere_leistung'] = machine.mittlere_leistung
-            cost_parameter[tool.name]['betrachtungszeitraum'] = system.betrachtungszeitraum
-            cost_parameter[tool.name]['strompreis'] = machine.strompreis
-            cost_parameter[tool.name]['laufzeit_jahr'] = system.laufzeit_jahr
-            cost_parameter[tool.name]['tn'] = (
-                tool.ruestzeit / losgroesse_item[index]) + (tool.werkzeugwechselzeit / standmenge_item[index]) + tool.werkstueckwechselzeit
-            cost_parameter[tool.name]['tg'] = hauptzeit_item[index] + \
-                cost_parameter[tool.name]['tn']
-            cost_parameter[tool.name]['te'] = cost_parameter[tool.name]['tg'] + \
-                tool.verteilzeit + tool.erholungszeit
-
-            cost_parameter[tool.name]['npf'] = (
-                system.laufzeit_jahr * system.betrachtungszeitraum) / (cost_parameter[tool.name]['te'] / (60 * 60))
-
-            cost_parameter[tool.name]['betriebsstoffkosten'] = tool.betriebsstoffkosten
-            cost_parameter[tool.name]['restfertigungsgemeinkosten'] = machine.restfertigungsgemeinkosten
-            cost_parameter[tool.name]['Ka'] = (
-                machine.anschaffungswert - machine.verkaufserlös) / machine.abschreibungsdauer
-            cost_parameter[tool.name]['Kr'] = machine.quadratmeterpreis * \
-                machine.platzbedarf
-            cost_parameter[tool.name]['Ki'] = machine.anschaffungswert * \
-                machine.instandhaltungsfaktor
-            cost_parameter[tool.name]['Kz'] = 0.5 * \
-                (machine.anschaffungswert + machine.verkaufserlös) * machine.zinsatz
-            cost_parameter[tool.name]['Kw'] = tool.werkzeugpreis / \
-                standmenge_item[index]
-            cost_parameter[tool.name]['Kl'] = machine.stundenlohn * (1 + system.lohnnebenkostenanteil) * (
-                cost_parameter[tool.name]['te'] / (60 * 60)) * machine.bediehnverhaeltnis * machine.fertigungsmittelanzahl
-
-        cost_fpf['npf_max'] = min([v['npf']
-                                   for k, v in cost_parameter.items()])
-
-        for name in cost_parameter:
-
-            cost_parameter[name]['npa'] = cost_overview['cost_general']['npf_max'] / \
-                cost_parameter[name]['betrachtungszeitraum']
-            cost_parameter[name]['Ke'] = cost_parameter[name]['mittlere_leistung'] * (cost_parameter[name]['te'] / (
-                60 * 60)) * cost_parameter[name]['npa'] * cost_parameter[name]['strompreis']
-
-            cost_parameter[name]['Kmh'] = (cost_parameter[name]['Ka'] + cost_parameter[name]['Kr'] + cost_parameter[name]
-                                           ['Ki'] + cost_parameter[name]['Ke'] + cost_parameter[name]['Kz']) / cost_parameter[name]['laufzeit_jahr']
-            cost_parameter[name]['Km'] = cost_parameter[name]['Kmh'] * \
-                (cost_parameter[name]['te'] / (60 * 60))
-
-            cost_parameter[name]['Kf'] = cost_parameter[name]['Kl'] + \
-                cost_parameter[name]['Km'] + \
-                cost_parameter[name]['Kw'] + \
-                cost_parameter[name]['restfertigungsgemeinkosten']
-            cost_parameter[name]['Khb'] = cost_parameter[name]['betriebsstoffkosten'] / \
-                cost_overview['cost_general']['npf_max']
-
-        cost_fpf['Kf_fpf'] = sum([v['Kf'] for k, v in cost_parameter.items()])
-
-        cost_fpf['Krm'] = hz.volume * system.dichte * \
-            system.kilopreis * pow(10, -3)
-        cost_fpf['Kma'] = cost_fpf['Krm'] + \
-            sum([v['Khb'] for k, v in cost_parameter.items()])
-
-        cost_fpf['Kh'] = cost_fpf['Kf_fpf'] + cost_fpf['Kma']
-        cost_fpf['Kh_npf'] = cost_fpf['Kh'] * cost_fpf['npf_max']
-
-        cost_fpf['Gpf'] = system.produktpreis * \
-            cost_fpf['npf_max'] - cost_fpf['Kh_npf']
-
-        cost_fpf['item'] = item
-        res = item.result_set.first()
-        result = Result(**cost_fpf)
-        result.save()
-        print('------------Kosten Vergleichsbauteil-------------')
-        pprint.pprint(cost_overview)
-        # abspeichern der Ergebnisse der technologischen Machbarkeit für das Vergleichsbauteil
-        for ecrfuzzy in ecr_fuzzy_models:
-            ecrfuzzy.result = result
-            ecrfuzzy.save()
-        # if not res:
-        #     Result(**cost_fpf).save()
-        # else:
-        #     print('ergebnis schon vorhanden')
-
-        # Änderungskostenbestimung
-        ref_cost = CostReference.objects.filter(reference=system.id).last()
-
-        gewinn_ecr = ref_cost.Gpf - cost_fpf['Gpf']
-        npf_ecr = cost_fpf['npf_max'] - ref_cost.npf_max
-        kh_ecr = cost_fpf['Kh'] - ref_cost.Kh
-        kh_npf_ecr = cost_fpf['Kh_npf'] - ref_cost.Kh_npf
-        kma_ecr = cost_fpf['Kma'] - ref_cost.Kma
-        krm_ecr = cost_fpf['Krm'] - ref_cost.Krm
-
-        ecrcost = EcrCost(G=gewinn_ecr, Kh=kh_npf_ecr,
-                          npf=npf_ecr, Kma=kma_ecr, Krm=krm_ecr, item=item)
-        ecrcost.save()
+        # Berechnung im Hintergrund (siehe jobs.price_item), mehrfaches
+        # Klicken startet keine weitere Berechnung für das gleiche Paar
+        job = enqueue(Job.PRICE_ITEM,
+                      {'item': item_id, 'reference': reference_id},
+                      key=price_item_key(item_id, reference_id))
+        Item.objects.filter(pk=item_id).update(pricing_job=job)
 
         return super().dispatch(request, *args, **kwargs)
 
@@ -1253,6 +662,23 @@ class ItemFctBackwards(RedirectView):
         return reverse('item-detail', args=[str(self.kwargs.get('pk'))])
 
 
+class ReferencePriceItems(RedirectView):
+    '''
+    Alle Vergleichsbauteile eines Referenzsystems in einem Durchlauf bepreisen
+    (Referenzsystem und Kostenbasis werden nur einmal geladen)
+    '''
+
+    def dispatch(self, request, *args, **kwargs):
+        system = ReferenceSystem.objects.get(pk=self.kwargs.get('pk'))
+        priced = price_reference_items(system)
+        log.info(f'{priced} Vergleichsbauteile für "{system}" berechnet')
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_redirect_url(self, *args: Any, **kwargs: Any) -> str:
+        return reverse('referencemodel-detail',
+                       args=[str(self.kwargs.get('pk'))])
+
+
 # nur wenn man sich die Daten nicht anzeigen lassen will
 # oder man schickt die Daten per django message
 # oder man speicher daten im model
@@ -1262,34 +688,49 @@ class ItemComparison(RedirectView):
     '''
 
     def dispatch(self, request, *args, **kwargs):
-        system = ReferenceSystem.objects.get(pk=self.kwargs.get('reference'))
         item = Item.objects.get(pk=self.kwargs.get('pk'))
+        differences = item_differences(item)
 
-        # feature arrays
-        s = system.item.feature_set.all()
-        i = item.feature_set.all()
-
-        # python zip // simultane for schleife
-
-        s_name = set([si.name for si in s])
-        i_name = set([si.name for si in i])
-        duplicates = s_name & i_name
-        only_s = s_name.difference(i_name)
-        only_i = i_name.difference(s_name)
+        member_only_s = len(removed_features(differences))
+        member_only_i = len(added_features(differences))
 
-        member_only_s = len(only_s)
-        member_only_i = len(only_i)
-
-        if only_i or only_s:
+        if member_only_i or member_only_s:
             # true if ungleich
-            # exit point
-            print('fdf')
-        print(member_only_i)
-        print(member_only_s)
-        # else:
-        # tue das wenn alles richtig ist
+            log.debug(f'{item}: {member_only_i} neue und {member_only_s} '
+                      'entfallene Feature')
 
         return super().dispatch(request, *args, **kwargs)
 
     def get_redirect_url(self, *args: Any, **kwargs: Any) -> Optional[str]:
         return reverse('item-detail', args=[str(self.kwargs.get('pk'))])
+
+
+class JobDetail(DetailView):
+    '''
+    Statusseite eines Hintergrundauftrags
+    fragt den Fortschritt regelmäßig ab und leitet nach Abschluss weiter
+    '''
+    model = Job
+    template_name = 'main/job/detail.html'
+
+
+class JobStatus(DetailView):
+    '''
+    Status und Fortschritt eines Hintergrundauftrags als JSON
+    '''
+    model = Job
+
+    def render_to_response(self, context: Dict[str, Any], **response_kwargs: Any) -> JsonResponse:
+        job = self.object
+        if job.status == Job.PENDING:
+            # nach einem Neustart den Thread-Pool wieder starten
+            start_workers()
+        return JsonResponse({
+            'id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'progress': job.progress,
+            'message': job.message,
+            'finished': job.finished,
+            'result_url': job.result_url,
+        })
@@ -0,0 +1,123 @@
+'''
+Vektorisierte Volumenberechnung
+
+Gleiche Formeln wie Volume.calculate_volume, jedoch für beliebig viele
+Feature gleichzeitig: der Volumentyp wird als Code-Array übergeben, die
+volumenbeschreibenden Merkmale als Parameter-Arrays (fehlende Werte = NaN).
+Die Formeln werden pro Volumentyp über eine Maske ausgewertet.
+'''
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+from django.core.exceptions import ValidationError
+
+from .models import Volume
+
+# Volumentyp -> Code (Index in Volume.VOLUME_FORM)
+VOLUME_TYPES = [volume_type for volume_type, _ in Volume.VOLUME_FORM]
+VOLUME_CODES = {volume_type: code for code,
+                volume_type in enumerate(VOLUME_TYPES)}
+
+# alle volumenbeschreibenden Merkmale (Feldnamen von Volume)
+VOLUME_FIELDS = ['laenge', 'breite', 'hoehe', 'tiefe', 'durchmesser',
+                 'breite_fuss', 'tiefe_fuss', 'winkel']
+
+# benötigte Merkmale je Volumentyp (analog zu Volume.clean)
+REQUIRED_FIELDS = {
+    Volume.PRISMATISCH: ['hoehe', 'breite', 'laenge'],
+    Volume.ABSATZ: ['hoehe', 'breite', 'laenge'],
+    Volume.ROTATIONSSYMMETRISCH: ['durchmesser', 'laenge'],
+    Volume.WELLENABSATZ_ZYLINDRISCH: ['durchmesser', 'laenge'],
+    Volume.BOHRUNG: ['durchmesser', 'laenge'],
+    Volume.T_NUT: ['breite', 'laenge', 'tiefe', 'breite_fuss', 'tiefe_fuss'],
+    Volume.NUT: ['breite', 'laenge', 'tiefe'],
+    Volume.TASCHE: ['breite', 'laenge', 'tiefe'],
+    Volume.PASSFEDER: ['breite', 'laenge', 'tiefe'],
+    Volume.ZYLINDERSENKUNG: ['durchmesser', 'tiefe'],
+    Volume.KEGELSENKUNG: ['durchmesser', 'tiefe'],
+    Volume.WELLENABSATZ_KONISCH: ['durchmesser', 'laenge', 'winkel'],
+    Volume.INNENGEWINDE: [],
+}
+
+
+def volume_type_codes(volume_types: Iterable[str]) -> np.ndarray:
+    # Classifier in Codes umwandeln (unbekannte bzw. nicht berechenbare
+    # Volumen sind ein Fehler)
+    codes = []
+    for volume_type in volume_types:
+        if volume_type not in REQUIRED_FIELDS:
+            raise ValidationError(f'Unbekanntes Volumen "{volume_type}"')
+        codes.append(VOLUME_CODES[volume_type])
+    return np.array(codes, dtype=int)
+
+
+def _formula(volume_type: str, p: Dict[str, np.ndarray]) -> Any:
+    # Berechnungsformeln in Abhängigkeit des Volumentyps
+    # Initialfeature prismatisch und Absatz
+    if volume_type in [Volume.PRISMATISCH, Volume.ABSATZ]:
+        return p['laenge'] * p['breite'] * p['hoehe']
+    # Initialfeature rotationssymmetrisch, Bohrung und zyl.Wellenabsatz
+    elif volume_type in [Volume.ROTATIONSSYMMETRISCH, Volume.BOHRUNG,
+                         Volume.WELLENABSATZ_ZYLINDRISCH]:
+        return np.pi * np.power(p['durchmesser'] / 2, 2) * p['laenge']
+    # T-Nut
+    elif volume_type == Volume.T_NUT:
+        return p['laenge'] * (p['tiefe'] * p['breite'] +
+                              p['breite_fuss'] * p['tiefe_fuss'])
+    # Nut, Tasche und Passfeder
+    elif volume_type in [Volume.NUT, Volume.TASCHE, Volume.PASSFEDER]:
+        return p['breite'] * p['laenge'] * p['tiefe']
+    # Zylindersenkung
+    elif volume_type == Volume.ZYLINDERSENKUNG:
+        return np.pi * np.power(p['durchmesser'], 2) * p['tiefe']
+    # Kegelsenkung
+    elif volume_type == Volume.KEGELSENKUNG:
+        return (np.pi * np.power(p['durchmesser'], 2) * p['tiefe']) / 3
+    # Wellenabsatz konisch
+    elif volume_type == Volume.WELLENABSATZ_KONISCH:
+        d2 = p['durchmesser'] - np.tan(p['winkel']) * p['laenge']
+        laenge_kegel = p['durchmesser'] / np.tan(p['winkel'])
+        l2 = laenge_kegel - p['laenge']
+        return (np.pi * np.power(p['durchmesser'] / 2, 2) * p['laenge']
+                - np.power(d2 / 2, 2) * l2) / 3
+    # Innengewinde: kein Einfluss auf das Volumen
+    return 0.0
+
+
+def calculate_volumes(volume_type: Any, laenge: Optional[Any] = None,
+                      breite: Optional[Any] = None, hoehe: Optional[Any] = None,
+                      tiefe: Optional[Any] = None,
+                      durchmesser: Optional[Any] = None,
+                      breite_fuss: Optional[Any] = None,
+                      tiefe_fuss: Optional[Any] = None,
+                      winkel: Optional[Any] = None) -> np.ndarray:
+    '''
+    Volumen aller Feature in einem Aufruf
+    volume_type: Code-Array (siehe volume_type_codes)
+    Parameter: Arrays die auf die Form von volume_type broadcastet werden,
+    None bzw. NaN für nicht vorhandene Merkmale
+    '''
+    codes = np.asarray(volume_type, dtype=int)
+    parameters = {'laenge': laenge, 'breite': breite, 'hoehe': hoehe,
+                  'tiefe': tiefe, 'durchmesser': durchmesser,
+                  'breite_fuss': breite_fuss, 'tiefe_fuss': tiefe_fuss,
+                  'winkel': winkel}
+    for name, value in parameters.items():
+        value = np.nan if value is None else value
+        parameters[name] = np.broadcast_to(
+            np.asarray(value, dtype=float), codes.shape)
+
+    volumes = np.zeros(codes.shape)
+    for code in np.unique(codes):
+        volume_type = VOLUME_TYPES[code]
+        mask = codes == code
+        p = {name: value[mask] for name, value in parameters.items()}
+
+        # generic validation (analog zu Volume.validating_attributes)
+        for name in REQUIRED_FIELDS[volume_type]:
+            if np.isnan(p[name]).any():
+                raise ValidationError(
+                    f'Typ "{volume_type}" benötigt den Wert "{name}"')
+
+        volumes[mask] = _formula(volume_type, p)
+    return volumes